@@ -1,191 +1,1181 @@
+import gc
 import json
-from typing import List, Optional, Tuple
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (nome, pontuacao, eventos, chefes, morreu) de uma AVL terminada
+ResultadoAVL = Tuple[str, int, int, int, bool]
+
+# Histórico de pontuações guardado como inteiros de 32 bits, sem um objeto int por AVL
+TIPO_HISTORICO = 'i'
+# Momento de cada AVL do histórico, em segundos desde a época (0 = desconhecido)
+TIPO_DATAS = 'I'
+
+# Quantas AVLs recentes aparecem no histórico resumido do jogador
+TAMANHO_RECENTES = 10
+
+class EstatisticasHistorico:
+    """Agregados do histórico de pontuações, atualizados em O(1) a cada AVL.
+
+    Só existe para quem já tem histórico: o nó nasce com estatisticas = None.
+    """
+    __slots__ = ("quantidade", "soma", "minimo", "maximo", "soma_quadrados")
+
+    def __init__(self):
+        self.quantidade = 0
+        self.soma = 0
+        self.minimo = 0
+        self.maximo = 0
+        self.soma_quadrados = 0
+
+    @classmethod
+    def do_historico(cls, historico: Iterable[int]) -> "EstatisticasHistorico":
+        estatisticas = cls()
+        for pontuacao in historico:
+            estatisticas.adicionar(pontuacao)
+        return estatisticas
+
+    def adicionar(self, pontuacao: int):
+        if self.quantidade == 0 or pontuacao < self.minimo:
+            self.minimo = pontuacao
+        if self.quantidade == 0 or pontuacao > self.maximo:
+            self.maximo = pontuacao
+        self.quantidade += 1
+        self.soma += pontuacao
+        self.soma_quadrados += pontuacao * pontuacao
+
+    def media(self) -> float:
+        return self.soma / self.quantidade if self.quantidade else 0.0
+
+    def desvio_padrao(self) -> float:
+        if self.quantidade == 0:
+            return 0.0
+        media = self.media()
+        return math.sqrt(max(0.0, self.soma_quadrados / self.quantidade - media * media))
+
+    def __reduce__(self):
+        return (restaurar_estatisticas, (self.quantidade, self.soma, self.minimo, self.maximo,
+                                         self.soma_quadrados))
+
+    def copiar(self) -> "EstatisticasHistorico":
+        copia = EstatisticasHistorico.__new__(EstatisticasHistorico)
+        copia.quantidade = self.quantidade
+        copia.soma = self.soma
+        copia.minimo = self.minimo
+        copia.maximo = self.maximo
+        copia.soma_quadrados = self.soma_quadrados
+        return copia
 
 class NoAVL:
+    __slots__ = (
+        "nome_jogador", "pontuacao_recorde", "altura", "tamanho", "esquerda", "direita",
+        "historico_avls", "historico_datas", "estatisticas", "contador_mortes", "record_eventos", "chefes_derrotados",
+        "total_avls", "versao_alteracao"
+    )
+
     def __init__(self, nome_jogador: str, pontuacao_recorde: int):
         self.nome_jogador = nome_jogador
         self.pontuacao_recorde = pontuacao_recorde
         self.altura = 1
+        self.tamanho = 1
         self.esquerda = None
         self.direita = None
-        self.historico_avls = []
+        self.historico_avls = array(TIPO_HISTORICO)
+        self.historico_datas = array(TIPO_DATAS)
+        # Criadas na primeira AVL: a maioria dos nós carregados nunca precisa delas
+        self.estatisticas = None
         self.contador_mortes = 0
         self.record_eventos = 0
         self.chefes_derrotados = 0
         self.total_avls = 0
+        # versao do ranking na última alteração do jogador
+        self.versao_alteracao = 0
+
+    def __reduce__(self):
+        # Só o registro do jogador: os ponteiros da árvore não saem do processo
+        return (restaurar_no, (self.nome_jogador, self.pontuacao_recorde, self.historico_avls,
+                               self.historico_datas, self.estatisticas, self.contador_mortes, self.record_eventos,
+                               self.chefes_derrotados, self.total_avls, self.versao_alteracao))
+
+def restaurar_estatisticas(quantidade, soma, minimo, maximo, soma_quadrados):
+    estatisticas = EstatisticasHistorico.__new__(EstatisticasHistorico)
+    estatisticas.quantidade = quantidade
+    estatisticas.soma = soma
+    estatisticas.minimo = minimo
+    estatisticas.maximo = maximo
+    estatisticas.soma_quadrados = soma_quadrados
+    return estatisticas
+
+def restaurar_no(nome_jogador, pontuacao_recorde, historico_avls, historico_datas, estatisticas,
+                 contador_mortes, record_eventos, chefes_derrotados, total_avls, versao_alteracao=0) -> "NoAVL":
+    """Contraparte de NoAVL.__reduce__: um registro solto, fora de qualquer árvore"""
+    no = NoAVL.__new__(NoAVL)
+    no.nome_jogador = nome_jogador
+    no.pontuacao_recorde = pontuacao_recorde
+    no.altura = 1
+    no.tamanho = 1
+    no.esquerda = None
+    no.direita = None
+    no.historico_avls = historico_avls
+    no.historico_datas = historico_datas
+    no.estatisticas = estatisticas
+    no.contador_mortes = contador_mortes
+    no.record_eventos = record_eventos
+    no.chefes_derrotados = chefes_derrotados
+    no.total_avls = total_avls
+    no.versao_alteracao = versao_alteracao
+    return no
+
+class NoIndicePontuacao:
+    __slots__ = ("chave", "jogador", "altura", "tamanho", "esquerda", "direita")
+
+    def __init__(self, chave: Tuple[int, str], jogador: NoAVL):
+        self.chave = chave
+        self.jogador = jogador
+        self.altura = 1
+        self.tamanho = 1
+        self.esquerda = None
+        self.direita = None
+
+def percorrer_em_ordem(raiz, decrescente: bool = False) -> Iterator:
+    """Percurso em ordem com pilha explícita, sem um frame Python por nível"""
+    pilha = []
+    no = raiz
+    if decrescente:
+        while pilha or no:
+            while no:
+                pilha.append(no)
+                no = no.direita
+            no = pilha.pop()
+            yield no
+            no = no.esquerda
+    else:
+        while pilha or no:
+            while no:
+                pilha.append(no)
+                no = no.esquerda
+            no = pilha.pop()
+            yield no
+            no = no.direita
+
+def percorrer_a_partir(raiz, chave: Callable, inicio, decrescente: bool = False) -> Iterator:
+    """Percurso em ordem que começa no primeiro nó com chave(no) >= inicio.
+
+    Com decrescente=True começa no último nó com chave(no) <= inicio e desce.
+    A descida até o ponto de partida custa O(log n); quem consome para
+    quando passar do fim do intervalo, então o total é O(log n + k).
+    """
+    pilha = []
+    no = raiz
+    while no:
+        if (chave(no) <= inicio) if decrescente else (chave(no) >= inicio):
+            pilha.append(no)
+            no = no.direita if decrescente else no.esquerda
+        else:
+            no = no.esquerda if decrescente else no.direita
+
+    while pilha:
+        no = pilha.pop()
+        yield no
+        no = no.esquerda if decrescente else no.direita
+        while no:
+            pilha.append(no)
+            no = no.direita if decrescente else no.esquerda
+
+def percorrer_depois(raiz, chave: Callable, depois, decrescente: bool = False) -> Iterator:
+    """Como percorrer_a_partir, mas estritamente depois de depois (None = do começo).
+
+    É a continuação de uma página: depois é a chave do último item entregue.
+    """
+    if depois is None:
+        yield from percorrer_em_ordem(raiz, decrescente)
+        return
+    for no in percorrer_a_partir(raiz, chave, depois, decrescente):
+        if chave(no) != depois:
+            yield no
+
+def selecionar_em_ordem(raiz, posicao: int):
+    """k-ésimo nó do percurso em ordem (1 = o menor), descendo pelos tamanhos em O(log n)"""
+    no = raiz
+    while no:
+        tamanho_esquerda = no.esquerda.tamanho if no.esquerda else 0
+        if posicao <= tamanho_esquerda:
+            no = no.esquerda
+        elif posicao == tamanho_esquerda + 1:
+            return no
+        else:
+            posicao -= tamanho_esquerda + 1
+            no = no.direita
+    return None
+
+def registro_do_no(no: NoAVL) -> dict:
+    """Registro plano de um jogador, no mesmo formato de data/ranking.json"""
+    return {
+        "nome_jogador": no.nome_jogador,
+        "pontuacao_recorde": no.pontuacao_recorde,
+        "historico_avls": no.historico_avls[:tamanho_historico(no)].tolist(),
+        "historico_datas": no.historico_datas[:tamanho_historico(no)].tolist(),
+        "contador_mortes": no.contador_mortes,
+        "record_eventos": no.record_eventos,
+        "chefes_derrotados": no.chefes_derrotados,
+        "total_avls": no.total_avls
+    }
+
+def no_do_registro(registro: dict) -> NoAVL:
+    """Cria um nó a partir de um registro no formato de data/ranking.json"""
+    no = NoAVL(registro["nome_jogador"], registro["pontuacao_recorde"])
+    no.historico_avls = array(TIPO_HISTORICO, registro.get("historico_avls", ()))
+    # Rankings salvos antes das datas: AVLs antigas ficam com momento desconhecido
+    no.historico_datas = array(TIPO_DATAS, registro.get("historico_datas", ()))
+    if len(no.historico_datas) != len(no.historico_avls):
+        no.historico_datas = array(TIPO_DATAS, bytes(len(no.historico_avls) * no.historico_datas.itemsize))
+    if no.historico_avls:
+        no.estatisticas = EstatisticasHistorico.do_historico(no.historico_avls)
+    no.contador_mortes = registro.get("contador_mortes", 0)
+    no.record_eventos = registro.get("record_eventos", 0)
+    no.chefes_derrotados = registro.get("chefes_derrotados", 0)
+    no.total_avls = registro.get("total_avls", len(no.historico_avls))
+    return no
+
+def nos_ordenados_por_nome(registros: Iterable[dict]) -> List[NoAVL]:
+    """Nós em ordem de nome; registros fora de ordem são ordenados e nomes repetidos rejeitados"""
+    nos = [no_do_registro(registro) for registro in registros]
+
+    ordenado = True
+    for anterior, atual in zip(nos, nos[1:]):
+        if anterior.nome_jogador >= atual.nome_jogador:
+            ordenado = False
+            break
+    if not ordenado:
+        nos.sort(key=lambda no: no.nome_jogador)
+        for anterior, atual in zip(nos, nos[1:]):
+            if anterior.nome_jogador == atual.nome_jogador:
+                raise ValueError(f"Jogador duplicado na carga: {atual.nome_jogador}")
+
+    return nos
+
+def estatisticas_do_no(no: NoAVL) -> EstatisticasHistorico:
+    """Agregados do jogador; zerados se ele ainda não terminou nenhuma AVL"""
+    return no.estatisticas if no.estatisticas is not None else EstatisticasHistorico()
+
+def tamanho_historico(no: NoAVL) -> int:
+    """Quantas AVLs do histórico pertencem a este registro.
+
+    O motor persistente compartilha os arrays do histórico entre as versões
+    de um jogador e só a versão mais nova acrescenta; cada versão lê apenas o
+    prefixo que tinha. Nos outros motores é o array inteiro.
+    """
+    return no.estatisticas.quantidade if no.estatisticas is not None else 0
+
+def avls_recentes(no: NoAVL) -> List[int]:
+    """As últimas TAMANHO_RECENTES pontuações, da mais antiga para a mais nova"""
+    fim = tamanho_historico(no)
+    return no.historico_avls[max(0, fim - TAMANHO_RECENTES):fim].tolist()
+
+def agora() -> int:
+    return int(time.time())
+
+def acrescentar_pontuacao(no: NoAVL, pontuacao: int, momento: Optional[int] = None):
+    """Acrescenta uma AVL ao histórico e aos agregados do jogador (não mexe no recorde)"""
+    fim = tamanho_historico(no)
+    if len(no.historico_avls) > fim:
+        # Sobra de uma escrita persistente que não chegou a ser publicada
+        del no.historico_avls[fim:]
+        del no.historico_datas[fim:]
+    no.historico_avls.append(pontuacao)
+    no.historico_datas.append(agora() if momento is None else momento)
+    if no.estatisticas is None:
+        no.estatisticas = EstatisticasHistorico()
+    no.estatisticas.adicionar(pontuacao)
+    no.total_avls = len(no.historico_avls)
+
+def aplicar_resultado(no: NoAVL, pontuacao: int, eventos: int, chefes: int, morreu: bool,
+                      momento: Optional[int] = None):
+    """Efeito de uma AVL terminada sobre o jogador, como inserir + registrar_fim_avl"""
+    acrescentar_pontuacao(no, pontuacao, momento)
+    if pontuacao > no.pontuacao_recorde:
+        no.pontuacao_recorde = pontuacao
+    if eventos > no.record_eventos:
+        no.record_eventos = eventos
+    no.chefes_derrotados += chefes
+    if morreu:
+        no.contador_mortes += 1
+
+def ordenar_lote(resultados: Iterable[ResultadoAVL]) -> List[ResultadoAVL]:
+    # sorted é estável: as AVLs de um mesmo jogador continuam na ordem em que chegaram
+    return sorted(resultados, key=itemgetter(0))
+
+def nomes_do_lote(lote_ordenado: List[ResultadoAVL]) -> List[str]:
+    """Jogadores de um lote ordenado, cada um uma vez"""
+    return list(dict.fromkeys(resultado[0] for resultado in lote_ordenado))
+
+def mesclar_lote(existentes: Iterable[NoAVL], lote_ordenado: List[ResultadoAVL],
+                 alterados: Dict[str, NoAVL], momento: Optional[int] = None) -> List[NoAVL]:
+    """Intercala os jogadores existentes (em ordem de nome) com um lote ordenado por nome.
+
+    Jogadores repetidos são atualizados no próprio nó; os novos são criados.
+    Quem entrou ou mudou de recorde vai para alterados, para o índice de
+    pontuação. Devolve todos os nós em ordem de nome.
+    """
+    momento = agora() if momento is None else momento
+    nos = []
+    existentes = iter(existentes)
+    atual = next(existentes, None)
+    no = None
+    recorde_anterior = None
+    for nome, pontuacao, eventos, chefes, morreu in lote_ordenado:
+        if no is None or nome != no.nome_jogador:
+            if no is not None and no.pontuacao_recorde != recorde_anterior:
+                alterados[no.nome_jogador] = no
+
+            while atual is not None and atual.nome_jogador < nome:
+                nos.append(atual)
+                atual = next(existentes, None)
+            if atual is not None and atual.nome_jogador == nome:
+                no, recorde_anterior = atual, atual.pontuacao_recorde
+                atual = next(existentes, None)
+            else:
+                no, recorde_anterior = NoAVL(nome, pontuacao), None
+            nos.append(no)
+
+        aplicar_resultado(no, pontuacao, eventos, chefes, morreu, momento)
+
+    if no is not None and no.pontuacao_recorde != recorde_anterior:
+        alterados[no.nome_jogador] = no
+    if atual is not None:
+        nos.append(atual)
+        nos.extend(existentes)
+    return nos
+
+@contextmanager
+def sem_coleta_ciclica():
+    """Pausa o coletor de ciclos durante operações em massa.
+
+    Alocar centenas de milhares de nós com a árvore inteira viva dispara
+    coletas completas repetidas, que custam mais que a própria operação.
+    """
+    ativo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if ativo:
+            gc.enable()
+
+def lote_compensa_mesclar(tamanho_lote: int, total: int) -> bool:
+    """Mesclar custa O(n + m); m inserções custam O(m log n). Lotes pequenos vão um a um.
+
+    Medido em CPython: remontar custa uns 4 níveis de descida por jogador
+    existente, daí o fator 4 (com 100 mil jogadores, compensa a partir de ~20 mil).
+    """
+    return tamanho_lote * max(total.bit_length(), 1) >= 4 * total
+
+def ler_registros_ndjson(arquivo: str) -> Iterator[dict]:
+    """Lê um registro por linha sem carregar o arquivo inteiro"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+
+def religar_caminho(caminho: List[Tuple[object, bool]], subarvore, balancear, delta_tamanho: int = 0):
+    """Reencaixa a subárvore alterada subindo pelo caminho (nó, foi_para_esquerda),
+    rebalanceando cada ancestral. Retorna a nova raiz.
+
+    Assim que um ancestral mantém a altura, os de cima não precisam de
+    rotação: basta somar delta_tamanho a cada um.
+    """
+    filho = subarvore
+    while caminho:
+        pai, pela_esquerda = caminho.pop()
+        if pela_esquerda:
+            pai.esquerda = filho
+        else:
+            pai.direita = filho
+        altura_anterior = pai.altura
+        filho = balancear(pai)
+        if filho.altura == altura_anterior and caminho:
+            avo, pela_esquerda = caminho[-1]
+            if pela_esquerda:
+                avo.esquerda = filho
+            else:
+                avo.direita = filho
+            for ancestral, _ in caminho:
+                ancestral.tamanho += delta_tamanho
+            return caminho[0][0]
+    return filho
+
+def construir_balanceada(nos: List):
+    """Monta uma árvore perfeitamente balanceada em O(n) a partir de nós já ordenados.
+
+    Cada subárvore fica com o elemento do meio como raiz, então o tamanho é
+    conhecido pelo intervalo e a altura é tamanho.bit_length(), sem rotações.
+    """
+    if not nos:
+        return None
+
+    raiz = None
+    pilha = [(0, len(nos) - 1, None, True)]
+    while pilha:
+        inicio, fim, pai, pela_esquerda = pilha.pop()
+        if inicio > fim:
+            continue
+
+        meio = (inicio + fim) // 2
+        no = nos[meio]
+        no.tamanho = fim - inicio + 1
+        no.altura = no.tamanho.bit_length()
+        no.esquerda = None
+        no.direita = None
+
+        if pai is None:
+            raiz = no
+        elif pela_esquerda:
+            pai.esquerda = no
+        else:
+            pai.direita = no
+
+        pilha.append((meio + 1, fim, no, False))
+        pilha.append((inicio, meio - 1, no, True))
+
+    return raiz
+
+class IndicePontuacao:
+    """Índice secundário ordenado por (pontuacao_recorde, nome_jogador).
+
+    Aponta para os mesmos nós da árvore por nome, então o top-N é um
+    percurso decrescente de O(log n + N) sem ordenar o ranking inteiro.
+    """
 
-class ArvoreAVL:
     def __init__(self):
         self.raiz = None
-    
+
+    def obter_altura(self, no: NoIndicePontuacao) -> int:
+        return no.altura if no else 0
+
+    def atualizar_altura(self, no: NoIndicePontuacao):
+        no.altura = 1 + max(self.obter_altura(no.esquerda), self.obter_altura(no.direita))
+
+    def obter_tamanho(self, no: NoIndicePontuacao) -> int:
+        return no.tamanho if no else 0
+
+    def atualizar_tamanho(self, no: NoIndicePontuacao):
+        no.tamanho = 1 + self.obter_tamanho(no.esquerda) + self.obter_tamanho(no.direita)
+
+    def obter_balanceamento(self, no: NoIndicePontuacao) -> int:
+        return self.obter_altura(no.esquerda) - self.obter_altura(no.direita) if no else 0
+
+    def rotacionar_direita(self, y: NoIndicePontuacao) -> NoIndicePontuacao:
+        x = y.esquerda
+        y.esquerda = x.direita
+        x.direita = y
+        self.atualizar_altura(y)
+        self.atualizar_tamanho(y)
+        self.atualizar_altura(x)
+        self.atualizar_tamanho(x)
+        return x
+
+    def rotacionar_esquerda(self, x: NoIndicePontuacao) -> NoIndicePontuacao:
+        y = x.direita
+        x.direita = y.esquerda
+        y.esquerda = x
+        self.atualizar_altura(x)
+        self.atualizar_tamanho(x)
+        self.atualizar_altura(y)
+        self.atualizar_tamanho(y)
+        return y
+
+    def balancear(self, no: NoIndicePontuacao) -> NoIndicePontuacao:
+        # Altura e tamanho calculados em linha: é o caminho mais quente da inserção
+        esquerda, direita = no.esquerda, no.direita
+        altura_esquerda = esquerda.altura if esquerda else 0
+        altura_direita = direita.altura if direita else 0
+        no.altura = 1 + (altura_esquerda if altura_esquerda > altura_direita else altura_direita)
+        no.tamanho = 1 + (esquerda.tamanho if esquerda else 0) + (direita.tamanho if direita else 0)
+        balanceamento = altura_esquerda - altura_direita
+
+        if balanceamento > 1:
+            if self.obter_balanceamento(no.esquerda) < 0:
+                no.esquerda = self.rotacionar_esquerda(no.esquerda)
+            return self.rotacionar_direita(no)
+        if balanceamento < -1:
+            if self.obter_balanceamento(no.direita) > 0:
+                no.direita = self.rotacionar_direita(no.direita)
+            return self.rotacionar_esquerda(no)
+
+        return no
+
+    def inserir(self, jogador: NoAVL):
+        chave = (jogador.pontuacao_recorde, jogador.nome_jogador)
+        caminho = []
+        no = self.raiz
+        while no:
+            if chave < no.chave:
+                caminho.append((no, True))
+                no = no.esquerda
+            elif chave > no.chave:
+                caminho.append((no, False))
+                no = no.direita
+            else:
+                no.jogador = jogador
+                return
+
+        self.raiz = religar_caminho(caminho, NoIndicePontuacao(chave, jogador), self.balancear, 1)
+
+    def remover(self, pontuacao: int, nome_jogador: str):
+        chave = (pontuacao, nome_jogador)
+        caminho = []
+        no = self.raiz
+        while no and no.chave != chave:
+            if chave < no.chave:
+                caminho.append((no, True))
+                no = no.esquerda
+            else:
+                caminho.append((no, False))
+                no = no.direita
+
+        if not no:
+            return
+
+        if no.esquerda and no.direita:
+            # Copia o sucessor para este nó e remove o sucessor da subárvore direita
+            alvo = no
+            caminho.append((no, False))
+            no = no.direita
+            while no.esquerda:
+                caminho.append((no, True))
+                no = no.esquerda
+            alvo.chave = no.chave
+            alvo.jogador = no.jogador
+            substituto = no.direita
+        else:
+            substituto = no.esquerda or no.direita
+
+        self.raiz = religar_caminho(caminho, substituto, self.balancear, -1)
+
+    def construir(self, jogadores: Iterable[NoAVL]):
+        """Reconstrói o índice inteiro de uma vez, sem inserções individuais"""
+        nos = [NoIndicePontuacao((jogador.pontuacao_recorde, jogador.nome_jogador), jogador)
+               for jogador in jogadores]
+        nos.sort(key=lambda no: no.chave)
+        self.raiz = construir_balanceada(nos)
+
+    def mesclar(self, alterados: Dict[str, NoAVL]):
+        """Reconstrói o índice em O(n + m log m) trocando as chaves dos jogadores alterados.
+
+        As chaves antigas dos alterados saem num percurso em ordem; as novas
+        são intercaladas com o resto e a árvore é remontada.
+        """
+        nos = [no for no in percorrer_em_ordem(self.raiz) if no.chave[1] not in alterados]
+        nos.extend(NoIndicePontuacao((jogador.pontuacao_recorde, jogador.nome_jogador), jogador)
+                   for jogador in alterados.values())
+        # Duas sequências já ordenadas: o timsort as intercala em O(n + m log m)
+        nos.sort(key=attrgetter("chave"))
+        self.raiz = construir_balanceada(nos)
+
+    def atualizar_recorde(self, jogador: NoAVL, nova_pontuacao: int):
+        """Move o jogador para a nova chave mantendo o índice sincronizado."""
+        self.remover(jogador.pontuacao_recorde, jogador.nome_jogador)
+        jogador.pontuacao_recorde = nova_pontuacao
+        self.inserir(jogador)
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        resultados = []
+        if n <= 0:
+            return resultados
+        for no in percorrer_em_ordem(self.raiz, decrescente=True):
+            resultados.append(no.jogador)
+            if len(resultados) >= n:
+                break
+        return resultados
+
+    def posicao(self, pontuacao: int, nome_jogador: str) -> Optional[int]:
+        """Posição (1 = maior pontuação) da chave, em O(log n)"""
+        chave = (pontuacao, nome_jogador)
+        maiores = 0
+        no = self.raiz
+        while no:
+            if chave < no.chave:
+                maiores += 1 + self.obter_tamanho(no.direita)
+                no = no.esquerda
+            elif chave > no.chave:
+                no = no.direita
+            else:
+                return maiores + self.obter_tamanho(no.direita) + 1
+        return None
+
+    def contar_maiores(self, pontuacao: int, nome_jogador: str) -> int:
+        """Quantas chaves ficam acima de (pontuacao, nome), estando ela no índice ou não"""
+        chave = (pontuacao, nome_jogador)
+        maiores = 0
+        no = self.raiz
+        while no:
+            if chave < no.chave:
+                maiores += 1 + self.obter_tamanho(no.direita)
+                no = no.esquerda
+            elif chave > no.chave:
+                no = no.direita
+            else:
+                return maiores + self.obter_tamanho(no.direita)
+        return maiores
+
+    def selecionar(self, posicao: int) -> Optional[NoAVL]:
+        """Jogador na posição k do ranking (1 = maior pontuação), em O(log n)"""
+        if posicao < 1 or posicao > self.obter_tamanho(self.raiz):
+            return None
+
+        no = self.raiz
+        while no:
+            tamanho_direita = self.obter_tamanho(no.direita)
+            if posicao <= tamanho_direita:
+                no = no.direita
+            elif posicao == tamanho_direita + 1:
+                return no.jogador
+            else:
+                posicao -= tamanho_direita + 1
+                no = no.esquerda
+        return None
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        for no in percorrer_em_ordem(self.raiz, decrescente=True):
+            yield no.jogador
+
+    def depois_de(self, chave: Optional[Tuple[int, str]], crescente: bool = False) -> Iterator[NoAVL]:
+        """Jogadores depois de (pontuação, nome) na ordem do ranking, ou na inversa"""
+        for no in percorrer_depois(self.raiz, attrgetter("chave"), chave, decrescente=not crescente):
+            yield no.jogador
+
+    def intervalo(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        """Jogadores com recorde entre minimo e maximo, do maior para o menor"""
+        for no in percorrer_a_partir(self.raiz, lambda no: no.chave[0], maximo, decrescente=True):
+            if no.chave[0] < minimo:
+                break
+            yield no.jogador
+
+class IndiceMudancas:
+    """Nomes dos jogadores em ordem da versão da última alteração.
+
+    As versões só crescem, então marcar um jogador é levá-lo para o fim
+    (O(1)) e os alterados depois de uma versão formam o sufixo, lido de trás
+    para frente em O(k). A trava deixa a thread da API ler enquanto o jogo
+    marca.
+    """
+
+    def __init__(self):
+        self._versoes: "OrderedDict[str, int]" = OrderedDict()
+        self._trava = threading.Lock()
+
+    def marcar(self, nomes: Iterable[str], versao: int):
+        with self._trava:
+            for nome_jogador in nomes:
+                self._versoes[nome_jogador] = versao
+                self._versoes.move_to_end(nome_jogador)
+
+    def desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[Tuple[str, int]]]:
+        """(nome, versão) dos alterados depois de versao, do mais antigo ao mais novo; None se passarem de limite"""
+        alterados = []
+        with self._trava:
+            for nome_jogador, versao_jogador in reversed(self._versoes.items()):
+                if versao_jogador <= versao:
+                    break
+                if limite is not None and len(alterados) == limite:
+                    return None
+                alterados.append((nome_jogador, versao_jogador))
+        alterados.reverse()
+        return alterados
+
+class ArmazenamentoRanking(ABC):
+    """Interface comum dos motores de ranking usados pelo jogo e pela API.
+
+    Os motores guardam NoAVL e precisam implementar inserir, buscar,
+    contar_jogadores, em_ordem (por nome), em_ordem_decrescente (por
+    pontuação), posicao_jogador, jogador_na_posicao, construir_de_ordenados
+    e as consultas de intervalo (intervalo_pontuacao, prefixo_nome), estas
+    em O(log n + k). O restante sai dessas operações.
+
+    versao cresce a cada alteração (inserir, registrar_fim_avl, lotes e
+    cargas): quem guarda algo derivado do ranking compara a versão em vez
+    de recalcular. Cada jogador alterado guarda essa versão em
+    versao_alteracao, e os motores que têm um IndiceMudancas (mudancas)
+    respondem mudancas_desde sem percorrer o ranking.
+    """
+
+    versao = 0
+    mudancas: Optional[IndiceMudancas] = None
+
+    @abstractmethod
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        """Registra uma AVL; momento em segundos desde a época (None = agora)"""
+
+    @abstractmethod
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        ...
+
+    @abstractmethod
+    def contar_jogadores(self) -> int:
+        ...
+
+    @abstractmethod
+    def em_ordem(self) -> Iterator[NoAVL]:
+        ...
+
+    @abstractmethod
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        ...
+
+    @abstractmethod
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        ...
+
+    @abstractmethod
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        ...
+
+    @abstractmethod
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        """Jogadores com recorde em [minimo, maximo], na ordem do ranking"""
+
+    @abstractmethod
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        """Jogadores cujo nome começa com prefixo, em ordem de nome"""
+
+    # Paginação por chave: cada página continua do último item da anterior.
+    # Os motores com índice sobrescrevem os percursos e a seleção por nome,
+    # que aqui ficam em O(n) a partir das operações básicas.
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        """Jogadores depois da chave (pontuação, nome), na ordem do ranking ou na inversa"""
+        ordem = reversed(list(self.em_ordem_decrescente())) if crescente else self.em_ordem_decrescente()
+        for no in ordem:
+            chave = (no.pontuacao_recorde, no.nome_jogador)
+            if depois is None or (chave > depois if crescente else chave < depois):
+                yield no
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        """Jogadores depois do nome, em ordem de nome crescente ou decrescente"""
+        ordem = self.em_ordem() if crescente else reversed(list(self.em_ordem()))
+        for no in ordem:
+            if depois is None or (no.nome_jogador > depois if crescente else no.nome_jogador < depois):
+                yield no
+
+    def pagina_pontuacao(self, limite: int, depois: Optional[Tuple[int, str]] = None,
+                         crescente: bool = False) -> List[NoAVL]:
+        return list(islice(self.a_partir_pontuacao(depois, crescente), max(limite, 0)))
+
+    def pagina_nome(self, limite: int, depois: Optional[str] = None, crescente: bool = True) -> List[NoAVL]:
+        return list(islice(self.a_partir_nome(depois, crescente), max(limite, 0)))
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        """k-ésimo jogador em ordem de nome (1 = o primeiro)"""
+        if posicao < 1:
+            return None
+        return next(islice(self.em_ordem(), posicao - 1, None), None)
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        """Aplica várias AVLs terminadas, cada uma como inserir + registrar_fim_avl"""
+        momento = agora() if momento is None else momento
+        for nome_jogador, pontuacao, eventos, chefes, morreu in resultados:
+            self.inserir(nome_jogador, pontuacao, momento)
+            self.registrar_fim_avl(nome_jogador, eventos, chefes, morreu)
+
+    def fechar(self):
+        """Libera o que o motor segura fora da memória (processos, arquivo mapeado); nos outros, nada"""
+
+    def _carimbar(self, nos: Iterable[NoAVL]):
+        """Avança a versao e a grava nos jogadores alterados e no índice de mudanças"""
+        self.versao += 1
+        nomes = []
+        for no in nos:
+            no.versao_alteracao = self.versao
+            nomes.append(no.nome_jogador)
+        if self.mudancas is not None:
+            self.mudancas.marcar(nomes, self.versao)
+
+    def _carimbar_carga(self, nos: Iterable[NoAVL]):
+        """Carga que substitui o ranking: todos os jogadores mudam na nova versão"""
+        if self.mudancas is not None:
+            self.mudancas = IndiceMudancas()
+        self._carimbar(nos)
+
+    def mudancas_desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[NoAVL]]:
+        """Jogadores alterados depois de versao, do alterado há mais tempo ao mais recente.
+
+        None se forem mais de limite: aí sai mais barato recarregar o ranking
+        inteiro. Sem índice de mudanças, percorre todos os jogadores.
+        """
+        if self.mudancas is not None:
+            alterados = self.mudancas.desde(versao, limite)
+            return None if alterados is None else [self.buscar(nome_jogador) for nome_jogador, _ in alterados]
+        nos = sorted((no for no in self.em_ordem() if no.versao_alteracao > versao),
+                     key=attrgetter("versao_alteracao"))
+        return None if limite is not None and len(nos) > limite else nos
+
+    def instantaneo(self) -> "ArmazenamentoRanking":
+        """Visão de leitura consistente para outra thread.
+
+        Motores que alteram nós no lugar devolvem a si mesmos, sem isolamento;
+        o motor persistente devolve uma versão imutável.
+        """
+        return self
+
+    def registrar_fim_avl(self, nome_jogador: str, eventos: int, chefes: int, morreu: bool) -> Optional[NoAVL]:
+        """Atualiza recorde de eventos, chefes e mortes de um jogador já registrado"""
+        no = self.buscar(nome_jogador)
+        if no:
+            self._carimbar((no,))
+            if eventos > no.record_eventos:
+                no.record_eventos = eventos
+            no.chefes_derrotados += chefes
+            no.total_avls = len(no.historico_avls)
+            if morreu:
+                no.contador_mortes += 1
+        return no
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        return list(islice(self.em_ordem_decrescente(), max(n, 0)))
+
+    def top_n_pontuacoes(self, n: int) -> List[Tuple[str, int, int, int, int]]:
+        return [
+            (
+                no.nome_jogador,
+                no.pontuacao_recorde,
+                no.record_eventos,
+                no.chefes_derrotados,
+                no.total_avls
+            )
+            for no in self.top_n(n)
+        ]
+
+    def registros(self) -> Iterator[dict]:
+        """Registros planos em ordem de nome, gerados sob demanda"""
+        for no in self.em_ordem():
+            yield registro_do_no(no)
+
+    def pontuacoes_recorde(self) -> Iterator[int]:
+        """Recorde de cada jogador, em qualquer ordem"""
+        for no in self.em_ordem():
+            yield no.pontuacao_recorde
+
+    def pontuacoes_avls(self) -> Iterator[int]:
+        """Todas as pontuações de todos os históricos, em qualquer ordem"""
+        for no in self.em_ordem():
+            yield from islice(no.historico_avls, tamanho_historico(no))
+
+    def contadores_jogadores(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """(pontuação recorde, chefes, recorde de eventos, AVLs, mortes) de cada jogador, em qualquer ordem"""
+        for no in self.em_ordem():
+            yield (no.pontuacao_recorde, no.chefes_derrotados, no.record_eventos,
+                   no.total_avls, no.contador_mortes)
+
+    def avls_desde(self, momento: int) -> Iterator[Tuple[int, str, int]]:
+        """(momento, nome, pontuação) das AVLs a partir de momento, em qualquer ordem.
+
+        O histórico de cada jogador está em ordem de chegada, então só a cauda
+        recente é lida.
+        """
+        for no in self.em_ordem():
+            datas = no.historico_datas
+            i = fim = tamanho_historico(no)
+            while i and datas[i - 1] >= momento:
+                i -= 1
+            for j in range(i, fim):
+                yield datas[j], no.nome_jogador, no.historico_avls[j]
+
+    def carregar_lista_json(self, arquivo: str):
+        """Carrega o formato plano (lista de jogadores) de data/ranking.json"""
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            registros = json.load(f)
+
+        self.construir_de_ordenados(registros)
+
+    def salvar_para_ndjson(self, arquivo: str):
+        """Uma linha JSON por jogador, em ordem de nome, sem montar o documento inteiro"""
+        codificar = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.writelines(codificar(registro) + "\n" for registro in self.registros())
+
+    def carregar_de_ndjson(self, arquivo: str):
+        """Carga em massa direto do fluxo de linhas; a saída de salvar_para_ndjson já vem ordenada"""
+        self.construir_de_ordenados(ler_registros_ndjson(arquivo))
+
+class ArvoreAVL(ArmazenamentoRanking):
+    def __init__(self):
+        self.raiz = None
+        self.indice_pontuacao = IndicePontuacao()
+        self.mudancas = IndiceMudancas()
+
     def obter_altura(self, no: NoAVL) -> int:
         return no.altura if no else 0
 
     def atualizar_altura(self, no: NoAVL):
         no.altura = 1 + max(self.obter_altura(no.esquerda), self.obter_altura(no.direita))
 
+    def obter_tamanho(self, no: NoAVL) -> int:
+        return no.tamanho if no else 0
+
+    def atualizar_tamanho(self, no: NoAVL):
+        no.tamanho = 1 + self.obter_tamanho(no.esquerda) + self.obter_tamanho(no.direita)
+
     def obter_balanceamento(self, no: NoAVL) -> int:
         return self.obter_altura(no.esquerda) - self.obter_altura(no.direita) if no else 0
 
     def rotacionar_direita(self, y: NoAVL) -> NoAVL:
         x = y.esquerda
         T2 = x.direita
-        
+
         x.direita = y
         y.esquerda = T2
-        
+
         self.atualizar_altura(y)
+        self.atualizar_tamanho(y)
         self.atualizar_altura(x)
-        
+        self.atualizar_tamanho(x)
+
         return x
 
     def rotacionar_esquerda(self, x: NoAVL) -> NoAVL:
         y = x.direita
         T2 = y.esquerda
-        
+
         y.esquerda = x
         x.direita = T2
-        
+
         self.atualizar_altura(x)
+        self.atualizar_tamanho(x)
         self.atualizar_altura(y)
-        
+        self.atualizar_tamanho(y)
+
         return y
 
-    def inserir(self, nome_jogador: str, pontuacao: int):
-        self.raiz = self._inserir_recursivo(self.raiz, nome_jogador, pontuacao)
+    def balancear(self, no: NoAVL) -> NoAVL:
+        # Altura e tamanho calculados em linha: é o caminho mais quente da inserção
+        esquerda, direita = no.esquerda, no.direita
+        altura_esquerda = esquerda.altura if esquerda else 0
+        altura_direita = direita.altura if direita else 0
+        no.altura = 1 + (altura_esquerda if altura_esquerda > altura_direita else altura_direita)
+        no.tamanho = 1 + (esquerda.tamanho if esquerda else 0) + (direita.tamanho if direita else 0)
+        balanceamento = altura_esquerda - altura_direita
 
-    def _inserir_recursivo(self, no: NoAVL, nome_jogador: str, pontuacao: int) -> NoAVL:
-        if not no:
-            novo_no = NoAVL(nome_jogador, pontuacao)
-            novo_no.historico_avls.append(pontuacao)
-            novo_no.total_avls = 1
-            return novo_no
-        
-        if nome_jogador < no.nome_jogador:
-            no.esquerda = self._inserir_recursivo(no.esquerda, nome_jogador, pontuacao)
-        elif nome_jogador > no.nome_jogador:
-            no.direita = self._inserir_recursivo(no.direita, nome_jogador, pontuacao)
-        else:
-            # Jogador já existe, atualiza recorde se necessário
-            if pontuacao > no.pontuacao_recorde:
-                no.pontuacao_recorde = pontuacao
-            no.historico_avls.append(pontuacao)
-            no.total_avls = len(no.historico_avls)
-            return no
-        
-        self.atualizar_altura(no)
-        balanceamento = self.obter_balanceamento(no)
-        
-        if balanceamento > 1 and nome_jogador < no.esquerda.nome_jogador:
+        if balanceamento > 1:
+            if self.obter_balanceamento(no.esquerda) < 0:
+                no.esquerda = self.rotacionar_esquerda(no.esquerda)
             return self.rotacionar_direita(no)
-        if balanceamento < -1 and nome_jogador > no.direita.nome_jogador:
+        if balanceamento < -1:
+            if self.obter_balanceamento(no.direita) > 0:
+                no.direita = self.rotacionar_direita(no.direita)
             return self.rotacionar_esquerda(no)
-        if balanceamento > 1 and nome_jogador > no.esquerda.nome_jogador:
-            no.esquerda = self.rotacionar_esquerda(no.esquerda)
-            return self.rotacionar_direita(no)
-        if balanceamento < -1 and nome_jogador < no.direita.nome_jogador:
-            no.direita = self.rotacionar_direita(no.direita)
-            return self.rotacionar_esquerda(no)
-        
+
         return no
 
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        caminho = []
+        no = self.raiz
+        while no:
+            if nome_jogador < no.nome_jogador:
+                caminho.append((no, True))
+                no = no.esquerda
+            elif nome_jogador > no.nome_jogador:
+                caminho.append((no, False))
+                no = no.direita
+            else:
+                # Jogador já existe, atualiza recorde se necessário
+                if pontuacao > no.pontuacao_recorde:
+                    self.indice_pontuacao.atualizar_recorde(no, pontuacao)
+                acrescentar_pontuacao(no, pontuacao, momento)
+                self._carimbar((no,))
+                return
+
+        novo_no = NoAVL(nome_jogador, pontuacao)
+        acrescentar_pontuacao(novo_no, pontuacao, momento)
+        self.indice_pontuacao.inserir(novo_no)
+        self.raiz = religar_caminho(caminho, novo_no, self.balancear, 1)
+        self._carimbar((novo_no,))
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        """Ordena o lote e o intercala com a árvore num só percurso, remontando as duas árvores.
+
+        Fica O(n + m log m) em vez de m descidas com rebalanceamento; lotes
+        pequenos perto do tamanho da árvore continuam indo um a um.
+        """
+        resultados = list(resultados)
+        if not lote_compensa_mesclar(len(resultados), self.contar_jogadores()):
+            super().inserir_lote(resultados, momento)
+            return
+
+        alterados = {}
+        lote = ordenar_lote(resultados)
+        with sem_coleta_ciclica():
+            nos = mesclar_lote(percorrer_em_ordem(self.raiz), lote, alterados, momento)
+            self.indice_pontuacao.mesclar(alterados)
+            self.raiz = construir_balanceada(nos)
+        self._carimbar(self.buscar(nome_jogador) for nome_jogador in nomes_do_lote(lote))
+
     def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
-        return self._buscar_recursivo(self.raiz, nome_jogador)
-    
-    def _buscar_recursivo(self, no: NoAVL, nome_jogador: str) -> Optional[NoAVL]:
-        if not no or no.nome_jogador == nome_jogador:
-            return no
-        
-        if nome_jogador < no.nome_jogador:
-            return self._buscar_recursivo(no.esquerda, nome_jogador)
-        return self._buscar_recursivo(no.direita, nome_jogador)
+        no = self.raiz
+        while no:
+            nome_no = no.nome_jogador
+            if nome_jogador < nome_no:
+                no = no.esquerda
+            elif nome_jogador > nome_no:
+                no = no.direita
+            else:
+                return no
+        return None
 
-    def top_n_pontuacoes(self, n: int) -> List[Tuple[str, int, int, int, int]]:
-        resultados = []
-        self._obter_top_n_recursivo(self.raiz, n, resultados)
-        return resultados
-    
-    def _obter_top_n_recursivo(self, no: NoAVL, n: int, resultados: List[Tuple[str, int, int, int, int]]):
-        """Percorre a árvore em ordem decrescente (direita-raiz-esquerda)"""
-        if no and len(resultados) < n:
-            # Primeiro vai para a direita (maiores valores)
-            self._obter_top_n_recursivo(no.direita, n, resultados)
-            
-            if len(resultados) < n:
-                # Adiciona o nó atual
-                resultados.append((
-                    no.nome_jogador, 
-                    no.pontuacao_recorde,
-                    no.record_eventos,
-                    no.chefes_derrotados,
-                    no.total_avls
-                ))
-                # Depois vai para a esquerda
-                self._obter_top_n_recursivo(no.esquerda, n, resultados)
+    def em_ordem(self) -> Iterator[NoAVL]:
+        return percorrer_em_ordem(self.raiz)
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.em_ordem_decrescente()
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        """Top-N pelo índice de pontuação, não pela ordem alfabética da árvore"""
+        return self.indice_pontuacao.top_n(n)
 
     def contar_jogadores(self) -> int:
-        return self._contar_recursivo(self.raiz)
-    
-    def _contar_recursivo(self, no: NoAVL) -> int:
+        return self.obter_tamanho(self.raiz)
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.intervalo(minimo, maximo)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        for no in percorrer_a_partir(self.raiz, lambda no: no.nome_jogador, prefixo):
+            if not no.nome_jogador.startswith(prefixo):
+                break
+            yield no
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
         if not no:
-            return 0
-        return 1 + self._contar_recursivo(no.esquerda) + self._contar_recursivo(no.direita)
-
-    def imprimir_arvore(self, nivel: int = 0, prefixo: str = "", no: NoAVL = None):
-        if no is None:
-            no = self.raiz
-            if no is None:
-                print("Árvore vazia")
-                return
-        
-        if no.direita:
-            self.imprimir_arvore(nivel + 1, "┌── ", no.direita)
-        
-        print(" " * (nivel * 4) + prefixo + f"{no.nome_jogador} ({no.pontuacao_recorde})")
-        
-        if no.esquerda:
-            self.imprimir_arvore(nivel + 1, "└── ", no.esquerda)
+            return None
+        return self.indice_pontuacao.posicao(no.pontuacao_recorde, no.nome_jogador)
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        return self.indice_pontuacao.selecionar(posicao)
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.depois_de(depois, crescente)
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        return percorrer_depois(self.raiz, attrgetter("nome_jogador"), depois, decrescente=not crescente)
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        return selecionar_em_ordem(self.raiz, posicao)
+
+    def imprimir_arvore(self):
+        if self.raiz is None:
+            print("Árvore vazia")
+            return
+
+        # Direita-raiz-esquerda com pilha explícita, guardando nível e prefixo
+        pilha = []
+        no, nivel, prefixo = self.raiz, 0, ""
+        while pilha or no:
+            while no:
+                pilha.append((no, nivel, prefixo))
+                no, nivel, prefixo = no.direita, nivel + 1, "┌── "
+            no, nivel, prefixo = pilha.pop()
+            print(" " * (nivel * 4) + prefixo + f"{no.nome_jogador} ({no.pontuacao_recorde})")
+            no, nivel, prefixo = no.esquerda, nivel + 1, "└── "
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        """Carga em massa em O(n) a partir de registros ordenados por nome.
+
+        Substitui o conteúdo da árvore. Registros fora de ordem são ordenados
+        antes; nomes repetidos são rejeitados.
+        """
+        nos = nos_ordenados_por_nome(registros)
+        self.raiz = construir_balanceada(nos)
+        self.indice_pontuacao = IndicePontuacao()
+        self.indice_pontuacao.construir(nos)
+        self._carimbar_carga(nos)
 
     def salvar_para_json(self, arquivo: str):
-        dados = self._serializar_recursivo(self.raiz)
+        dados = self._serializar(self.raiz)
         with open(arquivo, 'w', encoding='utf-8') as f:
             json.dump(dados, f, indent=2, ensure_ascii=False)
-    
-    def _serializar_recursivo(self, no: NoAVL) -> dict:
-        if not no:
-            return None
-        
-        return {
-            "nome_jogador": no.nome_jogador,
-            "pontuacao_recorde": no.pontuacao_recorde,
-            "altura": no.altura,
-            "historico_avls": no.historico_avls,
-            "contador_mortes": no.contador_mortes,
-            "record_eventos": no.record_eventos,
-            "chefes_derrotados": no.chefes_derrotados,
-            "total_avls": no.total_avls,
-            "esquerda": self._serializar_recursivo(no.esquerda),
-            "direita": self._serializar_recursivo(no.direita)
-        }
+
+    def _serializar(self, raiz: NoAVL) -> Optional[dict]:
+        """Gera o documento aninhado em pré-ordem, ligando cada filho ao dict do pai"""
+        documento = {"raiz": None}
+        pilha = [(raiz, documento, "raiz")]
+        while pilha:
+            no, pai, lado = pilha.pop()
+            if not no:
+                continue
+
+            dados = {
+                "nome_jogador": no.nome_jogador,
+                "pontuacao_recorde": no.pontuacao_recorde,
+                "altura": no.altura,
+                "historico_avls": no.historico_avls.tolist(),
+                "historico_datas": no.historico_datas.tolist(),
+                "contador_mortes": no.contador_mortes,
+                "record_eventos": no.record_eventos,
+                "chefes_derrotados": no.chefes_derrotados,
+                "total_avls": no.total_avls,
+                "esquerda": None,
+                "direita": None
+            }
+            pai[lado] = dados
+            pilha.append((no.direita, dados, "direita"))
+            pilha.append((no.esquerda, dados, "esquerda"))
+
+        return documento["raiz"]
 
     def carregar_de_json(self, arquivo: str):
         with open(arquivo, 'r', encoding='utf-8') as f:
             dados = json.load(f)
-        
-        self.raiz = self._deserializar_recursivo(dados)
-    
-    def _deserializar_recursivo(self, dados: dict) -> NoAVL:
+
+        self.raiz = self._deserializar(dados)
+        self.reconstruir_indice_pontuacao()
+        self._carimbar_carga(self.em_ordem())
+
+    def reconstruir_indice_pontuacao(self):
+        self.indice_pontuacao = IndicePontuacao()
+        self.indice_pontuacao.construir(self.em_ordem())
+
+    def _deserializar(self, dados: Optional[dict]) -> Optional[NoAVL]:
         if not dados:
             return None
-        
-        no = NoAVL(dados["nome_jogador"], dados["pontuacao_recorde"])
-        no.altura = dados["altura"]
-        no.historico_avls = dados["historico_avls"]
-        no.contador_mortes = dados["contador_mortes"]
-        no.record_eventos = dados["record_eventos"]
-        no.chefes_derrotados = dados["chefes_derrotados"]
-        no.total_avls = dados["total_avls"]
-        no.esquerda = self._deserializar_recursivo(dados["esquerda"])
-        no.direita = self._deserializar_recursivo(dados["direita"])
-        
-        return no
+
+        raiz = None
+        pre_ordem = []
+        pilha = [(dados, None, True)]
+        while pilha:
+            dados_no, pai, pela_esquerda = pilha.pop()
+            if not dados_no:
+                continue
+
+            no = no_do_registro(dados_no)
+            no.altura = dados_no["altura"]
+
+            if pai is None:
+                raiz = no
+            elif pela_esquerda:
+                pai.esquerda = no
+            else:
+                pai.direita = no
+
+            pre_ordem.append(no)
+            pilha.append((dados_no["direita"], no, False))
+            pilha.append((dados_no["esquerda"], no, True))
+
+        # Pré-ordem invertida visita filhos antes dos pais
+        for no in reversed(pre_ordem):
+            self.atualizar_tamanho(no)
+
+        return raiz
@@ -0,0 +1,111 @@
+"""Somas globais do ranking, mantidas a cada alteração de um jogador.
+
+O cabeçalho do ranking e /api/estatisticas precisam de médias e totais
+sobre todos os jogadores. Em vez de percorrer o ranking a cada
+requisição, cada alteração troca a contribuição antiga do jogador pela
+nova: O(1) por AVL, e o resumo sai das somas em O(1).
+"""
+from typing import Iterable, Optional, Tuple
+
+from AVL import ArmazenamentoRanking, NoAVL
+
+# (pontuação recorde, chefes, recorde de eventos, taxa de vitória, AVLs, mortes) de um jogador
+Contribuicao = Tuple[int, int, int, int, int, int]
+
+def taxa_vitoria(total_avls: int, contador_mortes: int) -> int:
+    vitorias = max(0, total_avls - contador_mortes)
+    return int((vitorias / total_avls * 100)) if total_avls > 0 else 0
+
+def calcular_taxa_vitoria(no: NoAVL) -> int:
+    return taxa_vitoria(no.total_avls, no.contador_mortes)
+
+def contribuicao_dos_contadores(pontuacao_recorde: int, chefes: int, record_eventos: int,
+                                total_avls: int, contador_mortes: int) -> Contribuicao:
+    return (pontuacao_recorde, chefes, record_eventos,
+            taxa_vitoria(total_avls, contador_mortes), total_avls, contador_mortes)
+
+def contribuicao(no: Optional[NoAVL]) -> Optional[Contribuicao]:
+    """O que o jogador soma aos agregados agora; None se ele não está no ranking"""
+    if no is None:
+        return None
+    return contribuicao_dos_contadores(no.pontuacao_recorde, no.chefes_derrotados, no.record_eventos,
+                                       no.total_avls, no.contador_mortes)
+
+class AgregadosRanking:
+    """Contagem e somas por campo de todos os jogadores.
+
+    As somas ficam numa tupla trocada de uma vez: a thread da API sempre lê
+    um estado inteiro, nunca a contagem nova com as somas antigas. versao
+    cresce a cada troca, para quem guarda respostas derivadas delas.
+    """
+
+    def __init__(self):
+        # (jogadores, pontuação, chefes, eventos, taxa de vitória, AVLs, mortes)
+        self._somas: Tuple[int, ...] = (0,) * 7
+        self.versao = 0
+
+    @classmethod
+    def do_ranking(cls, ranking: ArmazenamentoRanking) -> "AgregadosRanking":
+        """Uma passada no ranking ao carregar; depois tudo é incremental"""
+        agregados = cls()
+        # contadores_jogadores não materializa nós no snapshot mapeado
+        agregados.somar(contribuicao_dos_contadores(*contadores) for contadores in ranking.contadores_jogadores())
+        return agregados
+
+    @classmethod
+    def das_somas(cls, somas: Tuple[int, ...]) -> "AgregadosRanking":
+        """Remonta das somas gravadas no snapshot binário, sem passar pelos jogadores"""
+        agregados = cls()
+        agregados._somas = tuple(somas)
+        return agregados
+
+    def somar(self, contribuicoes: Iterable[Contribuicao]):
+        somas = list(self._somas)
+        for valores in contribuicoes:
+            somas[0] += 1
+            for i, valor in enumerate(valores, 1):
+                somas[i] += valor
+        self._somas = tuple(somas)
+        self.versao += 1
+
+    def atualizar(self, anterior: Optional[Contribuicao], atual: Optional[Contribuicao]):
+        """Um jogador mudou: tira a contribuição antiga (None = jogador novo) e põe a nova"""
+        if anterior == atual:
+            return
+        somas = list(self._somas)
+        if anterior is not None:
+            somas[0] -= 1
+            for i, valor in enumerate(anterior, 1):
+                somas[i] -= valor
+        if atual is not None:
+            somas[0] += 1
+            for i, valor in enumerate(atual, 1):
+                somas[i] += valor
+        self._somas = tuple(somas)
+        self.versao += 1
+
+    @property
+    def somas(self) -> Tuple[int, ...]:
+        """(jogadores, pontuação, chefes, eventos, taxa de vitória, AVLs, mortes)"""
+        return self._somas
+
+    @property
+    def total_jogadores(self) -> int:
+        return self._somas[0]
+
+    @property
+    def total_mortes(self) -> int:
+        return self._somas[6]
+
+    def resumo(self) -> dict:
+        """Os campos de "estatisticas" do cabeçalho do ranking"""
+        jogadores, pontuacao, chefes, eventos, taxa_vitoria, avls, mortes = self._somas
+        return {
+            "total_jogadores": jogadores,
+            "pontuacao_media": pontuacao // jogadores if jogadores else 0,
+            "total_chefes": chefes,
+            "total_eventos": eventos,
+            "taxa_vitoria_media": taxa_vitoria // jogadores if jogadores else 0,
+            "total_avls": avls,
+            "total_mortes_registradas": mortes
+        }
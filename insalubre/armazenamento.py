@@ -0,0 +1,253 @@
+"""Motores de armazenamento do ranking, todos com a interface ArmazenamentoRanking.
+
+    avl         ArvoreAVL por nome + índice AVL por pontuação (padrão)
+    arranjo     listas ordenadas com busca binária (bisect), por nome e por pontuação
+    dicionario  dict por nome + lista ordenada de nomes + o mesmo índice AVL por pontuação
+    persistente AVL com cópia de caminho: leitores concorrentes veem versões imutáveis
+    fragmentado uma ArvoreAVL por processo, jogadores repartidos pelo hash do nome
+
+Todos guardam NoAVL, então o jogo, a persistência e as rotas não sabem
+qual motor está por trás.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from AVL import (ArmazenamentoRanking, ArvoreAVL, IndiceMudancas, IndicePontuacao, NoAVL, ResultadoAVL,
+                 acrescentar_pontuacao, lote_compensa_mesclar, mesclar_lote, nomes_do_lote, nos_ordenados_por_nome,
+                 ordenar_lote, sem_coleta_ciclica)
+from arvore_persistente import ArvoreAVLPersistente
+from ranking_fragmentado import RankingFragmentado
+
+def indices_depois(ordenada: list, depois, crescente: bool) -> range:
+    """Índices de uma lista ordenada estritamente depois de depois (None = do começo), na direção pedida"""
+    if crescente:
+        return range(0 if depois is None else bisect_right(ordenada, depois), len(ordenada))
+    return range((len(ordenada) if depois is None else bisect_left(ordenada, depois)) - 1, -1, -1)
+
+class ArranjoOrdenado(ArmazenamentoRanking):
+    """Dois arranjos ordenados: nomes e chaves (pontuação, nome), cada um com seus nós.
+
+    Busca e posição são bisect em O(log n); inserção e troca de recorde
+    deslocam a cauda do arranjo (O(n), mas um memmove contíguo). Leituras
+    percorrem memória sequencial, sem seguir ponteiros de árvore.
+    """
+
+    def __init__(self):
+        self.nomes: List[str] = []
+        self.nos: List[NoAVL] = []
+        self.chaves: List[Tuple[int, str]] = []
+        self.mudancas = IndiceMudancas()
+
+    def _indice_nome(self, nome_jogador: str) -> Optional[int]:
+        i = bisect_left(self.nomes, nome_jogador)
+        if i < len(self.nomes) and self.nomes[i] == nome_jogador:
+            return i
+        return None
+
+    def _indice_chave(self, pontuacao: int, nome_jogador: str) -> int:
+        return bisect_left(self.chaves, (pontuacao, nome_jogador))
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        i = bisect_left(self.nomes, nome_jogador)
+        if i < len(self.nomes) and self.nomes[i] == nome_jogador:
+            no = self.nos[i]
+            if pontuacao > no.pontuacao_recorde:
+                del self.chaves[self._indice_chave(no.pontuacao_recorde, nome_jogador)]
+                no.pontuacao_recorde = pontuacao
+                insort(self.chaves, (pontuacao, nome_jogador))
+            acrescentar_pontuacao(no, pontuacao, momento)
+            self._carimbar((no,))
+            return
+
+        novo_no = NoAVL(nome_jogador, pontuacao)
+        acrescentar_pontuacao(novo_no, pontuacao, momento)
+        self.nomes.insert(i, nome_jogador)
+        self.nos.insert(i, novo_no)
+        insort(self.chaves, (pontuacao, nome_jogador))
+        self._carimbar((novo_no,))
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        """Intercala o lote ordenado com os dois arranjos, em vez de um deslocamento por jogador"""
+        resultados = list(resultados)
+        if not lote_compensa_mesclar(len(resultados), len(self.nos)):
+            super().inserir_lote(resultados, momento)
+            return
+
+        alterados = {}
+        lote = ordenar_lote(resultados)
+        with sem_coleta_ciclica():
+            self.nos = mesclar_lote(self.nos, lote, alterados, momento)
+            self.nomes = [no.nome_jogador for no in self.nos]
+            chaves = [chave for chave in self.chaves if chave[1] not in alterados]
+            chaves.extend((no.pontuacao_recorde, nome) for nome, no in alterados.items())
+            chaves.sort()
+            self.chaves = chaves
+        self._carimbar(self.buscar(nome_jogador) for nome_jogador in nomes_do_lote(lote))
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        i = self._indice_nome(nome_jogador)
+        return self.nos[i] if i is not None else None
+
+    def contar_jogadores(self) -> int:
+        return len(self.nos)
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        return iter(self.nos)
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        for _, nome_jogador in reversed(self.chaves):
+            yield self.nos[self._indice_nome(nome_jogador)]
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
+        if not no:
+            return None
+        return len(self.chaves) - self._indice_chave(no.pontuacao_recorde, nome_jogador)
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        # (p,) vem antes de qualquer (p, nome), então os cortes não dependem do nome
+        inicio = bisect_left(self.chaves, (minimo,))
+        fim = bisect_left(self.chaves, (maximo + 1,))
+        for i in range(fim - 1, inicio - 1, -1):
+            yield self.buscar(self.chaves[i][1])
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        i = bisect_left(self.nomes, prefixo)
+        while i < len(self.nomes) and self.nomes[i].startswith(prefixo):
+            yield self.nos[i]
+            i += 1
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        if posicao < 1 or posicao > len(self.chaves):
+            return None
+        return self.buscar(self.chaves[-posicao][1])
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        for i in indices_depois(self.chaves, depois, crescente):
+            yield self.buscar(self.chaves[i][1])
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        for i in indices_depois(self.nomes, depois, crescente):
+            yield self.nos[i]
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        return self.nos[posicao - 1] if 1 <= posicao <= len(self.nos) else None
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        self.nos = nos_ordenados_por_nome(registros)
+        self.nomes = [no.nome_jogador for no in self.nos]
+        self.chaves = sorted((no.pontuacao_recorde, no.nome_jogador) for no in self.nos)
+        self._carimbar_carga(self.nos)
+
+class DicionarioComIndice(ArmazenamentoRanking):
+    """Busca por nome num dict (O(1)) e ordem de pontuação no IndicePontuacao.
+
+    A ordem de nome (em_ordem, prefixo_nome) fica numa lista ordenada à
+    parte, que só muda quando entra um jogador novo.
+    """
+
+    def __init__(self):
+        self.jogadores: Dict[str, NoAVL] = {}
+        self.nomes: List[str] = []
+        self.indice_pontuacao = IndicePontuacao()
+        self.mudancas = IndiceMudancas()
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        no = self.jogadores.get(nome_jogador)
+        if no:
+            if pontuacao > no.pontuacao_recorde:
+                self.indice_pontuacao.atualizar_recorde(no, pontuacao)
+            acrescentar_pontuacao(no, pontuacao, momento)
+            self._carimbar((no,))
+            return
+
+        novo_no = NoAVL(nome_jogador, pontuacao)
+        acrescentar_pontuacao(novo_no, pontuacao, momento)
+        self.jogadores[nome_jogador] = novo_no
+        insort(self.nomes, nome_jogador)
+        self.indice_pontuacao.inserir(novo_no)
+        self._carimbar((novo_no,))
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        resultados = list(resultados)
+        if not lote_compensa_mesclar(len(resultados), len(self.jogadores)):
+            super().inserir_lote(resultados, momento)
+            return
+
+        alterados = {}
+        lote = ordenar_lote(resultados)
+        with sem_coleta_ciclica():
+            nos = mesclar_lote(self.em_ordem(), lote, alterados, momento)
+            self.nomes = [no.nome_jogador for no in nos]
+            self.jogadores.update(alterados)
+            self.indice_pontuacao.mesclar(alterados)
+        self._carimbar(self.jogadores[nome_jogador] for nome_jogador in nomes_do_lote(lote))
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        return self.jogadores.get(nome_jogador)
+
+    def contar_jogadores(self) -> int:
+        return len(self.jogadores)
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        for nome_jogador in self.nomes:
+            yield self.jogadores[nome_jogador]
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.em_ordem_decrescente()
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        return self.indice_pontuacao.top_n(n)
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
+        if not no:
+            return None
+        return self.indice_pontuacao.posicao(no.pontuacao_recorde, no.nome_jogador)
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        return self.indice_pontuacao.selecionar(posicao)
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.intervalo(minimo, maximo)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        i = bisect_left(self.nomes, prefixo)
+        while i < len(self.nomes) and self.nomes[i].startswith(prefixo):
+            yield self.jogadores[self.nomes[i]]
+            i += 1
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.depois_de(depois, crescente)
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        for i in indices_depois(self.nomes, depois, crescente):
+            yield self.jogadores[self.nomes[i]]
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        return self.jogadores[self.nomes[posicao - 1]] if 1 <= posicao <= len(self.nomes) else None
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        nos = nos_ordenados_por_nome(registros)
+        self.jogadores = {no.nome_jogador: no for no in nos}
+        self.nomes = [no.nome_jogador for no in nos]
+        self.indice_pontuacao = IndicePontuacao()
+        self.indice_pontuacao.construir(nos)
+        self._carimbar_carga(nos)
+
+MOTORES = {
+    "avl": ArvoreAVL,
+    "arranjo": ArranjoOrdenado,
+    "dicionario": DicionarioComIndice,
+    "persistente": ArvoreAVLPersistente,
+    "fragmentado": RankingFragmentado,
+}
+
+MOTOR_PADRAO = "avl"
+
+def criar_armazenamento(motor: str = MOTOR_PADRAO) -> ArmazenamentoRanking:
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de ranking desconhecido: {motor} (opções: {', '.join(MOTORES)})")
+    return MOTORES[motor]()
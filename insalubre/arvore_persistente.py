@@ -0,0 +1,397 @@
+"""Ranking AVL persistente (cópia de caminho) para leitores concorrentes.
+
+Nenhum nó publicado é alterado: cada escrita copia os nós do caminho da
+raiz até o ponto alterado, nas árvores (nome, pontuação e mudanças), e publica
+as raízes novas numa única atribuição. As árvores guardam nós de
+ligação (NoIndicePontuacao, com o nome, a pontuação ou a versão como chave) que
+apontam para os registros NoAVL, então copiar um ancestral não duplica o
+jogador e o outro índice nunca fica apontando para uma cópia velha. O histórico
+de AVLs também é compartilhado: só a versão mais nova de um jogador acrescenta
+e cada versão lê o prefixo que tinha. Leitores pegam as raízes atuais com
+instantaneo() e percorrem uma versão imutável, sem trava: nunca veem uma
+rotação pela metade e nunca seguram o jogo.
+
+Pressupõe um único escritor (o laço do jogo).
+"""
+from operator import attrgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from AVL import (ArmazenamentoRanking, IndicePontuacao, NoAVL, NoIndicePontuacao, ResultadoAVL,
+                 acrescentar_pontuacao, construir_balanceada, lote_compensa_mesclar, mesclar_lote,
+                 nomes_do_lote, nos_ordenados_por_nome, ordenar_lote, percorrer_a_partir, percorrer_depois,
+                 percorrer_em_ordem, selecionar_em_ordem, sem_coleta_ciclica, tamanho_historico)
+
+def copiar_jogador(no: NoAVL, com_historico: bool = False) -> NoAVL:
+    """Cópia de um registro em O(1); as estatísticas só são duplicadas se a cópia for crescer.
+
+    Os arrays do histórico são sempre compartilhados: a cópia acrescenta no
+    fim e as versões antigas continuam lendo só o seu prefixo (tamanho_historico).
+    """
+    copia = NoAVL.__new__(NoAVL)
+    copia.nome_jogador = no.nome_jogador
+    copia.pontuacao_recorde = no.pontuacao_recorde
+    copia.altura = no.altura
+    copia.tamanho = no.tamanho
+    copia.esquerda = None
+    copia.direita = None
+    copia.historico_avls = no.historico_avls
+    copia.historico_datas = no.historico_datas
+    copia.estatisticas = no.estatisticas.copiar() if com_historico and no.estatisticas else no.estatisticas
+    copia.contador_mortes = no.contador_mortes
+    copia.record_eventos = no.record_eventos
+    copia.chefes_derrotados = no.chefes_derrotados
+    copia.total_avls = no.total_avls
+    copia.versao_alteracao = no.versao_alteracao
+    return copia
+
+def copiar_ligacao(no: NoIndicePontuacao) -> NoIndicePontuacao:
+    copia = NoIndicePontuacao.__new__(NoIndicePontuacao)
+    copia.chave = no.chave
+    copia.jogador = no.jogador
+    copia.altura = no.altura
+    copia.tamanho = no.tamanho
+    copia.esquerda = no.esquerda
+    copia.direita = no.direita
+    return copia
+
+def _atualizar(no):
+    esquerda, direita = no.esquerda, no.direita
+    altura_esquerda = esquerda.altura if esquerda else 0
+    altura_direita = direita.altura if direita else 0
+    no.altura = 1 + (altura_esquerda if altura_esquerda > altura_direita else altura_direita)
+    no.tamanho = 1 + (esquerda.tamanho if esquerda else 0) + (direita.tamanho if direita else 0)
+    return altura_esquerda - altura_direita
+
+def _balanceamento(no) -> int:
+    return ((no.esquerda.altura if no.esquerda else 0) -
+            (no.direita.altura if no.direita else 0))
+
+def _rotacionar_direita(y):
+    # y e y.esquerda já são cópias (o mesmo vale para x e x.direita abaixo)
+    x = y.esquerda
+    y.esquerda = x.direita
+    x.direita = y
+    _atualizar(y)
+    _atualizar(x)
+    return x
+
+def _rotacionar_esquerda(x):
+    y = x.direita
+    x.direita = y.esquerda
+    y.esquerda = x
+    _atualizar(x)
+    _atualizar(y)
+    return y
+
+def balancear_copiando(no: NoIndicePontuacao) -> NoIndicePontuacao:
+    """Rebalanceia uma cópia recém-feita; os filhos que a rotação mexe também são copiados"""
+    balanceamento = _atualizar(no)
+    if balanceamento > 1:
+        esquerda = no.esquerda = copiar_ligacao(no.esquerda)
+        if _balanceamento(esquerda) < 0:
+            esquerda.direita = copiar_ligacao(esquerda.direita)
+            no.esquerda = _rotacionar_esquerda(esquerda)
+        return _rotacionar_direita(no)
+    if balanceamento < -1:
+        direita = no.direita = copiar_ligacao(no.direita)
+        if _balanceamento(direita) > 0:
+            direita.esquerda = copiar_ligacao(direita.esquerda)
+            no.direita = _rotacionar_direita(direita)
+        return _rotacionar_esquerda(no)
+    return no
+
+def religar_copiando(caminho: List[Tuple[NoIndicePontuacao, bool]], subarvore) -> NoIndicePontuacao:
+    """Como religar_caminho, mas copiando cada ancestral em vez de alterá-lo"""
+    for pai, pela_esquerda in reversed(caminho):
+        novo = copiar_ligacao(pai)
+        if pela_esquerda:
+            novo.esquerda = subarvore
+        else:
+            novo.direita = subarvore
+        subarvore = balancear_copiando(novo)
+    return subarvore
+
+def inserir_copiando(raiz: Optional[NoIndicePontuacao], chave, jogador: NoAVL) -> NoIndicePontuacao:
+    """Nova raiz com o jogador na chave (troca só o ponteiro se a chave já existe)"""
+    caminho = []
+    no = raiz
+    while no:
+        if chave < no.chave:
+            caminho.append((no, True))
+            no = no.esquerda
+        elif chave > no.chave:
+            caminho.append((no, False))
+            no = no.direita
+        else:
+            substituto = copiar_ligacao(no)
+            substituto.jogador = jogador
+            return religar_copiando(caminho, substituto)
+    return religar_copiando(caminho, NoIndicePontuacao(chave, jogador))
+
+def remover_copiando(raiz: Optional[NoIndicePontuacao], chave) -> Optional[NoIndicePontuacao]:
+    caminho = []
+    no = raiz
+    while no and no.chave != chave:
+        if chave < no.chave:
+            caminho.append((no, True))
+            no = no.esquerda
+        else:
+            caminho.append((no, False))
+            no = no.direita
+    if no is None:
+        return raiz
+
+    if no.esquerda and no.direita:
+        # O sucessor sobe para o lugar do nó; a subárvore direita perde o mínimo
+        caminho_sucessor = []
+        sucessor = no.direita
+        while sucessor.esquerda:
+            caminho_sucessor.append((sucessor, True))
+            sucessor = sucessor.esquerda
+        substituto = copiar_ligacao(no)
+        substituto.chave = sucessor.chave
+        substituto.jogador = sucessor.jogador
+        substituto.direita = religar_copiando(caminho_sucessor, sucessor.direita)
+        substituto = balancear_copiando(substituto)
+    else:
+        substituto = no.esquerda or no.direita
+
+    return religar_copiando(caminho, substituto)
+
+def buscar_ligacao(raiz: Optional[NoIndicePontuacao], chave) -> Optional[NoAVL]:
+    no = raiz
+    while no:
+        if chave < no.chave:
+            no = no.esquerda
+        elif chave > no.chave:
+            no = no.direita
+        else:
+            return no.jogador
+    return None
+
+def construir_ligacoes(nos: List[NoAVL]) -> Tuple[NoIndicePontuacao, NoIndicePontuacao]:
+    """Raízes das duas árvores de ligação para jogadores em ordem de nome"""
+    indice = IndicePontuacao()
+    indice.construir(nos)
+    return construir_balanceada([NoIndicePontuacao(no.nome_jogador, no) for no in nos]), indice.raiz
+
+def chave_mudanca(no: NoAVL) -> Tuple[int, str]:
+    return no.versao_alteracao, no.nome_jogador
+
+class InstantaneoRanking(ArmazenamentoRanking):
+    """Uma versão publicada do ranking, só para leitura.
+
+    As consultas por pontuação reaproveitam o IndicePontuacao sobre a raiz
+    da versão; ninguém mais altera esses nós.
+    """
+
+    def __init__(self, raiz_nomes: Optional[NoIndicePontuacao], raiz_indice: Optional[NoIndicePontuacao],
+                 raiz_mudancas: Optional[NoIndicePontuacao] = None, versao: int = 0):
+        self.raiz_nomes = raiz_nomes
+        self.raiz_mudancas = raiz_mudancas
+        self.versao = versao
+        self.indice_pontuacao = IndicePontuacao()
+        self.indice_pontuacao.raiz = raiz_indice
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError("Instantâneo do ranking é somente leitura")
+
+    inserir = inserir_lote = registrar_fim_avl = construir_de_ordenados = _somente_leitura
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        return buscar_ligacao(self.raiz_nomes, nome_jogador)
+
+    def contar_jogadores(self) -> int:
+        return self.raiz_nomes.tamanho if self.raiz_nomes else 0
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        for no in percorrer_em_ordem(self.raiz_nomes):
+            yield no.jogador
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.em_ordem_decrescente()
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        return self.indice_pontuacao.top_n(n)
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
+        if not no:
+            return None
+        return self.indice_pontuacao.posicao(no.pontuacao_recorde, no.nome_jogador)
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        return self.indice_pontuacao.selecionar(posicao)
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.intervalo(minimo, maximo)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        for no in percorrer_a_partir(self.raiz_nomes, attrgetter("chave"), prefixo):
+            if not no.chave.startswith(prefixo):
+                break
+            yield no.jogador
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        return self.indice_pontuacao.depois_de(depois, crescente)
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        for no in percorrer_depois(self.raiz_nomes, attrgetter("chave"), depois, decrescente=not crescente):
+            yield no.jogador
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        no = selecionar_em_ordem(self.raiz_nomes, posicao)
+        return no.jogador if no else None
+
+    def mudancas_desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[NoAVL]]:
+        alterados = []
+        # (v,) vem antes de qualquer (v, nome): o percurso começa na primeira alteração da versão seguinte
+        for no in percorrer_a_partir(self.raiz_mudancas, attrgetter("chave"), (versao + 1,)):
+            if limite is not None and len(alterados) == limite:
+                return None
+            alterados.append(no.jogador)
+        return alterados
+
+class ArvoreAVLPersistente(ArmazenamentoRanking):
+    """Motor de ranking com versões imutáveis publicadas atomicamente.
+
+    As árvores (por nome, por pontuação e por (versao_alteracao, nome)) só
+    têm nós de ligação que apontam para registros NoAVL; um registro é
+    trocado por uma cópia quando os dados do jogador mudam, e nunca alterado
+    depois de publicado. Escrever custa O(log n) cópias de nó por árvore;
+    ler custa o mesmo que na ArvoreAVL, sobre o instantâneo da versão do
+    momento. O contador de versao é publicado junto com as raízes, então um
+    instantâneo nunca tem dados de uma versão e número de outra.
+    """
+
+    def __init__(self):
+        # (raiz por nome, raiz por pontuação, raiz por mudança, versao)
+        self._versao: Tuple[Optional[NoIndicePontuacao], Optional[NoIndicePontuacao],
+                            Optional[NoIndicePontuacao], int] = (None, None, None, 0)
+
+    @property
+    def versao(self) -> int:
+        return self._versao[3]
+
+    def instantaneo(self) -> InstantaneoRanking:
+        return InstantaneoRanking(*self._versao)
+
+    def _publicar(self, raiz_nomes: Optional[NoIndicePontuacao], raiz_indice: Optional[NoIndicePontuacao],
+                  raiz_mudancas: Optional[NoIndicePontuacao]):
+        self._versao = (raiz_nomes, raiz_indice, raiz_mudancas, self._versao[3] + 1)
+
+    def _publicar_jogador(self, anterior: Optional[NoAVL], novo: NoAVL):
+        """Troca o registro do jogador nas três árvores e publica as novas raízes"""
+        raiz_nomes, raiz_indice, raiz_mudancas, versao = self._versao
+        novo.versao_alteracao = versao + 1
+        if anterior is not None:
+            if anterior.pontuacao_recorde != novo.pontuacao_recorde:
+                raiz_indice = remover_copiando(raiz_indice, (anterior.pontuacao_recorde, anterior.nome_jogador))
+            raiz_mudancas = remover_copiando(raiz_mudancas, chave_mudanca(anterior))
+        raiz_indice = inserir_copiando(raiz_indice, (novo.pontuacao_recorde, novo.nome_jogador), novo)
+        raiz_nomes = inserir_copiando(raiz_nomes, novo.nome_jogador, novo)
+        raiz_mudancas = inserir_copiando(raiz_mudancas, chave_mudanca(novo), novo)
+        self._publicar(raiz_nomes, raiz_indice, raiz_mudancas)
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        anterior = buscar_ligacao(self._versao[0], nome_jogador)
+        if anterior is not None:
+            novo = copiar_jogador(anterior, com_historico=True)
+            acrescentar_pontuacao(novo, pontuacao, momento)
+            if pontuacao > novo.pontuacao_recorde:
+                novo.pontuacao_recorde = pontuacao
+        else:
+            novo = NoAVL(nome_jogador, pontuacao)
+            acrescentar_pontuacao(novo, pontuacao, momento)
+
+        self._publicar_jogador(anterior, novo)
+
+    def registrar_fim_avl(self, nome_jogador: str, eventos: int, chefes: int, morreu: bool) -> Optional[NoAVL]:
+        anterior = buscar_ligacao(self._versao[0], nome_jogador)
+        if anterior is None:
+            return None
+
+        novo = copiar_jogador(anterior)
+        if eventos > novo.record_eventos:
+            novo.record_eventos = eventos
+        novo.chefes_derrotados += chefes
+        novo.total_avls = tamanho_historico(novo)
+        if morreu:
+            novo.contador_mortes += 1
+
+        self._publicar_jogador(anterior, novo)
+        return novo
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        """Lotes grandes: intercala sobre cópias dos jogadores do lote e publica uma versão só"""
+        resultados = list(resultados)
+        if not lote_compensa_mesclar(len(resultados), self.contar_jogadores()):
+            super().inserir_lote(resultados, momento)
+            return
+
+        raiz_nomes, _, raiz_mudancas, versao = self._versao
+        lote = ordenar_lote(resultados)
+        nomes_lote = set(nomes_do_lote(lote))
+        with sem_coleta_ciclica():
+            existentes = (copiar_jogador(no.jogador, com_historico=True) if no.chave in nomes_lote else no.jogador
+                          for no in percorrer_em_ordem(raiz_nomes))
+            nos = mesclar_lote(existentes, lote, {}, momento)
+            # Só os jogadores do lote mudam de lugar na árvore de mudanças: O(k log n)
+            for no in nos:
+                if no.nome_jogador in nomes_lote:
+                    if no.versao_alteracao:
+                        raiz_mudancas = remover_copiando(raiz_mudancas, chave_mudanca(no))
+                    no.versao_alteracao = versao + 1
+                    raiz_mudancas = inserir_copiando(raiz_mudancas, chave_mudanca(no), no)
+            self._publicar(*construir_ligacoes(nos), raiz_mudancas)
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        nos = nos_ordenados_por_nome(registros)
+        for no in nos:
+            no.versao_alteracao = self.versao + 1
+        # Todos na mesma versão: a ordem de nome já é a ordem de (versão, nome)
+        raiz_mudancas = construir_balanceada([NoIndicePontuacao(chave_mudanca(no), no) for no in nos])
+        self._publicar(*construir_ligacoes(nos), raiz_mudancas)
+
+    # Leituras: cada chamada vê uma versão inteira
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        return buscar_ligacao(self._versao[0], nome_jogador)
+
+    def contar_jogadores(self) -> int:
+        return self.instantaneo().contar_jogadores()
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        return self.instantaneo().em_ordem()
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        return self.instantaneo().em_ordem_decrescente()
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        return self.instantaneo().top_n(n)
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        return self.instantaneo().posicao_jogador(nome_jogador)
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        return self.instantaneo().jogador_na_posicao(posicao)
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        return self.instantaneo().intervalo_pontuacao(minimo, maximo)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        return self.instantaneo().prefixo_nome(prefixo)
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        return self.instantaneo().a_partir_pontuacao(depois, crescente)
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        return self.instantaneo().a_partir_nome(depois, crescente)
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        return self.instantaneo().jogador_na_posicao_nome(posicao)
+
+    def mudancas_desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[NoAVL]]:
+        return self.instantaneo().mudancas_desde(versao, limite)
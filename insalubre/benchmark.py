@@ -0,0 +1,649 @@
+"""Benchmarks da Árvore AVL do ranking.
+
+Uso (a partir da pasta insalubre/):
+    python benchmark.py iterativo --jogadores 100000 1000000
+    python benchmark.py carga --jogadores 100000 1000000
+    python benchmark.py memoria --jogadores 100000 --historicos 0 10 100 1000
+    python benchmark.py snapshot --jogadores 100000 1000000
+    python benchmark.py ndjson --jogadores 1000000
+    python benchmark.py motores --jogadores 10000 100000 --operacoes 200000
+    python benchmark.py lote --jogadores 100000 --lotes 10000 100000 1000000
+    python benchmark.py concorrencia --jogadores 2000 --segundos 5 --leitores 4
+    python benchmark.py fragmentos --jogadores 100000 --fragmentos 1 2 4 8
+    python benchmark.py api --jogadores 100000 --trabalhadores 1 2 4 8 --clientes 16 --segundos 5
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import tempfile
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from typing import Callable, List, Optional
+
+from AVL import ArmazenamentoRanking, ArvoreAVL, NoAVL, acrescentar_pontuacao, no_do_registro
+from armazenamento import MOTORES, criar_armazenamento
+from persistencia import salvar_ranking
+from ranking_fragmentado import RankingFragmentado
+from snapshot_binario import SnapshotMapeado, escrever_snapshot_binario
+
+def gerar_nomes(quantidade: int, semente: int = 42) -> List[str]:
+    aleatorio = random.Random(semente)
+    nomes = [f"jogador_{i:07d}" for i in range(quantidade)]
+    aleatorio.shuffle(nomes)
+    return nomes
+
+def cronometrar(funcao: Callable[[], object]) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+def imprimir_linha(rotulo: str, operacoes: int, segundos: float, referencia: Optional[float] = None):
+    por_operacao = segundos / operacoes * 1e6 if operacoes else 0.0
+    linha = f"  {rotulo:<32} {segundos:>9.3f}s {por_operacao:>9.2f} µs/op"
+    if referencia:
+        linha += f"  ({referencia / segundos:.2f}x)"
+    print(linha)
+
+# ==================== REFERÊNCIA RECURSIVA ====================
+
+class ArvoreAVLRecursiva(ArvoreAVL):
+    """Inserção, busca e percurso recursivos como eram antes, só para comparação.
+
+    O nó é atualizado pelos mesmos ganchos da ArvoreAVL (histórico, índice de
+    pontuação e carimbo de versão): só a descida e o percurso mudam.
+    """
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        self.raiz = self._inserir_recursivo(self.raiz, nome_jogador, pontuacao, momento)
+
+    def _inserir_recursivo(self, no: NoAVL, nome_jogador: str, pontuacao: int, momento: Optional[int]) -> NoAVL:
+        if not no:
+            novo_no = NoAVL(nome_jogador, pontuacao)
+            acrescentar_pontuacao(novo_no, pontuacao, momento)
+            self.indice_pontuacao.inserir(novo_no)
+            self._carimbar((novo_no,))
+            return novo_no
+
+        if nome_jogador < no.nome_jogador:
+            no.esquerda = self._inserir_recursivo(no.esquerda, nome_jogador, pontuacao, momento)
+        elif nome_jogador > no.nome_jogador:
+            no.direita = self._inserir_recursivo(no.direita, nome_jogador, pontuacao, momento)
+        else:
+            if pontuacao > no.pontuacao_recorde:
+                self.indice_pontuacao.atualizar_recorde(no, pontuacao)
+            acrescentar_pontuacao(no, pontuacao, momento)
+            self._carimbar((no,))
+            return no
+
+        return self.balancear(no)
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        return self._buscar_recursivo(self.raiz, nome_jogador)
+
+    def _buscar_recursivo(self, no: NoAVL, nome_jogador: str) -> Optional[NoAVL]:
+        if not no or no.nome_jogador == nome_jogador:
+            return no
+        if nome_jogador < no.nome_jogador:
+            return self._buscar_recursivo(no.esquerda, nome_jogador)
+        return self._buscar_recursivo(no.direita, nome_jogador)
+
+    def em_ordem(self):
+        resultados = []
+        self._coletar_recursivo(self.raiz, resultados)
+        return resultados
+
+    def _coletar_recursivo(self, no: NoAVL, resultados: List[NoAVL]):
+        if no:
+            self._coletar_recursivo(no.esquerda, resultados)
+            resultados.append(no)
+            self._coletar_recursivo(no.direita, resultados)
+
+class NoAVLLegado:
+    """Nó com __dict__ e histórico em listas, como era antes de __slots__/array"""
+
+    def __init__(self, nome_jogador: str, pontuacao_recorde: int):
+        self.nome_jogador = nome_jogador
+        self.pontuacao_recorde = pontuacao_recorde
+        self.altura = 1
+        self.tamanho = 1
+        self.esquerda = None
+        self.direita = None
+        self.historico_avls = []
+        self.historico_datas = []
+        self.contador_mortes = 0
+        self.record_eventos = 0
+        self.chefes_derrotados = 0
+        self.total_avls = 0
+
+def legado_do_registro(registro: dict) -> NoAVLLegado:
+    """O mesmo registro no nó antigo: um objeto int por AVL, como o json.load criava"""
+    no = NoAVLLegado(registro["nome_jogador"], registro["pontuacao_recorde"])
+    no.historico_avls = [int(str(pontuacao)) for pontuacao in registro["historico_avls"]]
+    no.historico_datas = [int(str(momento)) for momento in registro["historico_datas"]]
+    no.total_avls = len(no.historico_avls)
+    return no
+
+# ==================== CENÁRIOS ====================
+
+def benchmark_iterativo(args):
+    print("Recursivo x iterativo (inserção, busca, percurso em ordem)")
+    for quantidade in args.jogadores:
+        nomes = gerar_nomes(quantidade)
+        print(f"\n{quantidade} jogadores")
+
+        for rotulo, classe in (("recursivo", ArvoreAVLRecursiva), ("iterativo", ArvoreAVL)):
+            arvore = classe()
+            tempos = {
+                "inserir": cronometrar(lambda: [arvore.inserir(nome, i) for i, nome in enumerate(nomes)]),
+                "buscar": cronometrar(lambda: [arvore.buscar(nome) for nome in nomes]),
+                "em_ordem": cronometrar(lambda: sum(1 for _ in arvore.em_ordem())),
+            }
+            if rotulo == "recursivo":
+                referencia = tempos
+                for operacao, segundos in tempos.items():
+                    imprimir_linha(f"{rotulo} {operacao}", quantidade, segundos)
+            else:
+                for operacao, segundos in tempos.items():
+                    imprimir_linha(f"{rotulo} {operacao}", quantidade, segundos, referencia[operacao])
+
+def gerar_registros(quantidade: int, tamanho_historico: int = 5, semente: int = 42) -> List[dict]:
+    """Registros no formato de data/ranking.json, já ordenados por nome"""
+    aleatorio = random.Random(semente)
+    registros = []
+    for i in range(quantidade):
+        historico = [aleatorio.randint(0, 5000) for _ in range(tamanho_historico)]
+        registros.append({
+            "nome_jogador": f"jogador_{i:07d}",
+            "pontuacao_recorde": max(historico),
+            "historico_avls": historico,
+            "contador_mortes": aleatorio.randint(0, tamanho_historico),
+            "record_eventos": aleatorio.randint(0, 60),
+            "chefes_derrotados": aleatorio.randint(0, 4),
+            "total_avls": tamanho_historico
+        })
+    return registros
+
+def benchmark_carga(args):
+    print("Carga do ranking: n inserções x construção em massa ordenada")
+    for quantidade in args.jogadores:
+        registros = gerar_registros(quantidade)
+        print(f"\n{quantidade} jogadores")
+
+        def inserir_um_a_um():
+            arvore = ArvoreAVL()
+            for registro in registros:
+                arvore.inserir(registro["nome_jogador"], registro["pontuacao_recorde"])
+
+        def construir_em_massa():
+            ArvoreAVL().construir_de_ordenados(registros)
+
+        referencia = cronometrar(inserir_um_a_um)
+        imprimir_linha("inserir um a um", quantidade, referencia)
+        imprimir_linha("construir_de_ordenados", quantidade, cronometrar(construir_em_massa), referencia)
+
+def medir_bytes_por_jogador(criar_no: Callable[[dict], object], quantidade: int, tamanho_historico: int) -> float:
+    aleatorio = random.Random(7)
+    # Pontuações variadas para que os ints não venham do cache de inteiros pequenos
+    pontuacoes = [aleatorio.randint(1000, 50000) for _ in range(tamanho_historico)]
+    datas = sorted(aleatorio.randint(1_700_000_000, 1_800_000_000) for _ in range(tamanho_historico))
+    nomes = [f"jogador_{i:07d}" for i in range(quantidade)]
+
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    nos = [criar_no({"nome_jogador": nome, "pontuacao_recorde": max(pontuacoes, default=0),
+                     "historico_avls": pontuacoes, "historico_datas": datas})
+           for nome in nomes]
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (depois - antes) / len(nos)
+
+def benchmark_memoria(args):
+    print("Memória por jogador (sem contar o nome): nó com __dict__ + listas x __slots__ + arrays,\n"
+          "o compacto montado como na carga do ranking (no_do_registro)")
+    for tamanho_historico in args.historicos:
+        legado = medir_bytes_por_jogador(legado_do_registro, args.jogadores, tamanho_historico)
+        compacto = medir_bytes_por_jogador(no_do_registro, args.jogadores, tamanho_historico)
+        print(f"  histórico {tamanho_historico:>5}: {legado:>10.0f} B -> {compacto:>10.0f} B "
+              f"({legado / compacto:.2f}x)")
+
+def benchmark_snapshot(args):
+    print("Partida da API: carregar JSON plano x abrir snapshot binário mapeado (+ top 10 e uma busca)")
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in args.jogadores:
+            arvore = ArvoreAVL()
+            arvore.construir_de_ordenados(gerar_registros(quantidade))
+            arquivo_json = os.path.join(pasta, "ranking.json")
+            arquivo_binario = os.path.join(pasta, "ranking.bin")
+            salvar_ranking(arvore, arquivo_json)
+            escrever_snapshot_binario(arvore, arquivo_binario)
+            print(f"\n{quantidade} jogadores (JSON {os.path.getsize(arquivo_json) // 1024} KiB, "
+                  f"binário {os.path.getsize(arquivo_binario) // 1024} KiB)")
+
+            def partida_json():
+                carregada = ArvoreAVL()
+                carregada.carregar_lista_json(arquivo_json)
+                carregada.top_n_pontuacoes(10)
+                carregada.buscar("jogador_0000042")
+
+            def partida_binaria():
+                mapeado = SnapshotMapeado(arquivo_binario)
+                mapeado.top_n_pontuacoes(10)
+                mapeado.buscar("jogador_0000042")
+                mapeado.fechar()
+
+            referencia = cronometrar(partida_json)
+            imprimir_linha("JSON + carga em massa", 1, referencia)
+            imprimir_linha("mmap binário", 1, cronometrar(partida_binaria), referencia)
+
+def benchmark_ndjson(args):
+    print("Serialização: JSON aninhado (indent=2) x NDJSON em fluxo")
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in args.jogadores:
+            arvore = ArvoreAVL()
+            arvore.construir_de_ordenados(gerar_registros(quantidade))
+            aninhado = os.path.join(pasta, "ranking_aninhado.json")
+            fluxo = os.path.join(pasta, "ranking.ndjson")
+            print(f"\n{quantidade} jogadores")
+
+            tempos = {}
+            for rotulo, arquivo, salvar, carregar in (
+                ("aninhado", aninhado, arvore.salvar_para_json, "carregar_de_json"),
+                ("ndjson", fluxo, arvore.salvar_para_ndjson, "carregar_de_ndjson"),
+            ):
+                escrita = cronometrar(lambda: salvar(arquivo))
+                leitura = cronometrar(lambda: getattr(ArvoreAVL(), carregar)(arquivo))
+                megabytes = os.path.getsize(arquivo) / 1e6
+                referencia = tempos.get("aninhado")
+                imprimir_linha(f"{rotulo} salvar", quantidade, escrita, referencia and referencia[0])
+                imprimir_linha(f"{rotulo} carregar", quantidade, leitura, referencia and referencia[1])
+                print(f"  {'':<32} {megabytes:>8.1f} MB | {quantidade / escrita:>10.0f} reg/s escrita, "
+                      f"{quantidade / leitura:>10.0f} reg/s leitura")
+                tempos[rotulo] = (escrita, leitura)
+
+def gerar_mistura(nomes: List[str], quantidade: int, semente: int = 7) -> List[tuple]:
+    """Operações na proporção do jogo + API: muita leitura, uma escrita por fim de AVL.
+
+    60% buscar, 20% fim de AVL de jogador existente (inserir + registrar_fim_avl),
+    5% jogador novo, 10% top 10, 5% posição no ranking.
+    """
+    aleatorio = random.Random(semente)
+    operacoes = []
+    novos = 0
+    for _ in range(quantidade):
+        sorteio = aleatorio.random()
+        if sorteio < 0.60:
+            operacoes.append(("buscar", aleatorio.choice(nomes)))
+        elif sorteio < 0.80:
+            operacoes.append(("fim_avl", aleatorio.choice(nomes), aleatorio.randint(0, 6000)))
+        elif sorteio < 0.85:
+            operacoes.append(("fim_avl", f"novo_{novos:07d}", aleatorio.randint(0, 6000)))
+            novos += 1
+        elif sorteio < 0.95:
+            operacoes.append(("top", 10))
+        else:
+            operacoes.append(("posicao", aleatorio.choice(nomes)))
+    return operacoes
+
+def executar_mistura(ranking, operacoes: List[tuple]):
+    for operacao in operacoes:
+        tipo = operacao[0]
+        if tipo == "buscar":
+            ranking.buscar(operacao[1])
+        elif tipo == "fim_avl":
+            ranking.inserir(operacao[1], operacao[2])
+            ranking.registrar_fim_avl(operacao[1], 20, 1, False)
+        elif tipo == "top":
+            ranking.top_n_pontuacoes(operacao[1])
+        else:
+            ranking.posicao_jogador(operacao[1])
+
+def benchmark_motores(args):
+    print("Motores de ranking: carga, mistura real de operações e salvamento em ordem de nome")
+    for quantidade in args.jogadores:
+        registros = gerar_registros(quantidade)
+        operacoes = gerar_mistura([registro["nome_jogador"] for registro in registros], args.operacoes)
+        print(f"\n{quantidade} jogadores, {args.operacoes} operações")
+
+        referencias = {}
+        for motor in args.motores:
+            ranking = criar_armazenamento(motor)
+            try:
+                carga = cronometrar(lambda: ranking.construir_de_ordenados(registros))
+                mistura = cronometrar(lambda: executar_mistura(ranking, operacoes))
+                salvamento = cronometrar(lambda: sum(1 for _ in ranking.registros()))
+                total = ranking.contar_jogadores()
+            finally:
+                # O fragmentado segura processos: fecha mesmo se a medição falhar
+                ranking.fechar()
+
+            if not referencias:
+                referencias = {"carga": carga, "mistura": mistura, "salvamento": salvamento}
+            imprimir_linha(f"{motor} carga", quantidade, carga, referencias["carga"])
+            imprimir_linha(f"{motor} mistura", args.operacoes, mistura, referencias["mistura"])
+            imprimir_linha(f"{motor} registros em ordem", total, salvamento, referencias["salvamento"])
+
+def gerar_lote(nomes: List[str], quantidade: int, novos: float = 0.2, semente: int = 11) -> List[tuple]:
+    """Resultados (nome, pontuacao, eventos, chefes, morreu) de um torneio, fora de ordem"""
+    aleatorio = random.Random(semente)
+    return [
+        (f"torneio_{aleatorio.randrange(quantidade):07d}" if aleatorio.random() < novos else aleatorio.choice(nomes),
+         aleatorio.randint(0, 6000), aleatorio.randint(0, 60), aleatorio.randint(0, 3), aleatorio.random() < 0.3)
+        for _ in range(quantidade)
+    ]
+
+def benchmark_lote(args):
+    print("Importação de resultados: um a um x inserir_lote (ordenar + intercalar)")
+    for quantidade in args.jogadores:
+        registros = gerar_registros(quantidade)
+        nomes = [registro["nome_jogador"] for registro in registros]
+        for tamanho_lote in args.lotes:
+            lote = gerar_lote(nomes, tamanho_lote)
+            print(f"\n{quantidade} jogadores, lote de {tamanho_lote}")
+            for motor in args.motores:
+                um_a_um = criar_armazenamento(motor)
+                em_lote = criar_armazenamento(motor)
+                try:
+                    um_a_um.construir_de_ordenados(registros)
+                    em_lote.construir_de_ordenados(registros)
+
+                    referencia = cronometrar(lambda: ArmazenamentoRanking.inserir_lote(um_a_um, lote))
+                    imprimir_linha(f"{motor} um a um", tamanho_lote, referencia)
+                    imprimir_linha(f"{motor} inserir_lote", tamanho_lote,
+                                   cronometrar(lambda: em_lote.inserir_lote(lote)), referencia)
+                finally:
+                    um_a_um.fechar()
+                    em_lote.fechar()
+
+def verificar_instantaneo(ranking, aleatorio: random.Random) -> Optional[str]:
+    """Confere uma leitura inteira da API contra os invariantes do ranking; None se estiver íntegra"""
+    nomes = [no.nome_jogador for no in ranking.em_ordem()]
+    if any(anterior >= atual for anterior, atual in zip(nomes, nomes[1:])):
+        return "ordem de nome quebrada"
+
+    decrescente = list(ranking.em_ordem_decrescente())
+    chaves = [(no.pontuacao_recorde, no.nome_jogador) for no in decrescente]
+    if any(anterior <= atual for anterior, atual in zip(chaves, chaves[1:])):
+        return "ordem de pontuação quebrada"
+
+    total = ranking.contar_jogadores()
+    if not len(nomes) == len(decrescente) == total:
+        return f"contagens divergentes: nome {len(nomes)}, pontuação {len(decrescente)}, total {total}"
+
+    for _ in range(20):
+        posicao = aleatorio.randint(1, total)
+        no = ranking.jogador_na_posicao(posicao)
+        if ranking.buscar(no.nome_jogador) is not no:
+            return "índices apontam para registros diferentes"
+        if ranking.posicao_jogador(no.nome_jogador) != posicao:
+            return "posição e seleção divergentes"
+    return None
+
+def benchmark_concorrencia(args):
+    print("Leitores da API x jogo escrevendo, sem trava: versões imutáveis x árvore mutável")
+    sys.setswitchinterval(1e-5)  # troca de thread frequente para expor as corridas
+    registros = gerar_registros(args.jogadores)
+    nomes = [registro["nome_jogador"] for registro in registros]
+
+    for motor in args.motores:
+        ranking = criar_armazenamento(motor)
+        ranking.construir_de_ordenados(registros)
+        parar = threading.Event()
+        escritas = [0]
+        leituras = []
+        falhas = []
+
+        def escritor():
+            aleatorio = random.Random(1)
+            novos = 0
+            while not parar.is_set():
+                if aleatorio.random() < 0.1:
+                    nome = f"novo_{novos:07d}"
+                    novos += 1
+                else:
+                    nome = aleatorio.choice(nomes)
+                ranking.inserir(nome, aleatorio.randint(0, 6000))
+                ranking.registrar_fim_avl(nome, aleatorio.randint(0, 60), 1, aleatorio.random() < 0.3)
+                escritas[0] += 1
+
+        def leitor(semente: int):
+            aleatorio = random.Random(semente)
+            feitas = 0
+            while not parar.is_set():
+                try:
+                    erro = verificar_instantaneo(ranking.instantaneo(), aleatorio)
+                except Exception as excecao:
+                    erro = f"{type(excecao).__name__}: {excecao}"
+                if erro:
+                    falhas.append(erro)
+                feitas += 1
+            leituras.append(feitas)
+
+        threads = [threading.Thread(target=escritor)]
+        threads += [threading.Thread(target=leitor, args=(i,)) for i in range(args.leitores)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.segundos)
+        parar.set()
+        for thread in threads:
+            thread.join()
+        ranking.fechar()
+
+        print(f"\n{motor}: {escritas[0] / args.segundos:>10.0f} escritas/s, "
+              f"{sum(leituras) / args.segundos:>8.1f} leituras completas/s, "
+              f"{len(falhas)} leituras inconsistentes de {sum(leituras)}")
+        for erro in sorted(set(falhas))[:5]:
+            print(f"  - {erro}")
+
+    sys.setswitchinterval(0.005)
+
+def medir_fragmentado(ranking, nomes: List[str], lote: List[tuple], operacoes: int,
+                      referencias: Optional[dict] = None) -> dict:
+    """Tempo de cada tipo de operação; as referências (em processo) dão a razão de cada linha"""
+    aleatorio = random.Random(5)
+    insercoes = [(aleatorio.choice(nomes), aleatorio.randint(0, 6000)) for _ in range(operacoes)]
+    consultas = [aleatorio.choice(nomes) for _ in range(operacoes // 10)]
+    referencias = referencias or {}
+
+    def inserir_todos():
+        for nome, pontuacao in insercoes:
+            ranking.inserir(nome, pontuacao)
+        ranking.contar_jogadores()  # espera os fragmentos esvaziarem as filas
+
+    tempos = {
+        "inserir": (operacoes, cronometrar(inserir_todos)),
+        "inserir_lote": (len(lote), cronometrar(lambda: ranking.inserir_lote(lote))),
+        "top_n(100)": (len(consultas), cronometrar(lambda: [ranking.top_n(100) for _ in consultas])),
+        "posicao_jogador": (len(consultas),
+                            cronometrar(lambda: [ranking.posicao_jogador(nome) for nome in consultas])),
+    }
+    for rotulo, (quantidade, segundos) in tempos.items():
+        imprimir_linha(rotulo, quantidade, segundos, referencias.get(rotulo))
+    return {rotulo: segundos for rotulo, (_, segundos) in tempos.items()}
+
+def benchmark_fragmentos(args):
+    print(f"Ranking em processos: vazão x número de fragmentos ({os.cpu_count()} CPUs)")
+    for quantidade in args.jogadores:
+        registros = gerar_registros(quantidade)
+        nomes = [registro["nome_jogador"] for registro in registros]
+        lote = gerar_lote(nomes, args.lote)
+
+        print(f"\n{quantidade} jogadores, ArvoreAVL no próprio processo")
+        referencia = ArvoreAVL()
+        referencia.construir_de_ordenados(registros)
+        referencias = medir_fragmentado(referencia, nomes, lote, args.operacoes)
+
+        for fragmentos in args.fragmentos:
+            print(f"\n{quantidade} jogadores, {fragmentos} fragmento(s)")
+            ranking = RankingFragmentado(fragmentos)
+            try:
+                ranking.construir_de_ordenados(registros)
+                medir_fragmentado(ranking, nomes, lote, args.operacoes, referencias)
+            finally:
+                ranking.fechar()
+
+def caminhos_carga(nomes: List[str], quantidade: int, semente: int) -> List[str]:
+    """Requisições na proporção de um painel: páginas do ranking, detalhes, posições e o cabeçalho"""
+    aleatorio = random.Random(semente)
+    caminhos = []
+    for _ in range(quantidade):
+        sorteio = aleatorio.random()
+        nome = aleatorio.choice(nomes)
+        if sorteio < 0.4:
+            caminhos.append(f"/api/ranking?limite=20&deslocamento={aleatorio.randrange(0, len(nomes), 20)}")
+        elif sorteio < 0.7:
+            caminhos.append(f"/api/jogador/{nome}")
+        elif sorteio < 0.9:
+            caminhos.append(f"/api/jogador/{nome}/posicao")
+        else:
+            caminhos.append("/api/estatisticas")
+    return caminhos
+
+def gerar_carga(porta: int, caminhos: List[str], segundos: float):
+    """Um cliente: uma conexão keep-alive pedindo em sequência até o prazo; (latências, erros)"""
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+    latencias = array("d")
+    erros = 0
+    prazo = time.perf_counter() + segundos
+    i = 0
+    while time.perf_counter() < prazo:
+        inicio = time.perf_counter()
+        try:
+            conexao.request("GET", caminhos[i % len(caminhos)])
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros += 1
+        except (OSError, http.client.HTTPException):
+            erros += 1
+            conexao.close()
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+        latencias.append(time.perf_counter() - inicio)
+        i += 1
+    conexao.close()
+    return latencias, erros
+
+def aguardar_api(porta: int, limite: float = 60.0):
+    """Espera até algum trabalhador responder com o snapshot já carregado"""
+    prazo = time.monotonic() + limite
+    while time.monotonic() < prazo:
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=5)
+            conexao.request("GET", "/api/estatisticas")
+            if conexao.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("A API não respondeu a tempo")
+
+def benchmark_api(args):
+    # Só este cenário precisa do Flask
+    from main import preparar_trabalhador
+    from servidor_api import TrabalhadoresAPI
+
+    print(f"API em processos: req/s e latência x trabalhadores ({os.cpu_count()} CPUs, "
+          f"{args.clientes} clientes keep-alive)")
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in args.jogadores:
+            registros = gerar_registros(quantidade)
+            nomes = [registro["nome_jogador"] for registro in registros]
+            arvore = ArvoreAVL()
+            arvore.construir_de_ordenados(registros)
+            arquivo = os.path.join(pasta, "ranking.api.bin")
+            escrever_snapshot_binario(arvore, arquivo)
+            print(f"\n{quantidade} jogadores")
+
+            referencia = None
+            for trabalhadores in args.trabalhadores:
+                servidor = TrabalhadoresAPI(preparar_trabalhador, (arquivo,), trabalhadores, porta=0)
+                try:
+                    aguardar_api(servidor.porta)
+                    cargas = [(servidor.porta, caminhos_carga(nomes, 2000, semente), args.segundos)
+                              for semente in range(args.clientes)]
+                    with multiprocessing.Pool(args.clientes) as clientes:
+                        resultados = clientes.starmap(gerar_carga, cargas)
+                finally:
+                    servidor.encerrar()
+
+                latencias = sorted(latencia for parcial, _ in resultados for latencia in parcial)
+                erros = sum(erros for _, erros in resultados)
+                vazao = len(latencias) / args.segundos
+                p50 = latencias[len(latencias) // 2] * 1e3 if latencias else 0.0
+                p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1e3 if latencias else 0.0
+                linha = (f"  {trabalhadores:>3} trabalhador(es) {vazao:>10.0f} req/s   "
+                         f"p50 {p50:>7.2f} ms   p99 {p99:>8.2f} ms   {erros} erros")
+                if referencia:
+                    linha += f"  ({vazao / referencia:.2f}x)"
+                referencia = referencia or vazao
+                print(linha)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks do ranking AVL")
+    subparsers = parser.add_subparsers(dest="cenario", required=True)
+
+    parser_iterativo = subparsers.add_parser("iterativo", help="recursão x pilha explícita")
+    parser_iterativo.add_argument("--jogadores", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser_iterativo.set_defaults(funcao=benchmark_iterativo)
+
+    parser_carga = subparsers.add_parser("carga", help="inserções x carga em massa")
+    parser_carga.add_argument("--jogadores", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser_carga.set_defaults(funcao=benchmark_carga)
+
+    parser_memoria = subparsers.add_parser("memoria", help="bytes por jogador")
+    parser_memoria.add_argument("--jogadores", type=int, default=100_000)
+    parser_memoria.add_argument("--historicos", type=int, nargs="+", default=[0, 10, 100, 1000])
+    parser_memoria.set_defaults(funcao=benchmark_memoria)
+
+    parser_snapshot = subparsers.add_parser("snapshot", help="partida JSON x binário mapeado")
+    parser_snapshot.add_argument("--jogadores", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser_snapshot.set_defaults(funcao=benchmark_snapshot)
+
+    parser_ndjson = subparsers.add_parser("ndjson", help="JSON aninhado x NDJSON")
+    parser_ndjson.add_argument("--jogadores", type=int, nargs="+", default=[1_000_000])
+    parser_ndjson.set_defaults(funcao=benchmark_ndjson)
+
+    parser_motores = subparsers.add_parser("motores", help="AVL x arranjo ordenado x dict + índice")
+    parser_motores.add_argument("--jogadores", type=int, nargs="+", default=[10_000, 100_000])
+    parser_motores.add_argument("--operacoes", type=int, default=200_000)
+    parser_motores.add_argument("--motores", nargs="+", choices=sorted(MOTORES), default=list(MOTORES))
+    parser_motores.set_defaults(funcao=benchmark_motores)
+
+    parser_lote = subparsers.add_parser("lote", help="inserções um a um x inserir_lote")
+    parser_lote.add_argument("--jogadores", type=int, nargs="+", default=[100_000])
+    parser_lote.add_argument("--lotes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser_lote.add_argument("--motores", nargs="+", choices=sorted(MOTORES), default=list(MOTORES))
+    parser_lote.set_defaults(funcao=benchmark_lote)
+
+    parser_concorrencia = subparsers.add_parser("concorrencia", help="leitores concorrentes x escritor")
+    parser_concorrencia.add_argument("--jogadores", type=int, default=2000)
+    parser_concorrencia.add_argument("--segundos", type=float, default=5.0)
+    parser_concorrencia.add_argument("--leitores", type=int, default=4)
+    parser_concorrencia.add_argument("--motores", nargs="+", choices=sorted(MOTORES),
+                                     default=["persistente", "avl"])
+    parser_concorrencia.set_defaults(funcao=benchmark_concorrencia)
+
+    parser_fragmentos = subparsers.add_parser("fragmentos", help="vazão x número de processos fragmento")
+    parser_fragmentos.add_argument("--jogadores", type=int, nargs="+", default=[100_000])
+    parser_fragmentos.add_argument("--fragmentos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser_fragmentos.add_argument("--operacoes", type=int, default=100_000)
+    parser_fragmentos.add_argument("--lote", type=int, default=100_000)
+    parser_fragmentos.set_defaults(funcao=benchmark_fragmentos)
+
+    parser_api = subparsers.add_parser("api", help="teste de carga da API x número de processos trabalhadores")
+    parser_api.add_argument("--jogadores", type=int, nargs="+", default=[100_000])
+    parser_api.add_argument("--trabalhadores", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser_api.add_argument("--clientes", type=int, default=16)
+    parser_api.add_argument("--segundos", type=float, default=5.0)
+    parser_api.set_defaults(funcao=benchmark_api)
+
+    args = parser.parse_args(argv)
+    args.funcao(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
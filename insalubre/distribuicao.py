@@ -0,0 +1,164 @@
+"""Distribuição das pontuações em histogramas de baldes logarítmicos.
+
+Cada balde cobre uma faixa (gamma^(i-1), gamma^i], então qualquer quantil
+volta com erro relativo de no máximo ERRO_RELATIVO, e o número de baldes
+depende só da maior pontuação possível, não do número de jogadores. As
+contagens ficam numa árvore de Fenwick: inserir, remover, quantil e
+"melhor que Y%" custam O(log baldes), sem percorrer o ranking.
+"""
+import math
+from typing import Dict, Iterable, List, Optional
+
+from AVL import ArmazenamentoRanking
+
+ERRO_RELATIVO = 0.01
+# Pontuações são inteiros de 32 bits (TIPO_HISTORICO)
+MAIOR_PONTUACAO = 2 ** 31 - 1
+
+QUANTIS_PADRAO = (0.5, 0.9, 0.99)
+
+class HistogramaLogaritmico:
+    """Contagem aproximada de valores inteiros; valores menores que 1 dividem o balde 0"""
+
+    def __init__(self, erro_relativo: float = ERRO_RELATIVO, maior_valor: int = MAIOR_PONTUACAO):
+        self.gamma = (1 + erro_relativo) / (1 - erro_relativo)
+        self._log_gamma = math.log(self.gamma)
+        self.baldes = 2 + math.ceil(math.log(maior_valor) / self._log_gamma)
+        self._arvore: List[int] = [0] * (self.baldes + 1)
+        self.total = 0
+
+    @classmethod
+    def de_valores(cls, valores: Iterable[int], erro_relativo: float = ERRO_RELATIVO) -> "HistogramaLogaritmico":
+        """Monta de uma vez, em O(valores + baldes)"""
+        histograma = cls(erro_relativo)
+        arvore = histograma._arvore
+        for valor in valores:
+            arvore[histograma.balde(valor) + 1] += 1
+            histograma.total += 1
+        for i in range(1, len(arvore)):
+            pai = i + (i & -i)
+            if pai < len(arvore):
+                arvore[pai] += arvore[i]
+        return histograma
+
+    @classmethod
+    def das_contagens(cls, contagens: Iterable[int], total: int,
+                      erro_relativo: float = ERRO_RELATIVO) -> "HistogramaLogaritmico":
+        """Remonta das contagens gravadas de outro histograma (contagens()), em O(baldes)"""
+        histograma = cls(erro_relativo)
+        arvore = list(contagens)
+        if len(arvore) != len(histograma._arvore):
+            raise ValueError("Contagens de um histograma com outros baldes")
+        histograma._arvore = arvore
+        histograma.total = total
+        return histograma
+
+    def contagens(self) -> List[int]:
+        """A árvore de Fenwick das contagens, para gravar e remontar com das_contagens"""
+        return list(self._arvore)
+
+    def balde(self, valor: int) -> int:
+        if valor < 1:
+            return 0
+        return min(self.baldes - 1, max(1, math.ceil(math.log(valor) / self._log_gamma)))
+
+    def valor_do_balde(self, balde: int) -> int:
+        """Representante do balde, a meio caminho relativo entre os limites"""
+        if balde == 0:
+            return 0
+        return round(2 * self.gamma ** balde / (self.gamma + 1))
+
+    def _somar(self, balde: int, quantidade: int):
+        i = balde + 1
+        while i < len(self._arvore):
+            self._arvore[i] += quantidade
+            i += i & -i
+
+    def _acumulado(self, balde: int) -> int:
+        """Quantos valores caem nos baldes 0..balde"""
+        soma = 0
+        i = balde + 1
+        while i > 0:
+            soma += self._arvore[i]
+            i -= i & -i
+        return soma
+
+    def adicionar(self, valor: int):
+        self._somar(self.balde(valor), 1)
+        self.total += 1
+
+    def remover(self, valor: int):
+        self._somar(self.balde(valor), -1)
+        self.total -= 1
+
+    def quantil(self, q: float) -> int:
+        """Menor valor v tal que uma fração q dos valores é <= v (aproximado)"""
+        if self.total <= 0:
+            return 0
+        alvo = max(1, math.ceil(q * self.total))
+
+        # Descida binária na árvore de Fenwick: maior prefixo com menos que alvo
+        posicao = 0
+        passo = 1 << (len(self._arvore) - 1).bit_length()
+        while passo:
+            proxima = posicao + passo
+            if proxima < len(self._arvore) and self._arvore[proxima] < alvo:
+                posicao = proxima
+                alvo -= self._arvore[proxima]
+            passo >>= 1
+        return self.valor_do_balde(min(posicao, self.baldes - 1))
+
+    def fracao_abaixo(self, valor: int) -> float:
+        """Fração dos valores menores que valor; empates no mesmo balde contam pela metade"""
+        if self.total <= 0:
+            return 0.0
+        balde = self.balde(valor)
+        abaixo = self._acumulado(balde - 1) if balde else 0
+        no_balde = self._acumulado(balde) - abaixo
+        return min(1.0, max(0.0, (abaixo + no_balde / 2) / self.total))
+
+    def percentis(self, quantis: Iterable[float] = QUANTIS_PADRAO) -> Dict[str, int]:
+        return {f"p{round(q * 100):g}": self.quantil(q) for q in quantis}
+
+class DistribuicaoPontuacoes:
+    """Recordes (um por jogador) e pontuações de cada AVL registrada no ranking"""
+
+    def __init__(self):
+        self.recordes = HistogramaLogaritmico()
+        self.avls = HistogramaLogaritmico()
+
+    @classmethod
+    def do_ranking(cls, ranking: ArmazenamentoRanking) -> "DistribuicaoPontuacoes":
+        """Uma passada no ranking ao carregar; depois tudo é incremental"""
+        distribuicao = cls()
+        distribuicao.recordes = HistogramaLogaritmico.de_valores(ranking.pontuacoes_recorde())
+        distribuicao.avls = HistogramaLogaritmico.de_valores(ranking.pontuacoes_avls())
+        return distribuicao
+
+    @classmethod
+    def dos_histogramas(cls, recordes: HistogramaLogaritmico,
+                        avls: HistogramaLogaritmico) -> "DistribuicaoPontuacoes":
+        distribuicao = cls()
+        distribuicao.recordes = recordes
+        distribuicao.avls = avls
+        return distribuicao
+
+    def registrar_avl(self, pontuacao: int, recorde_anterior: Optional[int], recorde_atual: int):
+        """Uma pontuação entrou no histórico; o recorde do jogador pode ter mudado"""
+        self.avls.adicionar(pontuacao)
+        if recorde_anterior is None:
+            self.recordes.adicionar(recorde_atual)
+        elif recorde_atual != recorde_anterior:
+            self.recordes.remover(recorde_anterior)
+            self.recordes.adicionar(recorde_atual)
+
+    def melhor_que(self, pontuacao_recorde: int) -> float:
+        """Percentual aproximado de jogadores com recorde menor que este"""
+        return round(100 * self.recordes.fracao_abaixo(pontuacao_recorde), 1)
+
+    def resumo(self) -> dict:
+        return {
+            "recordes": self.recordes.percentis(),
+            "avls": self.avls.percentis(),
+            "erro_relativo": ERRO_RELATIVO
+        }
@@ -0,0 +1,57 @@
+"""Eventos do ranking para Server-Sent Events (/api/ranking/eventos).
+
+O jogo publica um evento por mudança; cada conexão SSE guarda só o id do
+último evento que enviou e espera os seguintes. Os eventos ficam num buffer
+circular, um só para todas as conexões: publicar custa O(1) qualquer que
+seja o número de painéis abertos, e quem reconecta com Last-Event-ID recebe
+o que perdeu, se ainda estiver no buffer. Se não estiver, recebe None e
+precisa recarregar o ranking.
+"""
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import List, Optional, Tuple
+
+# (id, tipo, dados em JSON)
+Evento = Tuple[int, str, str]
+
+class CanalEventos:
+    def __init__(self, guardados: int = 1000):
+        self._condicao = threading.Condition()
+        self._eventos: deque = deque(maxlen=guardados)
+        # Ids a partir do relógio: um Last-Event-ID de antes de reiniciar o servidor
+        # fica abaixo dos novos e cai no caso "precisa recarregar", nunca em eventos trocados
+        self._ultimo_id = time.time_ns() // 1000
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    def publicar(self, tipo: str, dados: dict) -> int:
+        texto = json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+        with self._condicao:
+            self._ultimo_id += 1
+            self._eventos.append((self._ultimo_id, tipo, texto))
+            self._condicao.notify_all()
+            return self._ultimo_id
+
+    def depois_de(self, ultimo_id: int, espera: float) -> Optional[List[Evento]]:
+        """Eventos com id > ultimo_id, esperando até espera segundos se ainda não houver nenhum.
+
+        Lista vazia: nada aconteceu no prazo. None: ultimo_id é desconhecido ou
+        já saiu do buffer, então a conexão perdeu eventos.
+        """
+        with self._condicao:
+            if ultimo_id == self._ultimo_id:
+                self._condicao.wait(espera)
+            if ultimo_id > self._ultimo_id:
+                return None
+            if ultimo_id == self._ultimo_id:
+                return []
+            primeiro_id = self._eventos[0][0] if self._eventos else self._ultimo_id + 1
+            if ultimo_id < primeiro_id - 1:
+                return None
+            # Ids consecutivos: a posição no buffer sai da diferença
+            return list(islice(self._eventos, ultimo_id - primeiro_id + 1, None))
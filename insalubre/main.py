@@ -1,11 +1,29 @@
 import random
+import base64
+import hashlib
 import json
+import os
 import time
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from flask import Flask, jsonify, request, make_response
 import threading
-from datetime import datetime, timedelta
+import atexit
+import zlib
+import argparse
+from datetime import datetime
+from itertools import islice
+from bisect import bisect_right
+from AVL import NoAVL, agora, avls_recentes, estatisticas_do_no, tamanho_historico
+from agregados import AgregadosRanking, calcular_taxa_vitoria, contribuicao
+from armazenamento import MOTOR_PADRAO, MOTORES, criar_armazenamento
+from distribuicao import DistribuicaoPontuacoes
+from eventos_ranking import CanalEventos
+import persistencia
+from ranking_janelas import JANELAS, RankingsPorJanela
+from servidor_api import (INTERVALO_PUBLICACAO, AcompanhadorArquivo, PublicadorSnapshot,
+                          TrabalhadoresAPI, arquivo_publicado)
+from snapshot_binario import SnapshotMapeado
 
 class Raridade(Enum):
     COMUM = 1
@@ -31,19 +49,6 @@ class TipoEvento(Enum):
     EVENTO_RARO = 5
     CHEFE = 6
 
-class NoAVL:
-    def __init__(self, nome_jogador: str, pontuacao_recorde: int):
-        self.nome_jogador = nome_jogador
-        self.pontuacao_recorde = pontuacao_recorde
-        self.altura = 1
-        self.esquerda = None
-        self.direita = None
-        self.historico_avls = []
-        self.contador_mortes = 0
-        self.record_eventos = 0
-        self.chefes_derrotados = 0
-        self.total_avls = 0
-
 class Arma:
     def __init__(self, nome: str, dano: int, custo_stamina: int, tipo: str = "corpo_a_corpo", chance_atordoar: float = 0.0, balas: int = 0, balas_maximas: int = 20):
         self.nome = nome
@@ -313,9 +318,47 @@ class EventoJogo:
         self.eh_escolha_chefe = eh_escolha_chefe
         self.eh_evento_especial = eh_evento_especial
 
+class EstadoPublicado:
+    """O que as rotas leem do jogo, tirado de um snapshot binário: o ranking
+    mapeado e os agregados gravados junto com ele. É o jogo_global dos
+    processos trabalhadores, que só servem o que o jogo publica."""
+
+    def __init__(self, ranking: SnapshotMapeado, distribuicao: DistribuicaoPontuacoes):
+        self.ranking = ranking
+        self.distribuicao = distribuicao
+        # Os agregados vêm gravados no .bin: nada aqui passa por todos os jogadores
+        self.agregados = AgregadosRanking.das_somas(ranking.somas_agregados())
+        # Só as AVLs dentro das janelas, lidas da seção de recentes
+        self.janelas = RankingsPorJanela.do_ranking(ranking)
+        self.total_mortes = self.agregados.total_mortes
+
+    @classmethod
+    def abrir(cls, arquivo_binario: str) -> Optional["EstadoPublicado"]:
+        """None se o arquivo não existir ou não for um snapshot deste formato"""
+        try:
+            ranking = SnapshotMapeado(arquivo_binario)
+        except (OSError, ValueError):
+            return None
+        try:
+            distribuicao = DistribuicaoPontuacoes.dos_histogramas(*ranking.histogramas())
+        except ValueError:
+            ranking.fechar()
+            return None
+        return cls(ranking, distribuicao)
+
+    def fechar(self):
+        self.ranking.fechar()
+
 class SobreviventeInsalubre:
-    def __init__(self):
-        self.ranking = None
+    def __init__(self, arquivo_ranking: Optional[str] = persistencia.ARQUIVO_RANKING,
+                 motor: str = MOTOR_PADRAO):
+        self.motor = motor
+        self.ranking = criar_armazenamento(motor)
+        self.distribuicao = DistribuicaoPontuacoes()
+        self.janelas = RankingsPorJanela()
+        self.agregados = AgregadosRanking()
+        self.arquivo_ranking = arquivo_ranking
+        self.diario = None
         self.total_mortes = 0
         self.historico_jogadores = {}
         self.armas = {
@@ -477,104 +520,105 @@ class SobreviventeInsalubre:
             ]
         }
 
-    def obter_altura(self, no: NoAVL) -> int:
-        return no.altura if no else 0
-
-    def atualizar_altura(self, no: NoAVL):
-        no.altura = 1 + max(self.obter_altura(no.esquerda), self.obter_altura(no.direita))
-
-    def obter_balanceamento(self, no: NoAVL) -> int:
-        return self.obter_altura(no.esquerda) - self.obter_altura(no.direita) if no else 0
-
-    def rotacionar_direita(self, y: NoAVL) -> NoAVL:
-        x = y.esquerda
-        T2 = x.direita
-
-        x.direita = y
-        y.esquerda = T2
-
-        self.atualizar_altura(y)
-        self.atualizar_altura(x)
-
-        return x
-
-    def rotacionar_esquerda(self, x: NoAVL) -> NoAVL:
-        y = x.direita
-        T2 = y.esquerda
+    def carregar_ranking(self):
+        if not self.arquivo_ranking:
+            return
 
-        y.esquerda = x
-        x.direita = T2
+        self.diario = persistencia.DiarioRanking(self.arquivo_ranking, motor=self.motor)
+        self.ranking = self.diario.recuperar()
+        self.total_mortes = sum(no.contador_mortes for no in self.ranking.em_ordem())
+        self.recalcular_agregados()
 
-        self.atualizar_altura(x)
-        self.atualizar_altura(y)
+    def carregar_snapshot_binario(self, arquivo_binario: Optional[str] = None) -> bool:
+        """Modo só leitura: serve o ranking do .bin mapeado, sem carregar a árvore.
 
-        return y
+        Sem arquivo_binario, usa o .bin do ranking salvo se ele estiver em dia.
+        """
+        if arquivo_binario is None:
+            if not self.arquivo_ranking or not persistencia.snapshot_binario_atualizado(self.arquivo_ranking):
+                return False
+            arquivo_binario = persistencia.arquivo_binario(self.arquivo_ranking)
 
-    def inserir_avl(self, no: NoAVL, nome_jogador: str, pontuacao: int) -> NoAVL:
-        if not no:
-            novo_no = NoAVL(nome_jogador, pontuacao)
-            novo_no.historico_avls.append(pontuacao)
-            novo_no.total_avls = 1
-            return novo_no
+        estado = EstadoPublicado.abrir(arquivo_binario)
+        if estado is None:
+            return False
+        self.ranking = estado.ranking
+        self.distribuicao = estado.distribuicao
+        self.agregados = estado.agregados
+        self.janelas = estado.janelas
+        self.total_mortes = estado.total_mortes
+        return True
 
-        if nome_jogador < no.nome_jogador:
-            no.esquerda = self.inserir_avl(no.esquerda, nome_jogador, pontuacao)
-        elif nome_jogador > no.nome_jogador:
-            no.direita = self.inserir_avl(no.direita, nome_jogador, pontuacao)
-        else:
-            if pontuacao > no.pontuacao_recorde:
-                no.pontuacao_recorde = pontuacao
-            no.historico_avls.append(pontuacao)
-            no.total_avls = len(no.historico_avls)
-            return no
-
-        self.atualizar_altura(no)
-        balanceamento = self.obter_balanceamento(no)
-
-        if balanceamento > 1 and nome_jogador < no.esquerda.nome_jogador:
-            return self.rotacionar_direita(no)
-        if balanceamento < -1 and nome_jogador > no.direita.nome_jogador:
-            return self.rotacionar_esquerda(no)
-        if balanceamento > 1 and nome_jogador > no.esquerda.nome_jogador:
-            no.esquerda = self.rotacionar_esquerda(no.esquerda)
-            return self.rotacionar_direita(no)
-        if balanceamento < -1 and nome_jogador < no.direita.nome_jogador:
-            no.direita = self.rotacionar_direita(no.direita)
-            return self.rotacionar_esquerda(no)
-
-        return no
-
-    def encontrar_jogador(self, no: NoAVL, nome_jogador: str) -> Optional[NoAVL]:
-        if not no or no.nome_jogador == nome_jogador:
-            return no
-
-        if nome_jogador < no.nome_jogador:
-            return self.encontrar_jogador(no.esquerda, nome_jogador)
-        return self.encontrar_jogador(no.direita, nome_jogador)
-
-    def obter_top_n_pontuacoes(self, no: NoAVL, n: int, resultados: List[Tuple[str, int, int, int, int]]):
-        if no and len(resultados) < n:
-            self.obter_top_n_pontuacoes(no.direita, n, resultados)
-            if len(resultados) < n:
-                resultados.append((
-                    no.nome_jogador,
-                    no.pontuacao_recorde,
-                    no.record_eventos,
-                    no.chefes_derrotados,
-                    no.total_avls
-                ))
-                self.obter_top_n_pontuacoes(no.esquerda, n, resultados)
+    def recalcular_agregados(self):
+        """Uma passada no ranking inteiro; depois disso distribuição, janelas e somas são mantidas a cada AVL"""
+        self.distribuicao = DistribuicaoPontuacoes.do_ranking(self.ranking)
+        self.janelas = RankingsPorJanela.do_ranking(self.ranking)
+        self.agregados = AgregadosRanking.do_ranking(self.ranking)
+
+    def salvar_ranking(self):
+        if self.diario:
+            self.diario.sincronizar()
+
+    def encerrar_ranking(self):
+        if self.diario:
+            self.diario.fechar(self.ranking)
+            self.diario = None
+
+    def registrar_pontuacao(self, nome_jogador: str, pontuacao: int):
+        momento = agora()
+        if self.diario:
+            self.diario.registrar_insercao(nome_jogador, pontuacao, momento)
+        anterior = self.ranking.buscar(nome_jogador)
+        recorde_anterior = anterior.pontuacao_recorde if anterior else None
+        # Lida antes de inserir: os motores que alteram no lugar mudam este mesmo nó
+        contribuicao_anterior = contribuicao(anterior)
+        self.ranking.inserir(nome_jogador, pontuacao, momento)
+        atual = self.ranking.buscar(nome_jogador)
+        self.distribuicao.registrar_avl(pontuacao, recorde_anterior, atual.pontuacao_recorde)
+        self.agregados.atualizar(contribuicao_anterior, contribuicao(atual))
+        self.janelas.registrar(nome_jogador, pontuacao, momento)
+
+    def importar_resultados(self, resultados: List[Tuple[str, int, int, int, bool]]):
+        """Torneios e AVLs atrasadas: (nome, pontuacao, eventos, chefes, morreu) de uma vez"""
+        momento = agora()
+        if self.diario:
+            self.diario.registrar_lote(resultados, momento)
+
+        recordes = {}
+        contribuicoes = {}
+        for nome_jogador, *_ in resultados:
+            if nome_jogador not in recordes:
+                no = self.ranking.buscar(nome_jogador)
+                recordes[nome_jogador] = no.pontuacao_recorde if no else None
+                contribuicoes[nome_jogador] = contribuicao(no)
+        self.ranking.inserir_lote(resultados, momento)
+        for nome_jogador, anterior in contribuicoes.items():
+            self.agregados.atualizar(anterior, contribuicao(self.ranking.buscar(nome_jogador)))
+        self.janelas.registrar_lote(((resultado[0], resultado[1]) for resultado in resultados), momento)
+        self.total_mortes += sum(1 for resultado in resultados if resultado[4])
+
+        # Mesmo efeito de registrar cada AVL em sequência, na ordem do lote
+        for nome_jogador, pontuacao, *_ in resultados:
+            recorde_anterior = recordes[nome_jogador]
+            recordes[nome_jogador] = max(pontuacao, recorde_anterior if recorde_anterior is not None else pontuacao)
+            self.distribuicao.registrar_avl(pontuacao, recorde_anterior, recordes[nome_jogador])
+
+    def obter_top_n_pontuacoes(self, n: int) -> List[Tuple[str, int, int, int, int]]:
+        return self.ranking.top_n_pontuacoes(n)
 
     def imprimir_ranking(self, n: int = 10):
         print(f"\n🏆 TOP {n} JOGADORES - ÁRVORE AVL 🏆")
         print("=" * 70)
 
-        resultados = []
-        self.obter_top_n_pontuacoes(self.ranking, n, resultados)
+        resultados = self.ranking.top_n(n)
 
-        for i, (nome, pontuacao, record_eventos, chefes, total_avls) in enumerate(resultados, 1):
-            no_jogador = self.encontrar_jogador(self.ranking, nome)
-            mortes = no_jogador.contador_mortes if no_jogador else 0
+        for i, no_jogador in enumerate(resultados, 1):
+            nome = no_jogador.nome_jogador
+            pontuacao = no_jogador.pontuacao_recorde
+            record_eventos = no_jogador.record_eventos
+            chefes = no_jogador.chefes_derrotados
+            total_avls = no_jogador.total_avls
+            mortes = no_jogador.contador_mortes
             print(f"{i:2d}. {nome:<20} {pontuacao:>8} almas | ☠️ {mortes}  mortes | 📊 {record_eventos} eventos | 🏹 {chefes} chefes | 🌳 {total_avls} AVLs")
 
         if not resultados:
@@ -585,8 +629,8 @@ class SobreviventeInsalubre:
             print("Nenhum jogador ativo.")
             return
 
-        no_jogador = self.encontrar_jogador(self.ranking, self.jogador_atual.nome)
-        if not no_jogador or not no_jogador.historico_avls:
+        no_jogador = self.ranking.buscar(self.jogador_atual.nome)
+        if not no_jogador or not no_jogador.estatisticas:
             print(f"\n📊 {self.jogador_atual.nome} ainda não tem AVLs registradas.")
             return
 
@@ -598,14 +642,15 @@ class SobreviventeInsalubre:
         print(f"Total de AVLs: {no_jogador.total_avls}")
         print(f"Total de Mortes: {no_jogador.contador_mortes}")
 
-        avls_recentes = no_jogador.historico_avls[-10:]
-        print(f"\nÚltimas {len(avls_recentes)} AVLs:")
-        for i, pontuacao in enumerate(reversed(avls_recentes), 1):
+        estatisticas = no_jogador.estatisticas
+        recentes = avls_recentes(no_jogador)
+        print(f"\nÚltimas {len(recentes)} AVLs:")
+        for i, pontuacao in enumerate(reversed(recentes), 1):
             print(f"{i:2d}. {pontuacao:>8} almas")
 
-        if len(no_jogador.historico_avls) > 1:
-            pontuacao_media = sum(no_jogador.historico_avls) / len(no_jogador.historico_avls)
-            print(f"\n📈 Média de todas as AVLs: {pontuacao_media:.1f} almas")
+        if estatisticas.quantidade > 1:
+            print(f"\n📈 Média de todas as AVLs: {estatisticas.media():.1f} almas")
+            print(f"📉 Pior AVL: {estatisticas.minimo} almas | Desvio padrão: {estatisticas.desvio_padrao():.1f}")
 
     def gerar_evento(self) -> EventoJogo:
         self.turno_atual += 1
@@ -681,10 +726,6 @@ class SobreviventeInsalubre:
 
         elif tipo_evento == TipoEvento.FOGUEIRA:
             descricao = random.choice(self.eventos[tipo_evento])
-            if self.jogador_atual.pontuacao_avl_atual > 0:
-                self.ranking = self.inserir_avl(self.ranking, self.jogador_atual.nome,
-                                             self.jogador_atual.pontuacao_avl_atual)
-
             self.recarga_fogueira = 5
             return EventoJogo(tipo_evento, descricao, Raridade.INCOMUM,
                            recompensa_almas=0, efeito_sanidade=-20)
@@ -1431,18 +1472,28 @@ class SobreviventeInsalubre:
 
     def processar_fim_avl(self, contador_avls: int, eventos_sobrevividos: int):
         jogador_morreu = (self.jogador_atual.vida <= 0)
-
-        no_jogador = self.encontrar_jogador(self.ranking, self.jogador_atual.nome)
-        if no_jogador:
-            if eventos_sobrevividos > no_jogador.record_eventos:
-                no_jogador.record_eventos = eventos_sobrevividos
-            no_jogador.chefes_derrotados += self.jogador_atual.chefes_derrotados_atual
-            no_jogador.total_avls = len(no_jogador.historico_avls)
+        existente = self.ranking.buscar(self.jogador_atual.nome)
+        # Lidos antes das escritas: o delta publicado compara com eles
+        recorde_antes = existente.pontuacao_recorde if existente else None
+        posicao_antes = self.ranking.posicao_jogador(self.jogador_atual.nome) if existente else None
+
+        # Cada AVL entra no histórico uma vez só, aqui no fim, com seu momento (as fogueiras
+        # não gravam pontuação parcial); antes de registrar_fim_avl, para a primeira AVL de
+        # um jogador novo também contar mortes e chefes
+        pontuacao = self.jogador_atual.pontuacao_avl_atual
+        if pontuacao > 0:
+            self.registrar_pontuacao(self.jogador_atual.nome, pontuacao)
+
+        if self.diario:
+            self.diario.registrar_fim_avl(self.jogador_atual.nome, eventos_sobrevividos,
+                                          self.jogador_atual.chefes_derrotados_atual, jogador_morreu)
+        anterior = contribuicao(self.ranking.buscar(self.jogador_atual.nome))
+        no_jogador = self.ranking.registrar_fim_avl(self.jogador_atual.nome, eventos_sobrevividos,
+                                                    self.jogador_atual.chefes_derrotados_atual, jogador_morreu)
+        self.agregados.atualizar(anterior, contribuicao(no_jogador))
 
         if jogador_morreu:
             self.total_mortes += 1
-            if no_jogador:
-                no_jogador.contador_mortes += 1
             almas_perdidas = self.jogador_atual.resetar_almas_ao_morrer()
 
             print(f"\n💀 AVL {contador_avls} FINALIZADA - VOCÊ MORREU")
@@ -1460,12 +1511,33 @@ class SobreviventeInsalubre:
         print(f"🔥 Fogueiras encontradas: {self.jogador_atual.fogueiras_encontradas}")
         print(f"🧠 Sanidade máxima alcançada: {self.jogador_atual.sanidade}")
 
-        if self.jogador_atual.pontuacao_avl_atual > 0:
-            existente = self.encontrar_jogador(self.ranking, self.jogador_atual.nome)
-            if not existente or self.jogador_atual.pontuacao_avl_atual > existente.pontuacao_recorde:
-                self.ranking = self.inserir_avl(self.ranking, self.jogador_atual.nome,
-                                             self.jogador_atual.pontuacao_avl_atual)
-                print(f"💾 Novo recorde salvo: {self.jogador_atual.pontuacao_avl_atual} almas!")
+        if pontuacao > 0:
+            if recorde_antes is None or pontuacao > recorde_antes:
+                print(f"💾 Novo recorde salvo: {pontuacao} almas!")
+            else:
+                print(f"💾 AVL registrada no histórico: {pontuacao} almas")
+
+        self.publicar_mudanca_jogador(self.jogador_atual.nome, recorde_antes, posicao_antes)
+
+    def publicar_mudanca_jogador(self, nome_jogador: str, recorde_anterior: Optional[int],
+                                 posicao_anterior: Optional[int]):
+        """Delta do jogador para os painéis conectados em /api/ranking/eventos"""
+        no = self.ranking.buscar(nome_jogador)
+        if no is None:
+            return
+        canal_ranking.publicar("jogador", {
+            "nome": nome_jogador,
+            "pontuacao": no.pontuacao_recorde,
+            "novo_recorde": recorde_anterior is None or no.pontuacao_recorde > recorde_anterior,
+            "rank": self.ranking.posicao_jogador(nome_jogador),
+            "rank_anterior": posicao_anterior,
+            "mortes": no.contador_mortes,
+            "avls": no.total_avls,
+            "chefes": no.chefes_derrotados,
+            "eventos": no.record_eventos,
+            "taxa_vitoria": calcular_taxa_vitoria(no),
+            "estatisticas": self.agregados.resumo()
+        })
 
     def lidar_com_fogueira(self) -> bool:
         self.melhorias_usadas_na_fogueira = False
@@ -1496,6 +1568,7 @@ class SobreviventeInsalubre:
 
                 self.jogador_atual.fogueiras_encontradas += 1
                 print(f"\n❤️ Vida e poções restauradas! ({self.jogador_atual.pocoes_cura_maximas} poções) Sanidade reduzida.")
+                self.salvar_ranking()
                 print("💾 Progresso salvo na Árvore AVL!")
 
             elif escolha == "2":
@@ -1737,7 +1810,7 @@ class SobreviventeInsalubre:
 
         self.jogador_atual = Jogador(nome)
 
-        existente = self.encontrar_jogador(self.ranking, nome)
+        existente = self.ranking.buscar(nome)
         if existente:
             print(f"Bem-vindo de volta, {nome}! Seu recorde é {existente.pontuacao_recorde} almas.")
         else:
@@ -1834,6 +1907,7 @@ class SobreviventeInsalubre:
             elif escolha == "3":
                 self.mostrar_estatisticas()
             elif escolha == "4":
+                self.encerrar_ranking()
                 print("\nQue suas AVLs ecoem pela eternidade...")
                 break
             else:
@@ -1843,10 +1917,10 @@ class SobreviventeInsalubre:
         print("\n📊 ESTATÍSTICAS DO MUNDO INSALUBRE")
         print("="*40)
         print(f"Total de mortes: {self.total_mortes}")
-        print(f"Total de jogadores: {self.contar_jogadores(self.ranking)}")
+        print(f"Total de jogadores: {self.ranking.contar_jogadores()}")
 
         if self.jogador_atual:
-            no_jogador = self.encontrar_jogador(self.ranking, self.jogador_atual.nome)
+            no_jogador = self.ranking.buscar(self.jogador_atual.nome)
             if no_jogador:
                 print(f"\n📈 ESTATÍSTICAS DE {self.jogador_atual.nome}:")
                 print(f"Recorde pessoal: {no_jogador.pontuacao_recorde} almas")
@@ -1854,21 +1928,16 @@ class SobreviventeInsalubre:
                 print(f"Chefes derrotados: {no_jogador.chefes_derrotados}")
                 print(f"Total de AVLs: {no_jogador.total_avls}")
                 print(f"Total de mortes: {no_jogador.contador_mortes}")
-                if no_jogador.historico_avls:
-                    pontuacao_media = sum(no_jogador.historico_avls) / len(no_jogador.historico_avls)
-                    print(f"Média de pontuação: {pontuacao_media:.1f} almas")
-
-    def contar_jogadores(self, no: NoAVL) -> int:
-        if not no:
-            return 0
-        return 1 + self.contar_jogadores(no.esquerda) + self.contar_jogadores(no.direita)
+                if no_jogador.estatisticas:
+                    print(f"Média de pontuação: {no_jogador.estatisticas.media():.1f} almas")
 
 app = Flask(__name__)
 
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match,Last-Event-ID')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag,X-Ranking-Versao')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
@@ -1877,25 +1946,131 @@ def after_request(response):
 def handle_options(path):
     response = make_response()
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match,Last-Event-ID')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
 jogo_global = None
 
+class CacheResposta:
+    """Respostas JSON já serializadas, válidas enquanto o ranking não mudar.
+
+    As entradas (uma por consulta: página, ordem...) pertencem a um
+    armazenamento (carregar outro ranking troca o objeto) numa versao; se
+    qualquer um dos dois muda, todas são descartadas. A ETag é o hash do
+    corpo: não se repete entre conteúdos diferentes, sobrevive a reinícios e
+    é a mesma em todos os trabalhadores que servem o mesmo snapshot.
+    """
+
+    def __init__(self, maximo_entradas: int = 256):
+        self._trava = threading.Lock()
+        self._origem = None
+        self._versao = None
+        self._entradas: dict = {}
+        self._maximo_entradas = maximo_entradas
+
+    def valor(self, origem, versao, chave, calcular):
+        """calcular() roda uma vez por chave e versão; versao é qualquer valor que mude a cada alteração"""
+        with self._trava:
+            if self._origem is not origem or self._versao != versao:
+                self._origem, self._versao = origem, versao
+                self._entradas = {}
+            if chave not in self._entradas:
+                if len(self._entradas) >= self._maximo_entradas:
+                    del self._entradas[next(iter(self._entradas))]
+                self._entradas[chave] = calcular()
+            return self._entradas[chave]
+
+    def obter(self, origem, versao, chave, montar) -> Tuple[bytes, str]:
+        """(corpo, etag) da resposta montar(), serializada uma vez por versão"""
+        return self.valor(origem, versao, ("resposta", chave), lambda: self._serializar(montar()))
+
+    @staticmethod
+    def _serializar(dados) -> Tuple[bytes, str]:
+        corpo = app.json.dumps(dados).encode("utf-8")
+        return corpo, hashlib.blake2b(corpo, digest_size=16).hexdigest()
+
+cache_ranking = CacheResposta()
+canal_ranking = CanalEventos()
+
+def resposta_em_cache(corpo: bytes, etag: str):
+    """200 com ETag, ou 304 sem corpo se o cliente mandou a mesma ETag em If-None-Match"""
+    resposta = app.response_class(corpo, mimetype="application/json")
+    resposta.set_etag(etag)
+    # O navegador guarda, mas sempre confere a ETag antes de reaproveitar
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
 def iniciar_api():
     app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
 
-def obter_data_entrada_aleatoria():
-    dias_atras = random.randint(1, 30)
-    data = datetime.now() - timedelta(days=dias_atras)
-    return data.strftime("%Y-%m-%d")
+# Quanto o snapshot anterior continua mapeado depois da troca, para as requisições que já o pegaram
+PRAZO_SNAPSHOT_ANTERIOR = 30.0
 
-def obter_ultima_atividade_aleatoria():
-    horas_atras = random.randint(0, 24)
-    data = datetime.now() - timedelta(hours=horas_atras)
-    return data.strftime("%Y-%m-%d %H:%M")
+def preparar_trabalhador(arquivo_binario: str, intervalo: float = INTERVALO_PUBLICACAO,
+                         prazo_anterior: float = PRAZO_SNAPSHOT_ANTERIOR):
+    """Roda em cada processo trabalhador: serve o snapshot publicado pelo jogo
+    e troca para o novo a cada publicação. A troca é de jogo_global inteiro
+    (um EstadoPublicado), com ranking e somas do mesmo snapshot; o anterior
+    é fechado prazo_anterior segundos depois."""
+    global jogo_global
+    # Com fork, o processo herda o jogo do pai; aqui só vale o snapshot publicado
+    jogo_global = None
+
+    def recarregar():
+        global jogo_global
+        estado = EstadoPublicado.abrir(arquivo_binario)
+        if estado is None:
+            return
+        anterior, jogo_global = jogo_global, estado
+        # Os deltas por jogador ficam no processo do jogo; aqui os painéis só sabem que é hora de recarregar
+        canal_ranking.publicar("ranking", {"estatisticas": estado.agregados.resumo()})
+        if anterior is not None:
+            fechamento = threading.Timer(prazo_anterior, anterior.fechar)
+            fechamento.daemon = True
+            fechamento.start()
+
+    AcompanhadorArquivo(arquivo_binario, recarregar, intervalo).iniciar()
+    return app
+
+def iniciar_api_trabalhadores(jogo: "SobreviventeInsalubre", quantidade: int,
+                              arquivo_binario: Optional[str] = None) -> TrabalhadoresAPI:
+    """API em processos separados; o jogo continua como único escritor e publica o ranking para eles.
+
+    Com arquivo_binario, os trabalhadores servem esse snapshot já gravado e nada é publicado.
+    """
+    if arquivo_binario is None:
+        arquivo_binario = arquivo_publicado(jogo.arquivo_ranking or persistencia.ARQUIVO_RANKING)
+        publicador = PublicadorSnapshot(lambda: jogo.ranking, arquivo_binario)
+        publicador.iniciar()
+        atexit.register(publicador.parar)
+    trabalhadores = TrabalhadoresAPI(preparar_trabalhador, (arquivo_binario,), quantidade)
+    # Registrado por último, roda primeiro: os trabalhadores param antes da última publicação
+    atexit.register(trabalhadores.encerrar)
+    return trabalhadores
+
+def formatar_momento(momento: int, formato: str = "%Y-%m-%d") -> Optional[str]:
+    """Data local de um momento do histórico; None se ele for desconhecido (0)"""
+    return datetime.fromtimestamp(momento).strftime(formato) if momento else None
+
+def obter_data_entrada(no_jogador: NoAVL) -> Optional[str]:
+    """Primeira AVL com momento conhecido (as datas do histórico só crescem)"""
+    datas = no_jogador.historico_datas
+    fim = tamanho_historico(no_jogador)
+    primeira = bisect_right(datas, 0, 0, fim)
+    return formatar_momento(datas[primeira]) if primeira < fim else None
+
+def obter_ultima_atividade(no_jogador: NoAVL, formato: str = "%Y-%m-%d") -> Optional[str]:
+    fim = tamanho_historico(no_jogador)
+    return formatar_momento(no_jogador.historico_datas[fim - 1], formato) if fim else None
+
+def posicoes_nas_janelas(nome_jogador: str) -> dict:
+    posicoes = {}
+    for nome_janela in JANELAS:
+        posicao = jogo_global.janelas.posicao(nome_janela, nome_jogador)
+        posicoes[nome_janela] = {"posicao": posicao[0], "pontuacao": posicao[1]} if posicao else None
+    return posicoes
 
 def calcular_conquistas_reais(no_jogador):
     conquistas = 0
@@ -1915,96 +2090,352 @@ def calcular_conquistas_reais(no_jogador):
     if no_jogador.contador_mortes <= 3 and no_jogador.total_avls >= 5:
         conquistas += 1
 
-    return min(10, conquistas + random.randint(0, 2))
+    return min(10, conquistas + valor_estavel(no_jogador.nome_jogador, "conquistas_reais", 3))
+
+def dados_jogador_ranking(no: NoAVL, rank: int) -> dict:
+    """Linha do ranking como o frontend espera"""
+    total_avls = no.total_avls
+    mortes = no.contador_mortes
+    taxa_vitoria = calcular_taxa_vitoria(no)
+    classe_info = obter_classe(no.nome_jogador)
+    status_info = obter_status(no.nome_jogador)
+
+    return {
+        "id": rank,
+        "rank": rank,
+        "nome": no.nome_jogador,
+        "pontuacao": no.pontuacao_recorde,
+        "chefes": no.chefes_derrotados,
+        "eventos": no.record_eventos,
+        "mortes": mortes,
+        "avls": total_avls,
+        "taxa_vitoria": taxa_vitoria,
+        "classe": classe_info["nome"],
+        "classe_id": classe_info["id"],
+        "classe_color": classe_info["color"],
+        "status": status_info["id"],
+        "status_name": status_info["name"],
+        "status_color": status_info["color"],
+        "nivel": calcular_nivel(no.pontuacao_recorde),
+        "sanidade": calcular_sanidade(no),
+        "apelido": obter_apelido(no.nome_jogador),
+        "tempo_jogo": calcular_tempo_jogo(no),
+        "equipamento": {
+            "arma_principal": obter_arma(no.nome_jogador),
+            "dano": calcular_dano(no),
+            "arma_secundaria": obter_arma(no.nome_jogador, "secundaria") if tem_mao_secundaria(no.nome_jogador) else None,
+            "dano_secundaria": calcular_dano(no) // 2,
+            "armadura": obter_armadura(no.nome_jogador)
+        },
+        "atributos": {
+            "forca": calcular_atributo("forca", no),
+            "agilidade": calcular_atributo("agilidade", no),
+            "inteligencia": calcular_atributo("inteligencia", no),
+            "vitalidade": calcular_atributo("vitalidade", no)
+        },
+        "data_entrada": obter_data_entrada(no),
+        "ultima_atividade": obter_ultima_atividade(no, "%Y-%m-%d %H:%M"),
+        "conquistas": calcular_conquistas_reais(no)
+    }
+
+ORDENACOES_RANKING = ("pontuacao", "nome")
+
+def codificar_cursor(ordenar: str, no: NoAVL) -> str:
+    """Cursor opaco: a chave do último jogador da página, na ordenação pedida"""
+    chave = [no.pontuacao_recorde, no.nome_jogador] if ordenar == "pontuacao" else no.nome_jogador
+    texto = json.dumps([ordenar, chave], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).decode("ascii").rstrip("=")
+
+def ler_cursor(cursor: str, ordenar: str):
+    """Chave guardada no cursor, ou ValueError se ele não for desta ordenação"""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ordenacao, chave = json.loads(texto)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if ordenacao != ordenar:
+        raise ValueError("Cursor de outra ordenação")
+    if ordenar == "pontuacao":
+        if not (isinstance(chave, list) and len(chave) == 2
+                and isinstance(chave[0], int) and isinstance(chave[1], str)):
+            raise ValueError("Cursor inválido")
+        return tuple(chave)
+    if not isinstance(chave, str):
+        raise ValueError("Cursor inválido")
+    return chave
+
+# Jogadores lidos do ranking por vez quando uma rota precisa ir além de uma página
+TAMANHO_LOTE_PERCURSO = 500
+
+def paginas_ranking(ranking, ordenar: str, crescente: bool, depois=None) -> Iterator[List[NoAVL]]:
+    """O ranking na ordem pedida, depois da chave depois, em páginas de TAMANHO_LOTE_PERCURSO.
+
+    Entre uma página e outra não fica nenhum percurso aberto na árvore: cada
+    página continua da chave do último jogador da anterior.
+    """
+    while True:
+        if ordenar == "pontuacao":
+            pagina = ranking.pagina_pontuacao(TAMANHO_LOTE_PERCURSO, depois, crescente)
+        else:
+            pagina = ranking.pagina_nome(TAMANHO_LOTE_PERCURSO, depois, crescente)
+        if not pagina:
+            return
+        yield pagina
+
+        if len(pagina) < TAMANHO_LOTE_PERCURSO:
+            return
+        ultimo = pagina[-1]
+        depois = (ultimo.pontuacao_recorde, ultimo.nome_jogador) if ordenar == "pontuacao" else ultimo.nome_jogador
+
+def pagina_da_classe(ranking, ordenar: str, crescente: bool, limite: int, depois, classe: str) -> List[NoAVL]:
+    """Os próximos limite jogadores da classe, continuando da chave depois.
+
+    A classe sai do nome e não tem índice: a página percorre o ranking na
+    ordem pedida até juntar limite jogadores dela. Com as classes espalhadas
+    por igual são uns limite × len(CLASSES) jogadores lidos, a qualquer
+    profundidade, porque o cursor retoma de onde a página anterior parou.
+    Contar a classe inteira seria uma passada por todos os jogadores, então
+    essas páginas não têm total nem deslocamento.
+    """
+    pagina = []
+    for lote in paginas_ranking(ranking, ordenar, crescente, depois):
+        for no in lote:
+            if obter_classe(no.nome_jogador)["id"] == classe:
+                pagina.append(no)
+                if len(pagina) == limite:
+                    return pagina
+    return pagina
+
+def ler_ordenacao() -> Tuple[str, str]:
+    """(ordenar, ordem) da requisição; ordem padrão: desc por pontuação, asc por nome"""
+    ordenar = request.args.get('ordenar', 'pontuacao')
+    if ordenar not in ORDENACOES_RANKING:
+        raise ValueError(f"Ordenação desconhecida (opções: {', '.join(ORDENACOES_RANKING)})")
+    ordem = request.args.get('ordem', 'desc' if ordenar == 'pontuacao' else 'asc')
+    if ordem not in ('asc', 'desc'):
+        raise ValueError("ordem deve ser asc ou desc")
+    return ordenar, ordem
+
+def montar_pagina_ranking(ranking, agregados: AgregadosRanking, ordenar: str, crescente: bool, limite: int,
+                          deslocamento: int, depois, classe: Optional[str] = None) -> dict:
+    """Uma página do ranking em O(log n + limite): o deslocamento vira a chave do
+    jogador logo antes da página (seleção por posição) e o percurso continua dela.
+    Com classe, a página só tem jogadores dela e não há total (pagina_da_classe)."""
+    total = ranking.contar_jogadores() if ranking else 0
+    pagina = []
+    if ranking and classe is not None:
+        pagina = pagina_da_classe(ranking, ordenar, crescente, limite, depois, classe)
+    elif ranking and deslocamento < total:
+        if depois is None and deslocamento:
+            # Posição, no armazenamento, do último jogador antes da página; as posições
+            # contam do maior recorde e do primeiro nome, então as outras ordens contam do fim
+            invertida = (ordenar == "pontuacao") == crescente
+            posicao = total + 1 - deslocamento if invertida else deslocamento
+            if ordenar == "pontuacao":
+                anterior = ranking.jogador_na_posicao(posicao)
+                depois = (anterior.pontuacao_recorde, anterior.nome_jogador)
+            else:
+                depois = ranking.jogador_na_posicao_nome(posicao).nome_jogador
+        if ordenar == "pontuacao":
+            pagina = ranking.pagina_pontuacao(limite, depois, crescente)
+        else:
+            pagina = ranking.pagina_nome(limite, depois, crescente)
+
+    resultados = []
+    if ordenar == "pontuacao" and pagina and classe is None:
+        # Jogadores consecutivos no ranking: só o primeiro precisa da busca de posição
+        rank = ranking.posicao_jogador(pagina[0].nome_jogador)
+        for no in pagina:
+            resultados.append(dados_jogador_ranking(no, rank))
+            rank += 1 if not crescente else -1
+    else:
+        resultados = [dados_jogador_ranking(no, ranking.posicao_jogador(no.nome_jogador)) for no in pagina]
+
+    return {
+        "jogadores": resultados,
+        "total": total if classe is None else None,
+        "ordenar": ordenar,
+        "ordem": "asc" if crescente else "desc",
+        "limite": limite,
+        "deslocamento": deslocamento,
+        "classe": classe,
+        "proximo_cursor": codificar_cursor(ordenar, pagina[-1]) if len(pagina) == limite else None,
+        "estatisticas": agregados.resumo()
+    }
 
 @app.route('/api/ranking', methods=['GET'])
 def obter_ranking():
-    global jogo_global
+    """Uma página do ranking.
 
-    if not jogo_global or not jogo_global.ranking:
-        return jsonify({
-            "jogadores": [],
-            "total": 0,
-            "estatisticas": {
-                "total_jogadores": 0,
-                "pontuacao_media": 0,
-                "total_chefes": 0,
-                "total_eventos": 0,
-                "taxa_vitoria_media": 0,
-                "jogadores_ativos": 0
-            }
-        })
+    ordenar=pontuacao|nome, ordem=desc|asc (padrão: desc por pontuação, asc por
+    nome), limite, e deslocamento ou cursor (o proximo_cursor da página anterior).
+    classe=<id> deixa na página só os jogadores dessa classe, paginados só por
+    cursor e sem total; o rank continua sendo a posição no ranking geral.
+    """
+    global jogo_global
 
-    resultados = []
+    try:
+        ordenar, ordem = ler_ordenacao()
+    except ValueError as erro:
+        return jsonify({"error": str(erro)}), 400
+    classe = request.args.get('classe')
+    if classe is not None and classe not in {info["id"] for info in CLASSES}:
+        return jsonify({"error": f"Classe desconhecida (opções: {', '.join(info['id'] for info in CLASSES)})"}), 400
+
+    deslocamento = request.args.get('deslocamento', 0, type=int)
+    cursor = request.args.get('cursor')
+    if deslocamento < 0:
+        return jsonify({"error": "deslocamento deve ser >= 0"}), 400
+    if cursor and deslocamento:
+        return jsonify({"error": "Use cursor ou deslocamento, não os dois"}), 400
+    if classe and deslocamento:
+        return jsonify({"error": "Com classe, pagine pelo cursor (proximo_cursor), não por deslocamento"}), 400
+    try:
+        depois = ler_cursor(cursor, ordenar) if cursor else None
+    except ValueError as erro:
+        return jsonify({"error": str(erro)}), 400
+    limite = ler_limite()
+
+    # Uma versão só do ranking por requisição: o jogo pode publicar outra no meio
+    origem = jogo_global.ranking if jogo_global else None
+    ranking = origem.instantaneo() if origem else None
+    agregados = jogo_global.agregados if jogo_global else AgregadosRanking()
+    # As somas do cabeçalho são atualizadas logo depois do ranking: as duas versões entram na chave
+    versao = (ranking.versao if ranking else 0, agregados.versao)
+    chave = (ordenar, ordem, limite, deslocamento, depois, classe)
+    corpo, etag = cache_ranking.obter(
+        origem, versao, chave,
+        lambda: montar_pagina_ranking(ranking, agregados, ordenar, ordem == 'asc', limite, deslocamento, depois,
+                                      classe))
+    resposta = resposta_em_cache(corpo, etag)
+    # Fora do corpo, para não trocar a ETag de uma página que não mudou; é o desde de /api/ranking/mudancas
+    resposta.headers['X-Ranking-Versao'] = str(versao[0])
+    return resposta
+
+def linhas_ranking(ranking, ordenar: str, crescente: bool) -> Iterator[bytes]:
+    """O ranking inteiro como NDJSON, um jogador por linha, lido em páginas (paginas_ranking).
+
+    Como nenhum percurso fica aberto entre as páginas, o jogo pode escrever
+    enquanto a resposta sai. Com o motor persistente o instantâneo nunca
+    muda; nos outros, quem mudar de lugar no meio pode sair duas vezes ou
+    nenhuma.
+    """
+    for pagina in paginas_ranking(ranking, ordenar, crescente):
+        rank = ranking.posicao_jogador(pagina[0].nome_jogador)
+        for no in pagina:
+            if ordenar == "nome":
+                rank = ranking.posicao_jogador(no.nome_jogador)
+            yield app.json.dumps(dados_jogador_ranking(no, rank)).encode("utf-8") + b"\n"
+            rank += 1 if not crescente else -1
+
+@app.route('/api/ranking/stream', methods=['GET'])
+def exportar_ranking():
+    """O ranking completo em NDJSON (application/x-ndjson), gerado enquanto é enviado.
+
+    Aceita ordenar e ordem como /api/ranking; a memória usada não cresce com
+    o número de jogadores e o primeiro jogador sai sem esperar os outros.
+    """
+    global jogo_global
 
-    def coletar_jogadores(no):
-        if no:
-            coletar_jogadores(no.esquerda)
-
-            total_avls = no.total_avls
-            mortes = no.contador_mortes
-            vitorias = max(0, total_avls - mortes)
-            taxa_vitoria = int((vitorias / total_avls * 100)) if total_avls > 0 else 0
-
-            jogador_data = {
-                "id": len(resultados) + 1,
-                "nome": no.nome_jogador,
-                "pontuacao": no.pontuacao_recorde,
-                "chefes": no.chefes_derrotados,
-                "eventos": no.record_eventos,
-                "mortes": mortes,
-                "avls": total_avls,
-                "taxa_vitoria": taxa_vitoria,
-                "classe": "Guerreiro",
-                "classe_id": "warrior",
-                "classe_color": "#ff6b6b",
-                "status": "offline",
-                "status_name": "Offline",
-                "status_color": "#666",
-                "nivel": calcular_nivel(no.pontuacao_recorde),
-                "sanidade": 50,
-                "apelido": f"Jogador_{no.nome_jogador}",
-                "tempo_jogo": calcular_tempo_jogo(total_avls),
-                "equipamento": {
-                    "arma_principal": "Espada Longa",
-                    "dano": calcular_dano(no.pontuacao_recorde)
-                },
-                "data_entrada": obter_data_entrada_aleatoria(),
-                "ultima_atividade": obter_ultima_atividade_aleatoria(),
-                "conquistas": calcular_conquistas_reais(no)
-            }
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
 
-            resultados.append(jogador_data)
-            coletar_jogadores(no.direita)
+    try:
+        ordenar, ordem = ler_ordenacao()
+    except ValueError as erro:
+        return jsonify({"error": str(erro)}), 400
+
+    ranking = jogo_global.ranking.instantaneo()
+    resposta = app.response_class(linhas_ranking(ranking, ordenar, ordem == 'asc'),
+                                  mimetype="application/x-ndjson")
+    resposta.cache_control.no_store = True
+    return resposta
+
+# Sem eventos por esse tempo, a conexão SSE recebe um comentário: proxies não a fecham
+# e um painel que já saiu é notado na escrita
+ESPERA_EVENTOS = 15.0
+
+def ler_ultimo_evento() -> int:
+    """Last-Event-ID (reconexão do EventSource) ou ?desde=; sem nenhum, só os eventos a partir de agora"""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    if not valor:
+        # Lido já na requisição, não quando o gerador começar: nada publicado depois dela se perde
+        return canal_ranking.ultimo_id
+    try:
+        return int(valor)
+    except ValueError:
+        return -1
+
+def linhas_eventos(ultimo_id: int) -> Iterator[str]:
+    yield "retry: 3000\n\n"
+    while True:
+        eventos = canal_ranking.depois_de(ultimo_id, ESPERA_EVENTOS)
+        if eventos is None:
+            # Eventos perdidos: o painel busca o ranking de novo e segue daqui
+            ultimo_id = canal_ranking.ultimo_id
+            yield f"id: {ultimo_id}\nevent: recarregar\ndata: {{}}\n\n"
+        elif not eventos:
+            yield ": ping\n\n"
+        for ultimo_id, tipo, dados in eventos or ():
+            yield f"id: {ultimo_id}\nevent: {tipo}\ndata: {dados}\n\n"
+
+@app.route('/api/ranking/eventos', methods=['GET'])
+def eventos_ranking():
+    """Server-Sent Events com as mudanças do ranking.
+
+    jogador: delta de um jogador ao fim de cada AVL (recorde, posição,
+    mortes...) com as estatísticas gerais atualizadas; ranking: a API em
+    trabalhadores carregou um snapshot novo; recarregar: a conexão perdeu
+    eventos e o painel deve buscar a página de novo.
+    """
+    resposta = app.response_class(linhas_eventos(ler_ultimo_evento()), mimetype="text/event-stream")
+    resposta.cache_control.no_cache = True
+    # Proxies como o nginx não devem segurar os eventos em buffer
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+def montar_mudancas(ranking, versao: int, desde: int) -> dict:
+    # desde acima da versão atual não é deste ranking (o servidor reiniciou, por exemplo)
+    alterados = ranking.mudancas_desde(desde, LIMITE_CONSULTA_MAXIMO) if desde <= versao else None
+    jogadores = []
+    for no in alterados or ():
+        dados = dados_jogador_ranking(no, ranking.posicao_jogador(no.nome_jogador))
+        dados["versao_alteracao"] = no.versao_alteracao
+        jogadores.append(dados)
+    return {
+        "versao": versao,
+        "desde": desde,
+        "jogadores": jogadores,
+        "recarregar": alterados is None
+    }
 
-    coletar_jogadores(jogo_global.ranking)
+@app.route('/api/ranking/mudancas', methods=['GET'])
+def obter_mudancas_ranking():
+    """Jogadores alterados depois de ?desde=<versao>, do mais antigo ao mais recente.
 
-    resultados.sort(key=lambda x: x["pontuacao"], reverse=True)
+    O cliente começa com o X-Ranking-Versao de /api/ranking, guarda a versao
+    de cada resposta e a manda como desde na próxima vez. O rank de cada jogador é o atual; quem não está na lista pode ter
+    mudado de posição por causa dos outros. recarregar=true quando mudaram
+    mais de LIMITE_CONSULTA_MAXIMO jogadores ou desde não é deste ranking:
+    o cliente busca /api/ranking de novo.
+    """
+    global jogo_global
 
-    for i, jogador in enumerate(resultados):
-        jogador["rank"] = i + 1
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
 
-    if resultados:
-        pontuacao_media = sum(j["pontuacao"] for j in resultados) // len(resultados)
-        total_chefes = sum(j["chefes"] for j in resultados)
-        total_eventos = sum(j["eventos"] for j in resultados)
-        taxa_vitoria_media = sum(j["taxa_vitoria"] for j in resultados) // len(resultados)
-        jogadores_ativos = 0
-    else:
-        pontuacao_media = total_chefes = total_eventos = taxa_vitoria_media = jogadores_ativos = 0
+    desde = request.args.get('desde', type=int)
+    if desde is None or desde < 0:
+        return jsonify({"error": "Informe desde=<versao> (inteiro >= 0)"}), 400
 
-    return jsonify({
-        "jogadores": resultados,
-        "total": len(resultados),
-        "estatisticas": {
-            "total_jogadores": len(resultados),
-            "pontuacao_media": pontuacao_media,
-            "total_chefes": total_chefes,
-            "total_eventos": total_eventos,
-            "taxa_vitoria_media": taxa_vitoria_media,
-            "jogadores_ativos": jogadores_ativos
-        }
-    })
+    origem = jogo_global.ranking
+    ranking = origem.instantaneo()
+    versao = ranking.versao
+    # Mesma versão de cache que /api/ranking, para uma rota não descartar as entradas da outra
+    corpo, etag = cache_ranking.obter(
+        origem, (versao, jogo_global.agregados.versao), ("mudancas", desde),
+        lambda: montar_mudancas(ranking, versao, desde))
+    return resposta_em_cache(corpo, etag)
 
 @app.route('/api/jogador/<nome>', methods=['GET'])
 def obter_jogador(nome):
@@ -2013,27 +2444,27 @@ def obter_jogador(nome):
     if not jogo_global:
         return jsonify({"error": "Jogo não inicializado"}), 500
 
-    no_jogador = jogo_global.encontrar_jogador(jogo_global.ranking, nome)
+    ranking = jogo_global.ranking.instantaneo()
+
+    no_jogador = ranking.buscar(nome)
 
     if not no_jogador:
         return jsonify({"error": "Jogador não encontrado"}), 404
 
-    total_avls = no_jogador.total_avls
-    mortes = no_jogador.contador_mortes
-    vitorias = max(0, total_avls - mortes)
-    taxa_vitoria = int((vitorias / total_avls * 100)) if total_avls > 0 else 0
-
-    historico = no_jogador.historico_avls[-10:] if no_jogador.historico_avls else []
+    estatisticas = estatisticas_do_no(no_jogador)
+    historico = avls_recentes(no_jogador)
 
-    classe_info = obter_classe_aleatoria()
-    status_info = obter_status_aleatorio()
+    classe_info = obter_classe(no_jogador.nome_jogador)
+    status_info = obter_status(no_jogador.nome_jogador)
 
     jogador_info = {
         "nome": no_jogador.nome_jogador,
+        "rank": ranking.posicao_jogador(no_jogador.nome_jogador),
+        "melhor_que_percentual": jogo_global.distribuicao.melhor_que(no_jogador.pontuacao_recorde),
         "classe": classe_info["nome"],
         "classe_id": classe_info["id"],
         "classe_color": classe_info["color"],
-        "apelido": obter_apelido_aleatorio(),
+        "apelido": obter_apelido(no_jogador.nome_jogador),
         "status": status_info["id"],
         "status_name": status_info["name"],
         "status_color": status_info["color"],
@@ -2041,24 +2472,24 @@ def obter_jogador(nome):
         "pontuacao": no_jogador.pontuacao_recorde,
         "chefes": no_jogador.chefes_derrotados,
         "eventos": no_jogador.record_eventos,
-        "mortes": mortes,
-        "avls": total_avls,
-        "taxa_vitoria": taxa_vitoria,
-        "tempo_jogo": calcular_tempo_jogo(total_avls),
-        "data_entrada": obter_data_entrada(),
-        "ultima_atividade": obter_ultima_atividade(),
+        "mortes": no_jogador.contador_mortes,
+        "avls": no_jogador.total_avls,
+        "taxa_vitoria": calcular_taxa_vitoria(no_jogador),
+        "tempo_jogo": calcular_tempo_jogo(no_jogador),
+        "data_entrada": obter_data_entrada(no_jogador),
+        "ultima_atividade": obter_ultima_atividade(no_jogador),
         "conquistas": calcular_conquistas(no_jogador),
-        "sanidade": random.randint(10, 90),
+        "sanidade": calcular_sanidade(no_jogador),
         "equipamento": {
             "mainHand": {
-                "name": obter_arma_aleatoria(),
-                "damage": calcular_dano(no_jogador.pontuacao_recorde)
+                "name": obter_arma(no_jogador.nome_jogador),
+                "damage": calcular_dano(no_jogador)
             },
             "offHand": {
-                "name": obter_arma_aleatoria() if random.random() > 0.5 else None,
-                "damage": calcular_dano(no_jogador.pontuacao_recorde) // 2 if random.random() > 0.5 else 0
-            } if random.random() > 0.3 else None,
-            "armadura": obter_armadura_aleatoria()
+                "name": obter_arma(no_jogador.nome_jogador, "secundaria"),
+                "damage": calcular_dano(no_jogador) // 2
+            } if tem_mao_secundaria(no_jogador.nome_jogador) else None,
+            "armadura": obter_armadura(no_jogador.nome_jogador)
         },
         "stats": {
             "strength": calcular_atributo("forca", no_jogador),
@@ -2067,91 +2498,263 @@ def obter_jogador(nome):
             "vitality": calcular_atributo("vitalidade", no_jogador)
         },
         "historico": historico,
-        "melhor_pontuacao": max(historico) if historico else 0,
-        "pior_pontuacao": min(historico) if historico else 0,
-        "media_pontuacao": sum(historico) / len(historico) if historico else 0,
+        "melhor_pontuacao": estatisticas.maximo,
+        "pior_pontuacao": estatisticas.minimo,
+        "media_pontuacao": estatisticas.media(),
+        "desvio_padrao_pontuacao": estatisticas.desvio_padrao(),
         "achievements": calcular_conquistas(no_jogador),
-        "playtime": calcular_tempo_jogo(total_avls),
+        "playtime": calcular_tempo_jogo(no_jogador),
         "level": calcular_nivel(no_jogador.pontuacao_recorde),
-        "joinDate": obter_data_entrada(),
-        "lastActive": obter_ultima_atividade()
+        "joinDate": obter_data_entrada(no_jogador),
+        "lastActive": obter_ultima_atividade(no_jogador),
+        "janelas": posicoes_nas_janelas(no_jogador.nome_jogador)
     }
 
+    # O histórico inteiro é O(AVLs do jogador): só sob pedido explícito
+    if request.args.get('historico') == 'completo':
+        jogador_info["historico_completo"] = no_jogador.historico_avls[:tamanho_historico(no_jogador)].tolist()
+
     return jsonify(jogador_info)
 
-@app.route('/api/estatisticas', methods=['GET'])
-def obter_estatisticas_gerais():
+@app.route('/api/jogador/<nome>/posicao', methods=['GET'])
+def obter_posicao_jogador(nome):
     global jogo_global
 
     if not jogo_global:
         return jsonify({"error": "Jogo não inicializado"}), 500
 
+    ranking = jogo_global.ranking.instantaneo()
+
+    posicao = ranking.posicao_jogador(nome)
+    if posicao is None:
+        return jsonify({"error": "Jogador não encontrado"}), 404
+
     return jsonify({
-        "total_mortes": jogo_global.total_mortes,
-        "total_jogadores": jogo_global.contar_jogadores(jogo_global.ranking),
-        "versao_jogo": "1.0.0",
-        "ultima_atualizacao": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "nome": nome,
+        "rank": posicao,
+        "total": ranking.contar_jogadores()
     })
 
-def obter_classe_aleatoria():
-    classes = [
-        {"id": "warrior", "nome": "Guerreiro", "color": "#ff6b6b"},
-        {"id": "mage", "nome": "Mago", "color": "#4ecdc4"},
-        {"id": "archer", "nome": "Arqueiro", "color": "#45b7d1"},
-        {"id": "paladin", "nome": "Paladino", "color": "#ffd166"},
-        {"id": "rogue", "nome": "Ladino", "color": "#96ceb4"},
-        {"id": "berserker", "nome": "Berserker", "color": "#ff5252"},
-        {"id": "necromancer", "nome": "Necromante", "color": "#a78bfa"},
-        {"id": "knight", "nome": "Cavaleiro", "color": "#667eea"},
-        {"id": "assassin", "nome": "Assassino", "color": "#43e97b"},
-        {"id": "druid", "nome": "Druida", "color": "#38f9d7"}
+@app.route('/api/ranking/posicao/<int:posicao>', methods=['GET'])
+def obter_jogador_na_posicao(posicao):
+    global jogo_global
+
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
+
+    ranking = jogo_global.ranking.instantaneo()
+
+    no_jogador = ranking.jogador_na_posicao(posicao)
+    if not no_jogador:
+        return jsonify({"error": "Posição fora do ranking"}), 404
+
+    return jsonify({
+        "rank": posicao,
+        "nome": no_jogador.nome_jogador,
+        "pontuacao": no_jogador.pontuacao_recorde,
+        "chefes": no_jogador.chefes_derrotados,
+        "eventos": no_jogador.record_eventos,
+        "mortes": no_jogador.contador_mortes,
+        "avls": no_jogador.total_avls
+    })
+
+LIMITE_CONSULTA_PADRAO = 100
+LIMITE_CONSULTA_MAXIMO = 1000
+
+def ler_limite() -> int:
+    limite = request.args.get('limite', LIMITE_CONSULTA_PADRAO, type=int)
+    return max(1, min(limite, LIMITE_CONSULTA_MAXIMO))
+
+@app.route('/api/ranking/intervalo', methods=['GET'])
+def obter_intervalo_pontuacao():
+    """Jogadores com recorde entre min e max, na ordem do ranking"""
+    global jogo_global
+
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
+
+    ranking = jogo_global.ranking.instantaneo()
+
+    minimo = request.args.get('min', type=int)
+    maximo = request.args.get('max', type=int)
+    if minimo is None or maximo is None or minimo > maximo:
+        return jsonify({"error": "Informe min <= max (inteiros)"}), 400
+
+    # Os resultados são consecutivos no ranking: só o primeiro precisa da busca de posição
+    resultados = []
+    rank = None
+    for no in islice(ranking.intervalo_pontuacao(minimo, maximo), ler_limite()):
+        if rank is None:
+            rank = ranking.posicao_jogador(no.nome_jogador)
+        resultados.append(dados_jogador_ranking(no, rank))
+        rank += 1
+
+    return jsonify({
+        "jogadores": resultados,
+        "total": len(resultados),
+        "min": minimo,
+        "max": maximo
+    })
+
+@app.route('/api/jogadores/busca', methods=['GET'])
+def buscar_jogadores_por_prefixo():
+    """Autocompletar: jogadores cujo nome começa com o prefixo, em ordem de nome"""
+    global jogo_global
+
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
+
+    ranking = jogo_global.ranking.instantaneo()
+
+    prefixo = request.args.get('prefixo', '')
+    if not prefixo:
+        return jsonify({"error": "Informe o prefixo"}), 400
+
+    resultados = [
+        dados_jogador_ranking(no, ranking.posicao_jogador(no.nome_jogador))
+        for no in islice(ranking.prefixo_nome(prefixo), ler_limite())
     ]
-    return random.choice(classes)
-
-def obter_apelido_aleatorio():
-    apelidos = ["Lâmina Sombria", "Senhor das Chamas", "Caçador Noturno",
-                "Guardião Ancestral", "Voz do Abismo", "Andarilho Solitário",
-                "Mão da Justiça", "Olho da Tempestade", "Corvo Sábio", "Lobo Prateado"]
-    return random.choice(apelidos)
-
-def obter_status_aleatorio():
-    status = [
-        {"id": "online", "name": "Online", "color": "#43e97b"},
-        {"id": "offline", "name": "Offline", "color": "#666"},
-        {"id": "ingame", "name": "Em Jogo", "color": "#4facfe"}
+
+    return jsonify({
+        "jogadores": resultados,
+        "total": len(resultados),
+        "prefixo": prefixo
+    })
+
+@app.route('/api/ranking/janela/<nome_janela>', methods=['GET'])
+def obter_ranking_janela(nome_janela):
+    """Top da janela (24h, 7d ou temporada) pela melhor AVL de cada jogador dentro dela"""
+    global jogo_global
+
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
+    if nome_janela not in JANELAS:
+        return jsonify({"error": f"Janela desconhecida (opções: {', '.join(JANELAS)})"}), 404
+
+    janelas = jogo_global.janelas
+    resultados = [
+        {
+            "rank": posicao,
+            "nome": nome,
+            "pontuacao": pontuacao,
+            "ultima_avl": formatar_momento(ultima_avl, "%Y-%m-%d %H:%M")
+        }
+        for posicao, (nome, pontuacao, ultima_avl) in enumerate(janelas.top_n(nome_janela, ler_limite()), 1)
     ]
-    pesos = [0.3, 0.4, 0.3]
-    return random.choices(status, weights=pesos)[0]
 
-def obter_arma_aleatoria():
-    armas = ["Espada Longa", "Cajado Arcano", "Arco Composto", "Martelo Sagrado",
-             "Adagas Gêmeas", "Machado de Batalha", "Foice da Morte", "Lança de Cavaleiro",
-             "Katana", "Cajado da Natureza", "Claymore", "Bacamarte", "Pistola"]
-    return random.choice(armas)
+    return jsonify({
+        "janela": nome_janela,
+        "desde": formatar_momento(janelas.inicio(nome_janela), "%Y-%m-%d %H:%M"),
+        "total": janelas.contar_jogadores(nome_janela),
+        "jogadores": resultados
+    })
 
-def obter_armadura_aleatoria():
-    armaduras = ["Armadura de Placas", "Túnica Arcana", "Couro Reforçado",
-                 "Manto Élfico", "Armadura Óssea", "Vestes Sagradas"]
-    return random.choice(armaduras)
+@app.route('/api/estatisticas', methods=['GET'])
+def obter_estatisticas_gerais():
+    global jogo_global
+
+    if not jogo_global:
+        return jsonify({"error": "Jogo não inicializado"}), 500
+
+    ranking = jogo_global.ranking.instantaneo()
+
+    estatisticas = {
+        "total_mortes": jogo_global.total_mortes,
+        **jogo_global.agregados.resumo(),
+        "distribuicao": jogo_global.distribuicao.resumo(),
+        "versao_jogo": "1.0.0",
+        # A versão do ranking lido, não o relógio: sem escritas, o corpo não muda
+        "versao_ranking": ranking.versao
+    }
+
+    nome = request.args.get('jogador')
+    if nome:
+        no_jogador = ranking.buscar(nome)
+        if not no_jogador:
+            return jsonify({"error": "Jogador não encontrado"}), 404
+        estatisticas["jogador"] = {
+            "nome": no_jogador.nome_jogador,
+            "pontuacao": no_jogador.pontuacao_recorde,
+            "melhor_que_percentual": jogo_global.distribuicao.melhor_que(no_jogador.pontuacao_recorde)
+        }
+
+    return jsonify(estatisticas)
+
+CLASSES = [
+    {"id": "warrior", "nome": "Guerreiro", "color": "#ff6b6b"},
+    {"id": "mage", "nome": "Mago", "color": "#4ecdc4"},
+    {"id": "archer", "nome": "Arqueiro", "color": "#45b7d1"},
+    {"id": "paladin", "nome": "Paladino", "color": "#ffd166"},
+    {"id": "rogue", "nome": "Ladino", "color": "#96ceb4"},
+    {"id": "berserker", "nome": "Berserker", "color": "#ff5252"},
+    {"id": "necromancer", "nome": "Necromante", "color": "#a78bfa"},
+    {"id": "knight", "nome": "Cavaleiro", "color": "#667eea"},
+    {"id": "assassin", "nome": "Assassino", "color": "#43e97b"},
+    {"id": "druid", "nome": "Druida", "color": "#38f9d7"}
+]
+
+APELIDOS = ["Lâmina Sombria", "Senhor das Chamas", "Caçador Noturno",
+            "Guardião Ancestral", "Voz do Abismo", "Andarilho Solitário",
+            "Mão da Justiça", "Olho da Tempestade", "Corvo Sábio", "Lobo Prateado"]
+
+# Status e quantos décimos dos jogadores caem em cada um
+STATUS = [
+    ({"id": "online", "name": "Online", "color": "#43e97b"}, 3),
+    ({"id": "offline", "name": "Offline", "color": "#666"}, 4),
+    ({"id": "ingame", "name": "Em Jogo", "color": "#4facfe"}, 3)
+]
+
+ARMAS = ["Espada Longa", "Cajado Arcano", "Arco Composto", "Martelo Sagrado",
+         "Adagas Gêmeas", "Machado de Batalha", "Foice da Morte", "Lança de Cavaleiro",
+         "Katana", "Cajado da Natureza", "Claymore", "Bacamarte", "Pistola"]
+
+ARMADURAS = ["Armadura de Placas", "Túnica Arcana", "Couro Reforçado",
+             "Manto Élfico", "Armadura Óssea", "Vestes Sagradas"]
+
+def valor_estavel(nome_jogador: str, campo: str, quantidade: int) -> int:
+    """Inteiro em [0, quantidade) fixo para o jogador e o campo.
+
+    Os atributos que o jogo não registra (classe, apelido, equipamento...)
+    saem do crc32 do nome em vez de random: duas requisições iguais geram o
+    mesmo corpo, que pode ficar em cache até o ranking mudar.
+    """
+    return zlib.crc32(f"{campo}:{nome_jogador}".encode("utf-8")) % quantidade
+
+def obter_classe(nome_jogador: str) -> dict:
+    """A classe do jogador; fixa, para o ranking poder ser filtrado por ela"""
+    return CLASSES[valor_estavel(nome_jogador, "classe", len(CLASSES))]
+
+def obter_apelido(nome_jogador: str) -> str:
+    return APELIDOS[valor_estavel(nome_jogador, "apelido", len(APELIDOS))]
+
+def obter_status(nome_jogador: str) -> dict:
+    sorteio = valor_estavel(nome_jogador, "status", 10)
+    for status, peso in STATUS:
+        if sorteio < peso:
+            return status
+        sorteio -= peso
+    return STATUS[-1][0]
+
+def obter_arma(nome_jogador: str, mao: str = "principal") -> str:
+    return ARMAS[valor_estavel(nome_jogador, f"arma_{mao}", len(ARMAS))]
+
+def obter_armadura(nome_jogador: str) -> str:
+    return ARMADURAS[valor_estavel(nome_jogador, "armadura", len(ARMADURAS))]
+
+def tem_mao_secundaria(nome_jogador: str) -> bool:
+    return valor_estavel(nome_jogador, "mao_secundaria", 10) >= 3
 
 def calcular_nivel(pontuacao):
     return min(100, max(1, pontuacao // 1000 + 1))
 
-def calcular_tempo_jogo(total_avls):
-    return total_avls * 30 + random.randint(0, 100)
+def calcular_tempo_jogo(no_jogador):
+    return no_jogador.total_avls * 30 + valor_estavel(no_jogador.nome_jogador, "tempo_jogo", 101)
 
-def calcular_dano(pontuacao):
-    return min(500, max(10, pontuacao // 100 + random.randint(5, 20)))
+def calcular_dano(no_jogador):
+    return min(500, max(10, no_jogador.pontuacao_recorde // 100 + 5 + valor_estavel(no_jogador.nome_jogador, "dano", 16)))
 
-def obter_data_entrada():
-    dias_atras = random.randint(1, 365)
-    data = datetime.now() - timedelta(days=dias_atras)
-    return data.strftime("%Y-%m-%d")
-
-def obter_ultima_atividade():
-    horas_atras = random.randint(0, 168)
-    data = datetime.now() - timedelta(hours=horas_atras)
-    return data.strftime("%Y-%m-%d")
+def calcular_sanidade(no_jogador):
+    return 10 + valor_estavel(no_jogador.nome_jogador, "sanidade", 81)
 
 def calcular_conquistas(no_jogador):
     conquistas = 0
@@ -2163,7 +2766,7 @@ def calcular_conquistas(no_jogador):
         conquistas += 1
     if no_jogador.total_avls > 20:
         conquistas += 1
-    return min(10, conquistas + random.randint(1, 5))
+    return min(10, conquistas + 1 + valor_estavel(no_jogador.nome_jogador, "conquistas", 5))
 
 def calcular_atributo(tipo, no_jogador):
     base = 10
@@ -2176,10 +2779,29 @@ def calcular_atributo(tipo, no_jogador):
     elif tipo == "vitalidade":
         base += no_jogador.pontuacao_recorde // 2000
 
-    return min(100, max(10, base + random.randint(-3, 3)))
+    return min(100, max(10, base + valor_estavel(no_jogador.nome_jogador, tipo, 7) - 3))
 
 if __name__ == "__main__":
-    jogo_global = SobreviventeInsalubre()
+    parser = argparse.ArgumentParser(description="Insalubre Survivor")
+    parser.add_argument("--motor", choices=sorted(MOTORES),
+                        help="motor de armazenamento do ranking (padrão: persistente quando "
+                             "a API roda junto com o jogo, senão avl)")
+    parser.add_argument("--importar", metavar="ARQUIVO",
+                        help="importa resultados de AVLs (NDJSON) para o ranking e sai")
+    parser.add_argument("--trabalhadores", type=int, metavar="N",
+                        help="serve a API em N processos que leem o snapshot publicado pelo jogo, "
+                             "em vez de uma thread dentro do jogo")
+    argumentos = parser.parse_args()
+
+    if argumentos.importar:
+        jogo_global = SobreviventeInsalubre(motor=argumentos.motor or MOTOR_PADRAO)
+        jogo_global.carregar_ranking()
+        resultados = list(persistencia.ler_resultados(argumentos.importar))
+        jogo_global.importar_resultados(resultados)
+        jogo_global.encerrar_ranking()
+        print(f"📥 {len(resultados)} resultados importados; "
+              f"{jogo_global.ranking.contar_jogadores()} jogadores no ranking")
+        raise SystemExit(0)
 
     print("\n" + "="*60)
     print("🌑 INSALUBRE SURVIVOR - COM API DE RANKING")
@@ -2189,17 +2811,50 @@ if __name__ == "__main__":
     print("2. Apenas o jogo (sem API)")
     print("3. Apenas a API (sem jogo)")
     print("4. Testar conexão com frontend")
+    print("5. API em vários processos e jogo (produção)")
 
     escolha = input("\nEscolha: ").strip()
 
-    if escolha == "1":
-        api_thread = threading.Thread(target=iniciar_api, daemon=True)
-        api_thread.start()
-        print("\n✅ API iniciada em http://127.0.0.1:5000")
+    trabalhadores = argumentos.trabalhadores
+    if escolha == "5":
+        trabalhadores = trabalhadores or os.cpu_count() or 1
+
+    # Com a API numa thread e o jogo escrevendo, o motor persistente dá a cada
+    # requisição uma versão imutável do ranking, sem trava no laço do jogo; com
+    # trabalhadores, é dessa versão imutável que o snapshot deles é publicado
+    motor = argumentos.motor or ("persistente" if escolha in ("1", "4", "5") else MOTOR_PADRAO)
+    jogo_global = SobreviventeInsalubre(motor=motor)
+
+    # O modo de teste cria jogadores de exemplo que não devem ir para o ranking salvo;
+    # só a API lê direto do snapshot binário, sem montar a árvore
+    snapshot_mapeado = escolha == "3" and jogo_global.carregar_snapshot_binario()
+    if snapshot_mapeado:
+        print("📦 Ranking servido do snapshot binário mapeado em memória")
+    elif escolha != "4":
+        jogo_global.carregar_ranking()
+        atexit.register(jogo_global.encerrar_ranking)
+
+    if escolha in ("1", "5"):
+        if trabalhadores:
+            iniciar_api_trabalhadores(jogo_global, trabalhadores)
+            print(f"\n✅ API iniciada em http://127.0.0.1:5000 com {trabalhadores} processo(s)")
+            print(f"🔄 O ranking é republicado para eles a cada {INTERVALO_PUBLICACAO:g}s quando muda")
+        else:
+            api_thread = threading.Thread(target=iniciar_api, daemon=True)
+            api_thread.start()
+            print("\n✅ API iniciada em http://127.0.0.1:5000")
         print("📊 Endpoints disponíveis:")
-        print("   • GET /api/ranking        - Ranking completo")
-        print("   • GET /api/jogador/<nome> - Detalhes do jogador")
-        print("   • GET /api/estatisticas   - Estatísticas gerais")
+        print("   • GET /api/ranking        - Ranking paginado (?ordenar=pontuacao|nome&ordem=&limite=&deslocamento=|cursor=&classe=)")
+        print("   • GET /api/ranking/stream - Ranking completo em NDJSON (?ordenar=&ordem=)")
+        print("   • GET /api/ranking/eventos - Mudanças ao vivo (Server-Sent Events)")
+        print("   • GET /api/ranking/mudancas?desde= - Jogadores alterados desde uma versão")
+        print("   • GET /api/jogador/<nome> - Detalhes do jogador (?historico=completo)")
+        print("   • GET /api/jogador/<nome>/posicao - Posição no ranking")
+        print("   • GET /api/ranking/posicao/<k>   - Jogador na posição k")
+        print("   • GET /api/ranking/intervalo?min=&max= - Jogadores numa faixa de pontuação")
+        print("   • GET /api/jogadores/busca?prefixo=    - Autocompletar por nome")
+        print("   • GET /api/ranking/janela/<24h|7d|temporada> - Ranking do dia, da semana ou da temporada")
+        print("   • GET /api/estatisticas   - Estatísticas gerais e percentis (?jogador=)")
         print("\n🌐 Acesse o ranking no navegador com o arquivo HTML fornecido")
         print("⏳ Aguardando 3 segundos para inicialização da API...")
         time.sleep(3)
@@ -2215,36 +2870,36 @@ if __name__ == "__main__":
         print("   • http://127.0.0.1:5000/api/jogador/[nome]")
         print("   • http://127.0.0.1:5000/api/estatisticas")
         print("\n📁 Use o arquivo HTML fornecido para visualizar o ranking")
-        iniciar_api()
+        if trabalhadores:
+            # Sem jogo nada muda: o .bin já mapeado serve como está, senão o ranking é publicado uma vez
+            arquivo_binario = persistencia.arquivo_binario(jogo_global.arquivo_ranking) if snapshot_mapeado else None
+            print(f"⚙️ {trabalhadores} processo(s) servindo a API")
+            iniciar_api_trabalhadores(jogo_global, trabalhadores, arquivo_binario).aguardar()
+        else:
+            iniciar_api()
 
     elif escolha == "4":
         print("\n🔧 MODO TESTE RÁPIDO")
         print("Criando alguns jogadores de exemplo...")
 
         nomes_exemplo = ["Shadow", "Luna", "Thor", "Venom", "Nova", "Zephyr", "Orion", "Valkyrie"]
+        registros = []
         for nome in nomes_exemplo:
             pontuacao = random.randint(5000, 25000)
-            chefes = random.randint(5, 50)
-            eventos = random.randint(20, 200)
             avls = random.randint(5, 30)
-            mortes = random.randint(1, avls // 2)
-
-            novo_no = NoAVL(nome, pontuacao)
-            novo_no.chefes_derrotados = chefes
-            novo_no.record_eventos = eventos
-            novo_no.total_avls = avls
-            novo_no.contador_mortes = mortes
-            novo_no.historico_avls = [random.randint(1000, pontuacao) for _ in range(avls)]
-
-            jogo_global.ranking = jogo_global.inserir_avl(jogo_global.ranking, nome, pontuacao)
-
-            no_inserido = jogo_global.encontrar_jogador(jogo_global.ranking, nome)
-            if no_inserido:
-                no_inserido.chefes_derrotados = chefes
-                no_inserido.record_eventos = eventos
-                no_inserido.total_avls = avls
-                no_inserido.contador_mortes = mortes
-                no_inserido.historico_avls = [random.randint(1000, pontuacao) for _ in range(avls)]
+            registros.append({
+                "nome_jogador": nome,
+                "pontuacao_recorde": pontuacao,
+                "historico_avls": [random.randint(1000, pontuacao) for _ in range(avls)],
+                # Espalhadas pelos últimos 30 dias, para as janelas terem o que mostrar
+                "historico_datas": sorted(agora() - random.randint(0, 30 * 24 * 3600) for _ in range(avls)),
+                "contador_mortes": random.randint(1, avls // 2),
+                "record_eventos": random.randint(20, 200),
+                "chefes_derrotados": random.randint(5, 50),
+                "total_avls": avls
+            })
+        jogo_global.ranking.construir_de_ordenados(registros)
+        jogo_global.recalcular_agregados()
 
         print(f"✅ {len(nomes_exemplo)} jogadores de exemplo criados!")
 
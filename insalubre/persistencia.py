@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import threading
+from typing import Iterable, Optional
+
+from AVL import ArmazenamentoRanking, ResultadoAVL
+from armazenamento import MOTOR_PADRAO, criar_armazenamento
+from snapshot_binario import escrever_snapshot_binario, snapshot_binario_compativel
+
+ARQUIVO_RANKING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ranking.json")
+
+def salvar_ranking(ranking: ArmazenamentoRanking, arquivo: str = ARQUIVO_RANKING):
+    """Grava a lista plana em ordem de nome, pronta para a carga em massa.
+
+    Continua um documento JSON só (a lista que carregar_lista_json lê), mas
+    escrito um registro por linha à medida que o percurso avança: nem a
+    lista de registros nem o texto inteiro ficam na memória. Escreve num
+    arquivo temporário e troca no final, então uma queda no meio do
+    salvamento nunca deixa o ranking pela metade.
+    """
+    codificar = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+    temporario = arquivo + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        separador = "[\n"
+        for registro in ranking.registros():
+            f.write(separador)
+            f.write(codificar(registro))
+            separador = ",\n"
+        f.write("\n]\n" if separador == ",\n" else "[]\n")
+    os.replace(temporario, arquivo)
+
+def carregar_ranking(arquivo: str = ARQUIVO_RANKING,
+                     motor: str = MOTOR_PADRAO) -> Optional[ArmazenamentoRanking]:
+    """Carrega data/ranking.json pela carga em massa; None se o arquivo não existir"""
+    if not os.path.exists(arquivo):
+        return None
+
+    ranking = criar_armazenamento(motor)
+    ranking.carregar_lista_json(arquivo)
+    return ranking
+
+def arquivo_binario(arquivo: str) -> str:
+    return os.path.splitext(arquivo)[0] + ".bin"
+
+def snapshot_binario_atualizado(arquivo: str = ARQUIVO_RANKING) -> bool:
+    """O .bin reflete todo o ranking: é mais novo que o JSON, não há diário pendente e o formato é o atual"""
+    binario = arquivo_binario(arquivo)
+    if not os.path.exists(binario) or not snapshot_binario_compativel(binario):
+        return False
+    if os.path.exists(arquivo) and os.path.getmtime(binario) < os.path.getmtime(arquivo):
+        return False
+    for pendente in (arquivo + ".diario", arquivo + ".diario.compactando"):
+        if os.path.exists(pendente) and os.path.getsize(pendente) > 0:
+            return False
+    return True
+
+def aplicar_operacao(ranking: ArmazenamentoRanking, operacao: dict):
+    """Reaplica uma entrada do diário no ranking, como o jogo fez ao vivo.
+
+    Entradas de antes das datas (sem "ts") entram com momento desconhecido (0).
+    """
+    if operacao["op"] == "inserir":
+        ranking.inserir(operacao["nome"], operacao["pontuacao"], operacao.get("ts", 0))
+    elif operacao["op"] == "fim_avl":
+        ranking.registrar_fim_avl(operacao["nome"], operacao["eventos"],
+                                  operacao["chefes"], operacao["morreu"])
+    elif operacao["op"] == "lote":
+        ranking.inserir_lote((tuple(resultado) for resultado in operacao["resultados"]), operacao.get("ts", 0))
+
+def ler_resultados(arquivo: str) -> Iterable[ResultadoAVL]:
+    """Resultados de AVLs em NDJSON, um por linha: {"nome", "pontuacao", "eventos", "chefes", "morreu"}"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                resultado = json.loads(linha)
+                yield (resultado["nome"], resultado["pontuacao"], resultado.get("eventos", 0),
+                       resultado.get("chefes", 0), resultado.get("morreu", False))
+
+def reaplicar_diario(ranking: ArmazenamentoRanking, arquivo: str) -> int:
+    """Reaplica um arquivo de diário inteiro; retorna quantas entradas foram lidas.
+
+    Uma última linha incompleta (queda no meio da escrita) é ignorada.
+    """
+    if not os.path.exists(arquivo):
+        return 0
+
+    entradas = 0
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                operacao = json.loads(linha)
+            except json.JSONDecodeError:
+                break
+            aplicar_operacao(ranking, operacao)
+            entradas += 1
+    return entradas
+
+class DiarioRanking:
+    """Diário só de acréscimo das mutações do ranking, compactado num snapshot.
+
+    Cada mutação vira uma linha JSON em <snapshot>.diario. Quando o diário
+    passa do limite, ele é renomeado para <snapshot>.diario.compactando e uma
+    thread dobra esse arquivo sobre o snapshot, sem tocar no ranking vivo:
+
+        1. grava <snapshot>.novo (snapshot antigo + diário compactando)
+        2. apaga o diário compactando
+        3. troca <snapshot>.novo pelo snapshot
+
+    A recuperação sabe retomar de qualquer ponto dessa sequência. Se a thread
+    falhar, o .compactando fica no disco e é dobrado de novo antes da próxima
+    rotação: o diário vivo nunca é renomeado por cima dele.
+    """
+
+    def __init__(self, arquivo_snapshot: str = ARQUIVO_RANKING, limite_entradas: int = 10000,
+                 motor: str = MOTOR_PADRAO):
+        self.arquivo_snapshot = arquivo_snapshot
+        self.motor = motor
+        self.arquivo_diario = arquivo_snapshot + ".diario"
+        self.arquivo_compactando = self.arquivo_diario + ".compactando"
+        self.arquivo_novo = arquivo_snapshot + ".novo"
+        self.arquivo_binario = arquivo_binario(arquivo_snapshot)
+        self.limite_entradas = limite_entradas
+        self.entradas = 0
+        self._arquivo = None
+        self._compactacao = None
+        # Depois de uma compactação com erro, só tenta de novo ao chegar a esta contagem de entradas
+        self._retomar_em = 0
+        self.erro_compactacao: Optional[Exception] = None
+
+    def recuperar(self) -> ArmazenamentoRanking:
+        """Snapshot mais recente + diários pendentes, na ordem em que foram escritos"""
+        if os.path.exists(self.arquivo_novo):
+            if os.path.exists(self.arquivo_compactando):
+                # Caiu antes do passo 2: o .novo pode estar incompleto
+                os.remove(self.arquivo_novo)
+            else:
+                # Caiu entre os passos 2 e 3: o .novo já contém o diário apagado
+                os.replace(self.arquivo_novo, self.arquivo_snapshot)
+
+        ranking = self._carregar_snapshot()
+        if os.path.exists(self.arquivo_compactando):
+            # Compactação interrompida: termina agora, antes que uma nova rotação a sobrescreva
+            reaplicar_diario(ranking, self.arquivo_compactando)
+            self._publicar(ranking)
+        self.entradas = reaplicar_diario(ranking, self.arquivo_diario)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.arquivo_diario)), exist_ok=True)
+        self._arquivo = open(self.arquivo_diario, 'a', encoding='utf-8')
+        return ranking
+
+    def _carregar_snapshot(self, motor: Optional[str] = None) -> ArmazenamentoRanking:
+        motor = motor or self.motor
+        return carregar_ranking(self.arquivo_snapshot, motor) or criar_armazenamento(motor)
+
+    def registrar_insercao(self, nome_jogador: str, pontuacao: int, momento: int):
+        self._registrar({"op": "inserir", "nome": nome_jogador, "pontuacao": pontuacao, "ts": momento})
+
+    def registrar_fim_avl(self, nome_jogador: str, eventos: int, chefes: int, morreu: bool):
+        self._registrar({"op": "fim_avl", "nome": nome_jogador, "eventos": eventos,
+                         "chefes": chefes, "morreu": morreu})
+
+    def registrar_lote(self, resultados: Iterable[ResultadoAVL], momento: int):
+        """O lote inteiro numa linha só: ou ele é reaplicado todo, ou nada dele"""
+        self._registrar({"op": "lote", "resultados": [list(resultado) for resultado in resultados],
+                         "ts": momento})
+
+    def _registrar(self, operacao: dict):
+        if not self._arquivo:
+            return
+        self._arquivo.write(json.dumps(operacao, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._arquivo.flush()
+        self.entradas += 1
+
+        if self.entradas >= self.limite_entradas:
+            self.compactar_em_segundo_plano()
+
+    def sincronizar(self):
+        """Garante que o diário chegou ao disco"""
+        if self._arquivo:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+
+    def _rotacionar(self) -> bool:
+        if self._compactacao and self._compactacao.is_alive():
+            return False
+        if self.entradas == 0:
+            return False
+        if os.path.exists(self.arquivo_compactando):
+            # Sobra de uma compactação que falhou: trocar o diário por cima perderia as entradas dela
+            return False
+
+        self._arquivo.close()
+        os.replace(self.arquivo_diario, self.arquivo_compactando)
+        self._arquivo = open(self.arquivo_diario, 'a', encoding='utf-8')
+        self.entradas = 0
+        return True
+
+    def compactar_em_segundo_plano(self):
+        if self._compactacao and self._compactacao.is_alive():
+            return
+        if os.path.exists(self.arquivo_compactando):
+            # A compactação anterior falhou: dobra o que ela deixou; o diário vivo espera a próxima vez
+            if self.entradas < self._retomar_em:
+                return
+        elif not self._rotacionar():
+            return
+        self._compactacao = threading.Thread(target=self._compactar, daemon=True)
+        self._compactacao.start()
+
+    def _compactar(self) -> bool:
+        """Dobra o diário compactando no snapshot; um erro fica registrado, não derruba a thread"""
+        try:
+            # A cópia de compactação vive só nesta thread: o motor padrão basta
+            # (e o fragmentado não abre processos a partir dela)
+            ranking = self._carregar_snapshot(MOTOR_PADRAO)
+            reaplicar_diario(ranking, self.arquivo_compactando)
+            self._publicar(ranking)
+        except Exception as erro:
+            self.erro_compactacao = erro
+            self._retomar_em = self.entradas + self.limite_entradas
+            logging.getLogger(__name__).exception("Falha ao compactar %s", self.arquivo_compactando)
+            return False
+        self.erro_compactacao = None
+        self._retomar_em = 0
+        return True
+
+    def _publicar(self, ranking: ArmazenamentoRanking):
+        salvar_ranking(ranking, self.arquivo_novo)
+        os.remove(self.arquivo_compactando)
+        os.replace(self.arquivo_novo, self.arquivo_snapshot)
+        # Derivado do JSON: se faltar ou ficar velho, a leitura volta para o JSON
+        escrever_snapshot_binario(ranking, self.arquivo_binario)
+
+    def fechar(self, ranking: ArmazenamentoRanking):
+        """Dobra tudo no snapshot a partir do ranking vivo e fecha o diário"""
+        if not self._arquivo:
+            return
+
+        if self._compactacao:
+            self._compactacao.join()
+        if os.path.exists(self.arquivo_compactando) and not self._compactar():
+            # Os dois diários continuam no disco e a próxima recuperação os reaplica
+            self._arquivo.close()
+            self._arquivo = None
+            return
+        if self._rotacionar():
+            # O ranking vivo já contém o snapshot e todos os diários
+            self._publicar(ranking)
+        elif not snapshot_binario_atualizado(self.arquivo_snapshot):
+            escrever_snapshot_binario(ranking, self.arquivo_binario)
+
+        self._arquivo.close()
+        self._arquivo = None
@@ -0,0 +1,315 @@
+"""Ranking dividido entre processos: cada fragmento é uma ArvoreAVL num processo próprio.
+
+O coordenador (RankingFragmentado) escolhe o fragmento pelo crc32 do nome,
+estável entre execuções, e conversa com cada processo por um Pipe. As
+mensagens de cada fragmento chegam em ordem, então escritas sem retorno
+(inserir) seguem sem esperar resposta e a próxima leitura
+naquele fragmento já as enxerga. Consultas globais vão a todos os
+fragmentos de uma vez e as respostas são intercaladas (k-way merge):
+
+    top_n(n)          top n de cada fragmento, intercalados por (pontuação, nome)
+    pagina_*          a página de cada fragmento depois da mesma chave, intercaladas
+    posicao_jogador   soma de quantos jogadores cada fragmento tem acima da chave
+    em_ordem          listas por nome de cada fragmento, intercaladas
+
+Os nós devolvidos são cópias: alterá-los não muda o ranking. A versao é
+contada no coordenador, que vê todas as escritas e por isso também guarda o
+índice de mudanças. Cada escrita leva a versão nova ao fragmento, que a
+grava nos jogadores alterados: os nós devolvidos por qualquer leitura têm
+versao_alteracao do ranking inteiro, não a contagem de um fragmento.
+"""
+import heapq
+import multiprocessing
+import os
+import threading
+import weakref
+import zlib
+from collections.abc import Iterator as Iteravel
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from AVL import ArmazenamentoRanking, ArvoreAVL, IndiceMudancas, NoAVL, ResultadoAVL, agora
+
+FRAGMENTOS_PADRAO = os.cpu_count() or 1
+# Jogadores pedidos a cada fragmento por vez nos percursos a_partir_*
+TAMANHO_LOTE_PERCURSO = 256
+
+chave_nome = attrgetter("nome_jogador")
+chave_pontuacao = attrgetter("pontuacao_recorde", "nome_jogador")
+
+def escrever_na_versao(ranking: ArvoreAVL, versao: int, metodo: str, *argumentos):
+    """Escrita vinda do coordenador: os jogadores alterados ficam com a versao dele"""
+    resultado = getattr(ranking, metodo)(*argumentos)
+    if metodo == "construir_de_ordenados":
+        alterados = ranking.em_ordem()
+    elif metodo == "inserir_lote":
+        alterados = (ranking.buscar(nome) for nome in dict.fromkeys(item[0] for item in argumentos[0]))
+    else:
+        alterados = (ranking.buscar(argumentos[0]),)
+    for no in alterados:
+        if no is not None:
+            no.versao_alteracao = versao
+    return resultado
+
+# Operações que não são métodos de ArmazenamentoRanking
+OPERACOES_FRAGMENTO = {
+    "escrever_na_versao": escrever_na_versao,
+    "contar_maiores": lambda ranking, pontuacao, nome: ranking.indice_pontuacao.contar_maiores(pontuacao, nome),
+    "buscar_varios": lambda ranking, nomes: [ranking.buscar(nome) for nome in nomes],
+}
+
+def exportar(resultado):
+    """Iteradores viram listas; cada NoAVL sai só com o registro (NoAVL.__reduce__)"""
+    if isinstance(resultado, Iteravel):
+        return list(resultado)
+    return resultado
+
+def servir_fragmento(conexao):
+    """Laço de um processo fragmento: (metodo, argumentos, responder) -> (erro, resultado)"""
+    ranking = ArvoreAVL()
+    # As versões de um fragmento não são as do ranking; o índice fica no coordenador
+    ranking.mudancas = None
+    erro_pendente = None
+    while True:
+        metodo, argumentos, responder = conexao.recv()
+        if metodo is None:
+            break
+
+        try:
+            if metodo in OPERACOES_FRAGMENTO:
+                resultado = OPERACOES_FRAGMENTO[metodo](ranking, *argumentos)
+            else:
+                resultado = exportar(getattr(ranking, metodo)(*argumentos))
+        except Exception as erro:
+            # Escritas sem resposta guardam o erro para a próxima resposta
+            if not responder:
+                erro_pendente = erro_pendente or erro
+                continue
+            conexao.send((erro, None))
+            continue
+
+        if responder:
+            conexao.send((erro_pendente, resultado))
+            erro_pendente = None
+    conexao.close()
+
+def encerrar_fragmentos(conexoes, processos):
+    for conexao in conexoes:
+        try:
+            conexao.send((None, (), False))
+            conexao.close()
+        except (OSError, ValueError):
+            pass
+    for processo in processos:
+        processo.join(timeout=5)
+        if processo.is_alive():
+            processo.terminate()
+
+class RankingFragmentado(ArmazenamentoRanking):
+    """Coordenador dos fragmentos; seguro para o jogo e a thread da API ao mesmo tempo"""
+
+    def __init__(self, fragmentos: int = FRAGMENTOS_PADRAO):
+        if fragmentos < 1:
+            raise ValueError("O ranking fragmentado precisa de pelo menos um fragmento")
+
+        self._conexoes = []
+        self._processos = []
+        for _ in range(fragmentos):
+            local, remota = multiprocessing.Pipe()
+            processo = multiprocessing.Process(target=servir_fragmento, args=(remota,), daemon=True)
+            processo.start()
+            remota.close()
+            self._conexoes.append(local)
+            self._processos.append(processo)
+
+        # Um pedido e sua resposta não podem se intercalar com os de outra thread
+        self._trava = threading.Lock()
+        self.mudancas = IndiceMudancas()
+        self._finalizador = weakref.finalize(self, encerrar_fragmentos, self._conexoes, self._processos)
+
+    @property
+    def fragmentos(self) -> int:
+        return len(self._conexoes)
+
+    def fechar(self):
+        self._finalizador()
+
+    def fragmento_de(self, nome_jogador: str) -> int:
+        return zlib.crc32(nome_jogador.encode("utf-8")) % len(self._conexoes)
+
+    @staticmethod
+    def _resposta(conexao):
+        erro, resultado = conexao.recv()
+        if erro is not None:
+            raise erro
+        return resultado
+
+    def _enviar(self, fragmento: int, metodo: str, *argumentos):
+        with self._trava:
+            self._conexoes[fragmento].send((metodo, argumentos, False))
+
+    def _pedir(self, fragmento: int, metodo: str, *argumentos):
+        with self._trava:
+            self._conexoes[fragmento].send((metodo, argumentos, True))
+            return self._resposta(self._conexoes[fragmento])
+
+    def _pedir_todos(self, metodo: str, *argumentos) -> list:
+        """Mesmo pedido a todos; os fragmentos trabalham em paralelo"""
+        return self._pedir_cada(metodo, [argumentos] * len(self._conexoes))
+
+    def _pedir_cada(self, metodo: str, argumentos_por_fragmento: List[tuple]) -> list:
+        with self._trava:
+            for conexao, argumentos in zip(self._conexoes, argumentos_por_fragmento):
+                conexao.send((metodo, argumentos, True))
+            # Lê todas as respostas antes de levantar um erro, para não dessincronizar os pipes
+            respostas = [conexao.recv() for conexao in self._conexoes]
+        for erro, _ in respostas:
+            if erro is not None:
+                raise erro
+        return [resultado for _, resultado in respostas]
+
+    def _dividir(self, itens: Iterable, nome_de) -> List[list]:
+        """Reparte itens entre os fragmentos mantendo a ordem relativa"""
+        partes = [[] for _ in self._conexoes]
+        for item in itens:
+            partes[self.fragmento_de(nome_de(item))].append(item)
+        return partes
+
+    # Escritas
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        # O momento é fixado aqui, não quando o fragmento chegar a processar a mensagem
+        self._enviar(self.fragmento_de(nome_jogador), "escrever_na_versao", self.versao + 1, "inserir",
+                     nome_jogador, pontuacao, agora() if momento is None else momento)
+        self._marcar((nome_jogador,))
+
+    def registrar_fim_avl(self, nome_jogador: str, eventos: int, chefes: int, morreu: bool) -> Optional[NoAVL]:
+        no = self._pedir(self.fragmento_de(nome_jogador), "escrever_na_versao", self.versao + 1,
+                         "registrar_fim_avl", nome_jogador, eventos, chefes, morreu)
+        if no is not None:
+            self._marcar((nome_jogador,))
+        return no
+
+    def inserir_lote(self, resultados: Iterable[ResultadoAVL], momento: Optional[int] = None):
+        momento = agora() if momento is None else momento
+        resultados = list(resultados)
+        partes = self._dividir(resultados, lambda resultado: resultado[0])
+        self._pedir_cada("escrever_na_versao", [(self.versao + 1, "inserir_lote", parte, momento) for parte in partes])
+        self._marcar(dict.fromkeys(resultado[0] for resultado in resultados))
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        partes = self._dividir(registros, lambda registro: registro["nome_jogador"])
+        self._pedir_cada("escrever_na_versao", [(self.versao + 1, "construir_de_ordenados", parte) for parte in partes])
+        self.mudancas = IndiceMudancas()
+        self._marcar(registro["nome_jogador"] for parte in partes for registro in parte)
+
+    def _marcar(self, nomes: Iterable[str]):
+        """Como _carimbar, mas só no índice: os fragmentos já gravaram a versão nos nós.
+
+        Vem depois do envio, para a thread da API nunca achar no índice uma
+        versão que o fragmento ainda não recebeu.
+        """
+        self.versao += 1
+        self.mudancas.marcar(nomes, self.versao)
+
+    # Leituras
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        return self._pedir(self.fragmento_de(nome_jogador), "buscar", nome_jogador)
+
+    def contar_jogadores(self) -> int:
+        return sum(self._pedir_todos("contar_jogadores"))
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        return heapq.merge(*self._pedir_todos("em_ordem"), key=chave_nome)
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        return heapq.merge(*self._pedir_todos("em_ordem_decrescente"), key=chave_pontuacao, reverse=True)
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        # O top n global está contido na união dos top n de cada fragmento
+        listas = self._pedir_todos("top_n", n)
+        return list(islice(heapq.merge(*listas, key=chave_pontuacao, reverse=True), max(n, 0)))
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
+        if not no:
+            return None
+        return 1 + sum(self._pedir_todos("contar_maiores", no.pontuacao_recorde, nome_jogador))
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        if posicao < 1:
+            return None
+        # O(k) por fragmento: o k-ésimo global está entre os k primeiros de cada um
+        melhores = self.top_n(posicao)
+        return melhores[-1] if len(melhores) == posicao else None
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        return heapq.merge(*self._pedir_todos("intervalo_pontuacao", minimo, maximo),
+                           key=chave_pontuacao, reverse=True)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        return heapq.merge(*self._pedir_todos("prefixo_nome", prefixo), key=chave_nome)
+
+    def pagina_pontuacao(self, limite: int, depois: Optional[Tuple[int, str]] = None,
+                         crescente: bool = False) -> List[NoAVL]:
+        listas = self._pedir_todos("pagina_pontuacao", limite, depois, crescente)
+        return list(islice(heapq.merge(*listas, key=chave_pontuacao, reverse=not crescente), max(limite, 0)))
+
+    def pagina_nome(self, limite: int, depois: Optional[str] = None, crescente: bool = True) -> List[NoAVL]:
+        listas = self._pedir_todos("pagina_nome", limite, depois, crescente)
+        return list(islice(heapq.merge(*listas, key=chave_nome, reverse=not crescente), max(limite, 0)))
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        # Em lotes: cada lote continua do último jogador do anterior
+        while True:
+            lote = self.pagina_pontuacao(TAMANHO_LOTE_PERCURSO, depois, crescente)
+            yield from lote
+            if len(lote) < TAMANHO_LOTE_PERCURSO:
+                return
+            depois = chave_pontuacao(lote[-1])
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        while True:
+            lote = self.pagina_nome(TAMANHO_LOTE_PERCURSO, depois, crescente)
+            yield from lote
+            if len(lote) < TAMANHO_LOTE_PERCURSO:
+                return
+            depois = chave_nome(lote[-1])
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        if posicao < 1:
+            return None
+        primeiros = self.pagina_nome(posicao)
+        return primeiros[-1] if len(primeiros) == posicao else None
+
+    def pontuacoes_recorde(self) -> Iterator[int]:
+        for pontuacoes in self._pedir_todos("pontuacoes_recorde"):
+            yield from pontuacoes
+
+    def pontuacoes_avls(self) -> Iterator[int]:
+        for pontuacoes in self._pedir_todos("pontuacoes_avls"):
+            yield from pontuacoes
+
+    def contadores_jogadores(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        for contadores in self._pedir_todos("contadores_jogadores"):
+            yield from contadores
+
+    def avls_desde(self, momento: int) -> Iterator[Tuple[int, str, int]]:
+        for avls in self._pedir_todos("avls_desde", momento):
+            yield from avls
+
+    def mudancas_desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[NoAVL]]:
+        alterados = self.mudancas.desde(versao, limite)
+        if alterados is None:
+            return None
+        # Uma ida a cada fragmento com os nomes dele
+        partes = self._dividir(alterados, itemgetter(0))
+        respostas = self._pedir_cada("buscar_varios", [([nome for nome, _ in parte],) for parte in partes])
+        nos = {}
+        for parte, resposta in zip(partes, respostas):
+            for (nome_jogador, _), no in zip(parte, resposta):
+                nos[nome_jogador] = no
+        return [nos[nome_jogador] for nome_jogador, _ in alterados]
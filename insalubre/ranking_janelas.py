@@ -0,0 +1,162 @@
+"""Rankings por janela de tempo: últimas 24h, últimos 7 dias e temporada (mês UTC).
+
+Cada janela tem seu próprio IndicePontuacao, com a melhor pontuação de cada
+jogador dentro da janela, então top_n e posição custam o mesmo que no
+ranking geral. A expiração é incremental: as AVLs ficam numa fila por ordem
+de chegada e, a cada registro ou consulta, só as que acabaram de sair da
+janela são processadas. Para saber a nova melhor pontuação de um jogador
+sem reler o histórico, cada um guarda uma fila monotônica de candidatas
+(máximo em janela deslizante): O(1) amortizado por AVL, mais O(log n) no
+índice quando a melhor muda.
+"""
+import calendar
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from AVL import ArmazenamentoRanking, IndicePontuacao, agora
+
+DURACAO_DIA = 24 * 60 * 60
+
+def inicio_da_temporada(momento: int) -> int:
+    """Primeiro segundo do mês (UTC) que contém momento"""
+    data = datetime.fromtimestamp(momento, timezone.utc)
+    return calendar.timegm((data.year, data.month, 1, 0, 0, 0))
+
+def ultimos(duracao: int) -> Callable[[int], int]:
+    return lambda momento: momento - duracao + 1
+
+# nome -> primeiro momento ainda dentro da janela, dado o momento atual
+JANELAS: Dict[str, Callable[[int], int]] = {
+    "24h": ultimos(DURACAO_DIA),
+    "7d": ultimos(7 * DURACAO_DIA),
+    "temporada": inicio_da_temporada,
+}
+
+class EntradaJanela:
+    """Um jogador dentro da janela; o nome dos campos casa com o que o IndicePontuacao lê"""
+    __slots__ = ("nome_jogador", "pontuacao_recorde", "ultima_avl", "candidatas")
+
+    def __init__(self, nome_jogador: str):
+        self.nome_jogador = nome_jogador
+        self.pontuacao_recorde = 0
+        self.ultima_avl = 0
+        # (momento, pontuacao) com pontuação estritamente decrescente: a da frente é a melhor
+        self.candidatas = deque()
+
+class JanelaRanking:
+    def __init__(self, inicio: Callable[[int], int]):
+        self.inicio = inicio
+        self.jogadores: Dict[str, EntradaJanela] = {}
+        self.indice = IndicePontuacao()
+        self._chegadas = deque()
+
+    def registrar(self, nome_jogador: str, pontuacao: int, momento: int):
+        entrada = self.jogadores.get(nome_jogador)
+        if entrada is None:
+            entrada = EntradaJanela(nome_jogador)
+            entrada.pontuacao_recorde = pontuacao
+            self.jogadores[nome_jogador] = entrada
+            self.indice.inserir(entrada)
+
+        candidatas = entrada.candidatas
+        # Uma candidata mais antiga e não maior nunca mais será a melhor
+        while candidatas and candidatas[-1][1] <= pontuacao:
+            candidatas.pop()
+        candidatas.append((momento, pontuacao))
+        entrada.ultima_avl = max(entrada.ultima_avl, momento)
+        if candidatas[0][1] != entrada.pontuacao_recorde:
+            self.indice.atualizar_recorde(entrada, candidatas[0][1])
+        self._chegadas.append((momento, nome_jogador))
+
+    def expirar(self, momento_atual: int):
+        limite = self.inicio(momento_atual)
+        chegadas = self._chegadas
+        while chegadas and chegadas[0][0] < limite:
+            _, nome_jogador = chegadas.popleft()
+            entrada = self.jogadores.get(nome_jogador)
+            if entrada is None:
+                continue
+
+            candidatas = entrada.candidatas
+            while candidatas and candidatas[0][0] < limite:
+                candidatas.popleft()
+            if not candidatas:
+                self.indice.remover(entrada.pontuacao_recorde, nome_jogador)
+                del self.jogadores[nome_jogador]
+            elif candidatas[0][1] != entrada.pontuacao_recorde:
+                self.indice.atualizar_recorde(entrada, candidatas[0][1])
+
+    def top_n(self, n: int) -> List[EntradaJanela]:
+        return self.indice.top_n(n)
+
+    def posicao(self, nome_jogador: str) -> Optional[int]:
+        entrada = self.jogadores.get(nome_jogador)
+        if entrada is None:
+            return None
+        return self.indice.posicao(entrada.pontuacao_recorde, nome_jogador)
+
+class RankingsPorJanela:
+    """Todas as janelas de JANELAS, alimentadas pelo jogo a cada AVL registrada.
+
+    O jogo escreve e a thread da API lê: uma trava cobre cada operação,
+    inclusive a expiração que as consultas disparam.
+    """
+
+    def __init__(self, janelas: Dict[str, Callable[[int], int]] = JANELAS):
+        self.janelas = {nome: JanelaRanking(inicio) for nome, inicio in janelas.items()}
+        self._trava = threading.Lock()
+
+    @classmethod
+    def do_ranking(cls, ranking: ArmazenamentoRanking, momento_atual: Optional[int] = None) -> "RankingsPorJanela":
+        """Monta as janelas com as AVLs recentes do ranking, em ordem cronológica"""
+        momento_atual = agora() if momento_atual is None else momento_atual
+        rankings = cls()
+        desde = min(janela.inicio(momento_atual) for janela in rankings.janelas.values())
+        for momento, nome_jogador, pontuacao in sorted(ranking.avls_desde(desde)):
+            rankings.registrar(nome_jogador, pontuacao, momento, momento_atual)
+        return rankings
+
+    def registrar(self, nome_jogador: str, pontuacao: int, momento: int,
+                  momento_atual: Optional[int] = None):
+        momento_atual = agora() if momento_atual is None else momento_atual
+        with self._trava:
+            for janela in self.janelas.values():
+                janela.expirar(momento_atual)
+                # AVLs de momento desconhecido (0) ou já fora da janela não entram
+                if momento >= janela.inicio(momento_atual):
+                    janela.registrar(nome_jogador, pontuacao, momento)
+
+    def registrar_lote(self, resultados: Iterable[Tuple[str, int]], momento: int):
+        for nome_jogador, pontuacao in resultados:
+            self.registrar(nome_jogador, pontuacao, momento)
+
+    def top_n(self, nome_janela: str, n: int,
+              momento_atual: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """(nome, melhor pontuação na janela, momento da última AVL) dos n primeiros"""
+        janela = self.janelas[nome_janela]
+        with self._trava:
+            janela.expirar(agora() if momento_atual is None else momento_atual)
+            return [(entrada.nome_jogador, entrada.pontuacao_recorde, entrada.ultima_avl)
+                    for entrada in janela.top_n(n)]
+
+    def posicao(self, nome_janela: str, nome_jogador: str,
+                momento_atual: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """(posição, melhor pontuação na janela), ou None se o jogador não jogou na janela"""
+        janela = self.janelas[nome_janela]
+        with self._trava:
+            janela.expirar(agora() if momento_atual is None else momento_atual)
+            posicao = janela.posicao(nome_jogador)
+            if posicao is None:
+                return None
+            return posicao, janela.jogadores[nome_jogador].pontuacao_recorde
+
+    def contar_jogadores(self, nome_janela: str, momento_atual: Optional[int] = None) -> int:
+        janela = self.janelas[nome_janela]
+        with self._trava:
+            janela.expirar(agora() if momento_atual is None else momento_atual)
+            return len(janela.jogadores)
+
+    def inicio(self, nome_janela: str, momento_atual: Optional[int] = None) -> int:
+        return self.janelas[nome_janela].inicio(agora() if momento_atual is None else momento_atual)
@@ -0,0 +1,168 @@
+"""API do ranking em vários processos: o jogo é o único escritor, os trabalhadores só leem.
+
+O processo do jogo publica o ranking vivo num snapshot binário
+(PublicadorSnapshot), a cada intervalo em que ele mudou. Cada trabalhador
+é um processo com o próprio servidor HTTP (threads do Werkzeug) que mapeia
+esse arquivo (SnapshotMapeado) e troca para o novo quando ele é republicado
+(AcompanhadorArquivo). O mapa vem do cache de páginas do sistema, então N
+trabalhadores não custam N cópias do ranking, e nenhum deles disputa o GIL
+com o jogo nem com os outros.
+
+Todos aceitam conexões do mesmo socket, aberto antes de criar os
+processos: o kernel entrega cada conexão a um trabalhador livre. As
+respostas atrasam no máximo um intervalo de publicação (mais a releitura)
+em relação ao jogo.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import weakref
+from typing import Callable
+
+from werkzeug.serving import make_server
+
+from AVL import ArmazenamentoRanking
+from snapshot_binario import escrever_snapshot_binario
+
+INTERVALO_PUBLICACAO = 1.0
+
+def arquivo_publicado(arquivo_ranking: str) -> str:
+    """Snapshot que os trabalhadores leem; separado do .bin da compactação,
+    que só reflete o JSON e chegaria atrasado em relação ao ranking vivo"""
+    return os.path.splitext(arquivo_ranking)[0] + ".api.bin"
+
+class PublicadorSnapshot:
+    """Thread do processo do jogo que grava o ranking no snapshot dos trabalhadores.
+
+    Grava a partir de ranking.instantaneo(), então o jogo precisa do motor
+    persistente: a gravação percorre uma versão imutável enquanto o jogo
+    continua escrevendo. A troca do arquivo é atômica (os.replace).
+    """
+
+    def __init__(self, fonte: Callable[[], ArmazenamentoRanking], arquivo: str,
+                 intervalo: float = INTERVALO_PUBLICACAO):
+        self.fonte = fonte
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self._origem = None
+        self._versao = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def publicar(self) -> bool:
+        """Grava se o ranking mudou desde a última publicação"""
+        origem = self.fonte()
+        ranking = origem.instantaneo()
+        if origem is self._origem and ranking.versao == self._versao:
+            return False
+        escrever_snapshot_binario(ranking, self.arquivo)
+        self._origem, self._versao = origem, ranking.versao
+        return True
+
+    def iniciar(self):
+        self.publicar()
+        self._thread = threading.Thread(target=self._laco, daemon=True)
+        self._thread.start()
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo):
+            self.publicar()
+
+    def parar(self):
+        """Para a thread e publica o estado final"""
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.publicar()
+
+class AcompanhadorArquivo:
+    """Chama ao_mudar() agora e cada vez que o arquivo for substituído.
+
+    Confere (inode, mtime, tamanho) a cada intervalo; como o publicador troca
+    o arquivo inteiro, um inode novo basta para notar a publicação.
+    """
+
+    def __init__(self, arquivo: str, ao_mudar: Callable[[], None], intervalo: float = INTERVALO_PUBLICACAO):
+        self.arquivo = arquivo
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self._marca = None
+
+    def _conferir(self):
+        try:
+            estado = os.stat(self.arquivo)
+        except FileNotFoundError:
+            return
+        marca = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+        if marca != self._marca:
+            self._marca = marca
+            self.ao_mudar()
+
+    def iniciar(self):
+        self._conferir()
+        threading.Thread(target=self._laco, daemon=True).start()
+
+    def _laco(self):
+        while True:
+            time.sleep(self.intervalo)
+            self._conferir()
+
+def sair_com_o_pai():
+    """Se o processo do jogo cair sem encerrar os trabalhadores, eles não ficam presos à porta"""
+    multiprocessing.parent_process().join()
+    os._exit(0)
+
+def servir_trabalhador(ouvinte: socket.socket, preparar: Callable, argumentos: tuple):
+    """Laço de um processo trabalhador: preparar(*argumentos) devolve o app WSGI"""
+    threading.Thread(target=sair_com_o_pai, daemon=True).start()
+    # N processos escrevendo uma linha por requisição no mesmo terminal só atrapalham
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = preparar(*argumentos)
+    host, porta = ouvinte.getsockname()[:2]
+    servidor = make_server(host, porta, app, threaded=True, fd=ouvinte.fileno())
+    servidor.serve_forever()
+
+def encerrar_trabalhadores(processos, ouvinte):
+    for processo in processos:
+        if processo.is_alive():
+            processo.terminate()
+    for processo in processos:
+        processo.join(timeout=5)
+    ouvinte.close()
+
+class TrabalhadoresAPI:
+    """Processos trabalhadores servindo o mesmo socket; porta=0 escolhe uma porta livre"""
+
+    def __init__(self, preparar: Callable, argumentos: tuple, quantidade: int,
+                 host: str = "127.0.0.1", porta: int = 5000):
+        if quantidade < 1:
+            raise ValueError("A API precisa de pelo menos um trabalhador")
+
+        self.ouvinte = socket.create_server((host, porta), backlog=1024)
+        self._processos = []
+        for _ in range(quantidade):
+            processo = multiprocessing.Process(target=servir_trabalhador,
+                                               args=(self.ouvinte, preparar, argumentos), daemon=True)
+            processo.start()
+            self._processos.append(processo)
+        self._finalizador = weakref.finalize(self, encerrar_trabalhadores, self._processos, self.ouvinte)
+
+    @property
+    def porta(self) -> int:
+        return self.ouvinte.getsockname()[1]
+
+    @property
+    def quantidade(self) -> int:
+        return len(self._processos)
+
+    def aguardar(self):
+        """Bloqueia enquanto os trabalhadores estiverem rodando"""
+        for processo in self._processos:
+            processo.join()
+
+    def encerrar(self):
+        self._finalizador()
@@ -0,0 +1,433 @@
+"""Snapshot binário do ranking, lido direto de um arquivo mapeado em memória.
+
+Layout (little-endian):
+
+    cabeçalho   MAGICO, versão do formato, n, versao do ranking, offsets das seções seguintes,
+                quantas AVLs recentes e desde quando
+    nós         n registros de tamanho fixo, em ordem de nome
+    pontuação   n índices (uint32) de nós, em ordem decrescente de (pontuação, nome)
+    mudanças    n índices (uint32) de nós, em ordem crescente de (versao_alteracao, nome)
+    strings     nomes em UTF-8, concatenados
+    históricos  pontuações de todos os jogadores como int32, concatenadas
+    datas       momento de cada pontuação (uint32), na mesma ordem dos históricos
+    agregados   somas de AgregadosRanking (int64) e os dois histogramas de
+                DistribuicaoPontuacoes (total e contagens, int64)
+    recentes    (momento, índice do nó, pontuação) das AVLs a partir do início
+                da janela mais longa de JANELAS, em ordem cronológica
+
+A tabela de nós ordenada por nome é uma árvore de busca implícita: a busca
+é binária sobre ela, e a ordem de bytes UTF-8 coincide com a ordem de
+str do Python. Nenhum nó vira objeto Python até ser lido, e os agregados
+que o jogo mantém vêm prontos: abrir não passa por todos os jogadores.
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from AVL import (ArmazenamentoRanking, EstatisticasHistorico, NoAVL, TIPO_DATAS, TIPO_HISTORICO, agora,
+                 tamanho_historico)
+from agregados import AgregadosRanking, contribuicao
+from distribuicao import HistogramaLogaritmico
+from ranking_janelas import JANELAS
+
+MAGICO = b"AVLB"
+VERSAO = 4
+
+# magico, versao, n, versao_ranking, offset_nos, offset_pontuacao, offset_mudancas,
+# offset_strings, offset_historicos, offset_datas, offset_agregados, offset_recentes,
+# quantidade_recentes, desde_recentes
+CABECALHO = struct.Struct("<4sIIQQQQQQQQQQq")
+# offset_nome, tamanho_nome, pontuacao_recorde, contador_mortes, record_eventos,
+# chefes_derrotados, total_avls, offset_historico (em ints), tamanho_historico, versao_alteracao
+REGISTRO_NO = struct.Struct("<IIiiiiiQIQ")
+INDICE = struct.Struct("<I")
+SOMAS = struct.Struct("<7q")
+# total e tamanho das contagens de um histograma
+HISTOGRAMA = struct.Struct("<qI")
+# momento, índice do nó, pontuação
+REGISTRO_RECENTE = struct.Struct("<IIi")
+
+def inicio_das_janelas(momento_atual: int) -> int:
+    """Primeiro momento que alguma janela de JANELAS ainda pode conter"""
+    return min(inicio(momento_atual) for inicio in JANELAS.values())
+
+def secao_histograma(histograma: HistogramaLogaritmico) -> bytes:
+    contagens = array("q", histograma.contagens())
+    return HISTOGRAMA.pack(histograma.total, len(contagens)) + contagens.tobytes()
+
+def escrever_snapshot_binario(ranking: ArmazenamentoRanking, arquivo: str, momento_atual: Optional[int] = None):
+    """Grava o snapshot binário a partir de um ranking (nós visitados em ordem de nome).
+
+    Os agregados saem da mesma passada pelos nós. As AVLs recentes cobrem as
+    janelas vistas de momento_atual (padrão: agora) em diante.
+    """
+    nos = list(ranking.em_ordem())
+    quantidade = len(nos)
+
+    ordem_pontuacao = sorted(range(quantidade),
+                             key=lambda i: (nos[i].pontuacao_recorde, nos[i].nome_jogador),
+                             reverse=True)
+    ordem_mudancas = sorted(range(quantidade), key=lambda i: nos[i].versao_alteracao)
+
+    tabela_nos = bytearray(REGISTRO_NO.size * quantidade)
+    strings = bytearray()
+    historicos = array(TIPO_HISTORICO)
+    datas = array(TIPO_DATAS)
+    agregados = AgregadosRanking()
+    agregados.somar(contribuicao(no) for no in nos)
+    desde_recentes = inicio_das_janelas(agora() if momento_atual is None else momento_atual)
+    recentes = []
+    for i, no in enumerate(nos):
+        nome = no.nome_jogador.encode("utf-8")
+        avls = tamanho_historico(no)
+        REGISTRO_NO.pack_into(
+            tabela_nos, i * REGISTRO_NO.size,
+            len(strings), len(nome),
+            no.pontuacao_recorde, no.contador_mortes, no.record_eventos,
+            no.chefes_derrotados, no.total_avls,
+            len(historicos), avls, no.versao_alteracao
+        )
+        strings += nome
+        historicos.extend(no.historico_avls[:avls])
+        datas.extend(no.historico_datas[:avls])
+        # O histórico está em ordem de chegada: só a cauda entra nas recentes
+        j = avls
+        while j and no.historico_datas[j - 1] >= desde_recentes:
+            j -= 1
+        recentes.extend((no.historico_datas[k], i, no.historico_avls[k]) for k in range(j, avls))
+    recentes.sort()
+
+    tabela_pontuacao = array("I", ordem_pontuacao)
+    tabela_mudancas = array("I", ordem_mudancas)
+    secao_agregados = (SOMAS.pack(*agregados.somas) +
+                       secao_histograma(HistogramaLogaritmico.de_valores(no.pontuacao_recorde for no in nos)) +
+                       secao_histograma(HistogramaLogaritmico.de_valores(historicos)))
+    tabela_recentes = bytearray(REGISTRO_RECENTE.size * len(recentes))
+    for i, recente in enumerate(recentes):
+        REGISTRO_RECENTE.pack_into(tabela_recentes, i * REGISTRO_RECENTE.size, *recente)
+
+    offset_nos = CABECALHO.size
+    offset_pontuacao = offset_nos + len(tabela_nos)
+    offset_mudancas = offset_pontuacao + len(tabela_pontuacao) * tabela_pontuacao.itemsize
+    offset_strings = offset_mudancas + len(tabela_mudancas) * tabela_mudancas.itemsize
+    offset_historicos = offset_strings + len(strings)
+    offset_datas = offset_historicos + len(historicos) * historicos.itemsize
+    offset_agregados = offset_datas + len(datas) * datas.itemsize
+    offset_recentes = offset_agregados + len(secao_agregados)
+
+    temporario = arquivo + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(CABECALHO.pack(MAGICO, VERSAO, quantidade, ranking.versao, offset_nos, offset_pontuacao,
+                               offset_mudancas, offset_strings, offset_historicos, offset_datas,
+                               offset_agregados, offset_recentes, len(recentes), desde_recentes))
+        f.write(tabela_nos)
+        f.write(tabela_pontuacao.tobytes())
+        f.write(tabela_mudancas.tobytes())
+        f.write(strings)
+        f.write(historicos.tobytes())
+        f.write(datas.tobytes())
+        f.write(secao_agregados)
+        f.write(tabela_recentes)
+    os.replace(temporario, arquivo)
+
+def snapshot_binario_compativel(arquivo: str) -> bool:
+    """O arquivo tem o cabeçalho desta versão do formato"""
+    with open(arquivo, "rb") as f:
+        inicio = f.read(8)
+    return len(inicio) == 8 and struct.unpack("<4sI", inicio) == (MAGICO, VERSAO)
+
+def primeiro_onde(quantidade: int, condicao: Callable[[int], bool]) -> int:
+    """Primeiro i em [0, quantidade) com condicao(i), que passa de falsa a verdadeira uma vez só"""
+    inicio, fim = 0, quantidade
+    while inicio < fim:
+        meio = (inicio + fim) // 2
+        if condicao(meio):
+            fim = meio
+        else:
+            inicio = meio + 1
+    return inicio
+
+class SnapshotMapeado(ArmazenamentoRanking):
+    """Ranking somente leitura servido direto do arquivo mapeado.
+
+    Abrir custa O(1) qualquer que seja o número de jogadores; cada nó só é
+    materializado como NoAVL quando uma consulta chega nele, e fica em cache.
+    Os agregados do jogo saem da seção gravada (somas_agregados, histogramas)
+    e avls_desde lê só as AVLs recentes quando o momento cabe nelas.
+    Implementa as consultas de leitura de ArmazenamentoRanking; as escritas
+    (inserir, construir_de_ordenados) são recusadas. versao é a do ranking
+    que foi gravado.
+    """
+
+    def __init__(self, arquivo: str):
+        self._arquivo = open(arquivo, "rb")
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Confere a versão antes do resto: cabeçalhos de versões antigas têm outro tamanho
+        magico, versao = struct.unpack_from("<4sI", self._mapa, 0) if len(self._mapa) >= 8 else (b"", 0)
+        if magico != MAGICO or versao != VERSAO or len(self._mapa) < CABECALHO.size:
+            self.fechar()
+            raise ValueError(f"Snapshot binário inválido: {arquivo}")
+        (_, _, self.quantidade, self.versao, self._offset_nos, self._offset_pontuacao, self._offset_mudancas,
+         self._offset_strings, self._offset_historicos, self._offset_datas, self._offset_agregados,
+         self._offset_recentes, self._quantidade_recentes, self._desde_recentes) = CABECALHO.unpack_from(self._mapa, 0)
+
+        self._materializados: Dict[int, NoAVL] = {}
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
+
+    def inserir(self, nome_jogador: str, pontuacao: int, momento: Optional[int] = None):
+        raise NotImplementedError("O snapshot mapeado é somente leitura")
+
+    def construir_de_ordenados(self, registros: Iterable[dict]):
+        raise NotImplementedError("O snapshot mapeado é somente leitura")
+
+    def _registro(self, indice: int) -> Tuple[int, ...]:
+        return REGISTRO_NO.unpack_from(self._mapa, self._offset_nos + indice * REGISTRO_NO.size)
+
+    def _nome_bytes(self, indice: int) -> bytes:
+        offset_nome, tamanho_nome = struct.unpack_from(
+            "<II", self._mapa, self._offset_nos + indice * REGISTRO_NO.size)
+        inicio = self._offset_strings + offset_nome
+        return self._mapa[inicio:inicio + tamanho_nome]
+
+    def _materializar(self, indice: int) -> NoAVL:
+        no = self._materializados.get(indice)
+        if no:
+            return no
+
+        (offset_nome, tamanho_nome, pontuacao_recorde, contador_mortes, record_eventos,
+         chefes_derrotados, total_avls, offset_historico, avls, versao_alteracao) = self._registro(indice)
+
+        inicio_nome = self._offset_strings + offset_nome
+        no = NoAVL(self._mapa[inicio_nome:inicio_nome + tamanho_nome].decode("utf-8"), pontuacao_recorde)
+        no.contador_mortes = contador_mortes
+        no.record_eventos = record_eventos
+        no.chefes_derrotados = chefes_derrotados
+        no.total_avls = total_avls
+        no.versao_alteracao = versao_alteracao
+
+        historico = array(TIPO_HISTORICO)
+        inicio_historico = self._offset_historicos + offset_historico * historico.itemsize
+        historico.frombytes(self._mapa[inicio_historico:inicio_historico + avls * historico.itemsize])
+        no.historico_avls = historico
+
+        datas = array(TIPO_DATAS)
+        inicio_datas = self._offset_datas + offset_historico * datas.itemsize
+        datas.frombytes(self._mapa[inicio_datas:inicio_datas + avls * datas.itemsize])
+        no.historico_datas = datas
+        if historico:
+            no.estatisticas = EstatisticasHistorico.do_historico(historico)
+
+        self._materializados[indice] = no
+        return no
+
+    def somas_agregados(self) -> Tuple[int, ...]:
+        """As somas de AgregadosRanking do ranking gravado (AgregadosRanking.das_somas)"""
+        return SOMAS.unpack_from(self._mapa, self._offset_agregados)
+
+    def histogramas(self) -> Tuple[HistogramaLogaritmico, HistogramaLogaritmico]:
+        """(recordes, AVLs) de DistribuicaoPontuacoes do ranking gravado"""
+        histogramas = []
+        offset = self._offset_agregados + SOMAS.size
+        for _ in range(2):
+            total, tamanho = HISTOGRAMA.unpack_from(self._mapa, offset)
+            offset += HISTOGRAMA.size
+            contagens = array("q")
+            contagens.frombytes(self._mapa[offset:offset + tamanho * contagens.itemsize])
+            offset += tamanho * contagens.itemsize
+            histogramas.append(HistogramaLogaritmico.das_contagens(contagens, total))
+        return histogramas[0], histogramas[1]
+
+    def _indice_por_pontuacao(self, posicao: int) -> int:
+        return INDICE.unpack_from(self._mapa, self._offset_pontuacao + posicao * INDICE.size)[0]
+
+    def _indice_por_mudanca(self, posicao: int) -> int:
+        return INDICE.unpack_from(self._mapa, self._offset_mudancas + posicao * INDICE.size)[0]
+
+    def _chave_por_pontuacao(self, posicao: int) -> Tuple[int, bytes]:
+        indice = self._indice_por_pontuacao(posicao)
+        return self._registro(indice)[2], self._nome_bytes(indice)
+
+    def _buscar_indice(self, nome_jogador: str) -> Optional[int]:
+        alvo = nome_jogador.encode("utf-8")
+        inicio, fim = 0, self.quantidade - 1
+        while inicio <= fim:
+            meio = (inicio + fim) // 2
+            nome = self._nome_bytes(meio)
+            if alvo < nome:
+                fim = meio - 1
+            elif alvo > nome:
+                inicio = meio + 1
+            else:
+                return meio
+        return None
+
+    def buscar(self, nome_jogador: str) -> Optional[NoAVL]:
+        indice = self._buscar_indice(nome_jogador)
+        return self._materializar(indice) if indice is not None else None
+
+    def contar_jogadores(self) -> int:
+        return self.quantidade
+
+    def jogador_na_posicao(self, posicao: int) -> Optional[NoAVL]:
+        if posicao < 1 or posicao > self.quantidade:
+            return None
+        return self._materializar(self._indice_por_pontuacao(posicao - 1))
+
+    def posicao_jogador(self, nome_jogador: str) -> Optional[int]:
+        no = self.buscar(nome_jogador)
+        if not no:
+            return None
+
+        # Busca binária na tabela de pontuação, decrescente por (pontuação, nome)
+        chave = (no.pontuacao_recorde, no.nome_jogador.encode("utf-8"))
+        inicio, fim = 0, self.quantidade - 1
+        while inicio <= fim:
+            meio = (inicio + fim) // 2
+            chave_meio = self._chave_por_pontuacao(meio)
+            if chave > chave_meio:
+                fim = meio - 1
+            elif chave < chave_meio:
+                inicio = meio + 1
+            else:
+                return meio + 1
+        return None
+
+    def intervalo_pontuacao(self, minimo: int, maximo: int) -> Iterator[NoAVL]:
+        # Primeira posição da tabela decrescente com pontuação <= maximo
+        inicio, fim = 0, self.quantidade
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if self._registro(self._indice_por_pontuacao(meio))[2] > maximo:
+                inicio = meio + 1
+            else:
+                fim = meio
+        for posicao in range(inicio, self.quantidade):
+            indice = self._indice_por_pontuacao(posicao)
+            if self._registro(indice)[2] < minimo:
+                break
+            yield self._materializar(indice)
+
+    def prefixo_nome(self, prefixo: str) -> Iterator[NoAVL]:
+        # Prefixo de str é prefixo dos bytes UTF-8, e a ordem das duas coincide
+        alvo = prefixo.encode("utf-8")
+        inicio, fim = 0, self.quantidade
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if self._nome_bytes(meio) < alvo:
+                inicio = meio + 1
+            else:
+                fim = meio
+        for indice in range(inicio, self.quantidade):
+            if not self._nome_bytes(indice).startswith(alvo):
+                break
+            yield self._materializar(indice)
+
+    def a_partir_pontuacao(self, depois: Optional[Tuple[int, str]] = None,
+                           crescente: bool = False) -> Iterator[NoAVL]:
+        # A tabela é decrescente por (pontuação, nome em bytes)
+        if depois is None:
+            posicoes = range(self.quantidade - 1, -1, -1) if crescente else range(self.quantidade)
+        else:
+            alvo = (depois[0], depois[1].encode("utf-8"))
+            if crescente:
+                fim = primeiro_onde(self.quantidade, lambda posicao: self._chave_por_pontuacao(posicao) <= alvo)
+                posicoes = range(fim - 1, -1, -1)
+            else:
+                inicio = primeiro_onde(self.quantidade, lambda posicao: self._chave_por_pontuacao(posicao) < alvo)
+                posicoes = range(inicio, self.quantidade)
+        for posicao in posicoes:
+            yield self._materializar(self._indice_por_pontuacao(posicao))
+
+    def a_partir_nome(self, depois: Optional[str] = None, crescente: bool = True) -> Iterator[NoAVL]:
+        if depois is None:
+            indices = range(self.quantidade) if crescente else range(self.quantidade - 1, -1, -1)
+        else:
+            alvo = depois.encode("utf-8")
+            if crescente:
+                indices = range(primeiro_onde(self.quantidade, lambda indice: self._nome_bytes(indice) > alvo),
+                                self.quantidade)
+            else:
+                fim = primeiro_onde(self.quantidade, lambda indice: self._nome_bytes(indice) >= alvo)
+                indices = range(fim - 1, -1, -1)
+        for indice in indices:
+            yield self._materializar(indice)
+
+    def jogador_na_posicao_nome(self, posicao: int) -> Optional[NoAVL]:
+        if posicao < 1 or posicao > self.quantidade:
+            return None
+        return self._materializar(posicao - 1)
+
+    def pontuacoes_recorde(self) -> Iterator[int]:
+        # Lê a tabela de nós direto, sem materializar nenhum jogador
+        tabela = self._mapa[self._offset_nos:self._offset_nos + self.quantidade * REGISTRO_NO.size]
+        for registro in REGISTRO_NO.iter_unpack(tabela):
+            yield registro[2]
+
+    def contadores_jogadores(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        tabela = self._mapa[self._offset_nos:self._offset_nos + self.quantidade * REGISTRO_NO.size]
+        for (_, _, pontuacao_recorde, contador_mortes, record_eventos,
+             chefes_derrotados, total_avls, _, _, _) in REGISTRO_NO.iter_unpack(tabela):
+            yield pontuacao_recorde, chefes_derrotados, record_eventos, total_avls, contador_mortes
+
+    def pontuacoes_avls(self) -> Iterator[int]:
+        # Os históricos ficam contíguos no fim do arquivo
+        historicos = array(TIPO_HISTORICO)
+        historicos.frombytes(self._mapa[self._offset_historicos:self._offset_datas])
+        return iter(historicos)
+
+    def avls_desde(self, momento: int) -> Iterator[Tuple[int, str, int]]:
+        if momento >= self._desde_recentes:
+            # Coberto pela seção de recentes: busca binária pelo primeiro momento e leitura do sufixo
+            def recente(posicao: int) -> Tuple[int, int, int]:
+                return REGISTRO_RECENTE.unpack_from(self._mapa, self._offset_recentes + posicao * REGISTRO_RECENTE.size)
+
+            inicio = primeiro_onde(self._quantidade_recentes, lambda posicao: recente(posicao)[0] >= momento)
+            for posicao in range(inicio, self._quantidade_recentes):
+                momento_avl, indice, pontuacao = recente(posicao)
+                yield momento_avl, self._nome_bytes(indice).decode("utf-8"), pontuacao
+            return
+
+        # Cauda recente de cada histórico lida direto do mapa, sem materializar jogadores
+        tamanho_data = struct.calcsize(TIPO_DATAS)
+        tamanho_pontuacao = struct.calcsize(TIPO_HISTORICO)
+        for indice in range(self.quantidade):
+            offset_historico, avls = self._registro(indice)[7:9]
+            fim = offset_historico + avls
+            i = fim
+            while i > offset_historico and struct.unpack_from(
+                    "<" + TIPO_DATAS, self._mapa, self._offset_datas + (i - 1) * tamanho_data)[0] >= momento:
+                i -= 1
+            if i == fim:
+                continue
+            nome_jogador = self._nome_bytes(indice).decode("utf-8")
+            for j in range(i, fim):
+                yield (struct.unpack_from("<" + TIPO_DATAS, self._mapa, self._offset_datas + j * tamanho_data)[0],
+                       nome_jogador,
+                       struct.unpack_from("<" + TIPO_HISTORICO, self._mapa,
+                                          self._offset_historicos + j * tamanho_pontuacao)[0])
+
+    def mudancas_desde(self, versao: int, limite: Optional[int] = None) -> Optional[List[NoAVL]]:
+        # A tabela de mudanças é crescente por versão: o sufixo depois de versao sai de uma busca binária
+        inicio = primeiro_onde(self.quantidade,
+                               lambda posicao: self._registro(self._indice_por_mudanca(posicao))[9] > versao)
+        if limite is not None and self.quantidade - inicio > limite:
+            return None
+        return [self._materializar(self._indice_por_mudanca(posicao)) for posicao in range(inicio, self.quantidade)]
+
+    def em_ordem(self) -> Iterator[NoAVL]:
+        for indice in range(self.quantidade):
+            yield self._materializar(indice)
+
+    def em_ordem_decrescente(self) -> Iterator[NoAVL]:
+        for posicao in range(self.quantidade):
+            yield self._materializar(self._indice_por_pontuacao(posicao))
+
+    def top_n(self, n: int) -> List[NoAVL]:
+        return [self._materializar(self._indice_por_pontuacao(posicao))
+                for posicao in range(min(max(n, 0), self.quantidade))]
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do jogo se importam pelo nome (from AVL import ...), a partir de insalubre/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "insalubre"))
+
+@pytest.fixture
+def fechar_depois():
+    """Registra rankings que seguram recursos (processos do fragmentado) e os fecha ao fim do teste"""
+    abertos = []
+    yield abertos.append
+    for ranking in abertos:
+        ranking.fechar()
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+import main
+from agregados import AgregadosRanking, calcular_taxa_vitoria
+
+def jogar(jogo, passos: int, semente: int):
+    """AVLs soltas, fins de AVL e lotes importados, pelos mesmos caminhos que o jogo usa"""
+    aleatorio = random.Random(semente)
+    for _ in range(passos):
+        nome = f"p{aleatorio.randint(0, 60)}"
+        sorteio = aleatorio.random()
+        if sorteio < 0.5:
+            jogo.registrar_pontuacao(nome, aleatorio.randint(1, 5000))
+        elif sorteio < 0.9:
+            jogo.jogador_atual = main.Jogador(nome)
+            jogo.jogador_atual.pontuacao_avl_atual = aleatorio.randint(0, 5000)
+            jogo.jogador_atual.chefes_derrotados_atual = aleatorio.randint(0, 3)
+            jogo.jogador_atual.vida = aleatorio.choice((0, 50))
+            jogo.processar_fim_avl(1, aleatorio.randint(0, 80))
+        else:
+            jogo.importar_resultados([(f"p{aleatorio.randint(0, 90)}", aleatorio.randint(1, 5000),
+                                       aleatorio.randint(0, 80), aleatorio.randint(0, 3), aleatorio.random() < 0.5)
+                                      for _ in range(20)])
+
+@pytest.mark.parametrize("motor", ["avl", "persistente"])
+def test_agregados_incrementais_batem_com_uma_passada(motor, capsys):
+    """avl altera os nós no lugar; persistente troca o nó a cada escrita"""
+    jogo = main.SobreviventeInsalubre(arquivo_ranking=None, motor=motor)
+    jogar(jogo, 600, semente=21)
+    capsys.readouterr()
+
+    nos = list(jogo.ranking.em_ordem())
+    resumo = jogo.agregados.resumo()
+    assert resumo == AgregadosRanking.do_ranking(jogo.ranking).resumo()
+    assert resumo["total_jogadores"] == len(nos)
+    assert resumo["pontuacao_media"] == sum(no.pontuacao_recorde for no in nos) // len(nos)
+    assert resumo["total_chefes"] == sum(no.chefes_derrotados for no in nos)
+    assert resumo["total_eventos"] == sum(no.record_eventos for no in nos)
+    assert resumo["taxa_vitoria_media"] == sum(calcular_taxa_vitoria(no) for no in nos) // len(nos)
+    assert resumo["total_mortes_registradas"] == sum(no.contador_mortes for no in nos)
+    assert resumo["total_avls"] == sum(no.total_avls for no in nos)
+    # Todo campo do resumo sai das somas; nenhum valor fixo
+    assert len(resumo) == 7
+
+def test_versao_dos_agregados_so_sobe_quando_algo_muda():
+    agregados = AgregadosRanking()
+    agregados.atualizar(None, (10, 1, 2, 50, 2, 1))
+    versao = agregados.versao
+    agregados.atualizar((10, 1, 2, 50, 2, 1), (10, 1, 2, 50, 2, 1))
+    assert agregados.versao == versao
+    agregados.atualizar((10, 1, 2, 50, 2, 1), None)
+    assert agregados.versao > versao and agregados.total_jogadores == 0
@@ -0,0 +1,187 @@
+import json
+import random
+
+import pytest
+
+import main
+
+@pytest.fixture
+def jogo():
+    """Jogo sem arquivo, com um ranking persistente de jogadores aleatórios, servido pela API"""
+    aleatorio = random.Random(11)
+    jogo = main.SobreviventeInsalubre(arquivo_ranking=None, motor="persistente")
+    for i in range(300):
+        jogo.ranking.inserir(f"jogador{i:03d}", aleatorio.randint(0, 400))
+    anterior, main.jogo_global = main.jogo_global, jogo
+    yield jogo
+    main.jogo_global = anterior
+
+def test_intervalo_de_pontuacao_na_ordem_do_ranking(jogo):
+    corpo = main.app.test_client().get("/api/ranking/intervalo?min=100&max=200&limite=500").get_json()
+    esperado = [no.nome_jogador for no in jogo.ranking.em_ordem_decrescente() if 100 <= no.pontuacao_recorde <= 200]
+    assert [jogador["nome"] for jogador in corpo["jogadores"]] == esperado
+    assert all(jogador["rank"] == jogo.ranking.posicao_jogador(jogador["nome"]) for jogador in corpo["jogadores"])
+    assert main.app.test_client().get("/api/ranking/intervalo?min=5&max=1").status_code == 400
+
+def test_busca_por_prefixo_em_ordem_de_nome(jogo):
+    corpo = main.app.test_client().get("/api/jogadores/busca?prefixo=jogador01&limite=5").get_json()
+    assert [jogador["nome"] for jogador in corpo["jogadores"]] == [f"jogador01{i}" for i in range(5)]
+    assert main.app.test_client().get("/api/jogadores/busca").status_code == 400
+
+def test_ranking_em_cache_ate_o_ranking_mudar(jogo):
+    cliente = main.app.test_client()
+    etag = cliente.get("/api/ranking").headers["ETag"]
+    assert cliente.get("/api/ranking", headers={"If-None-Match": etag}).status_code == 304
+
+    jogo.ranking.inserir("novato", 10 ** 6)
+    resposta = cliente.get("/api/ranking", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200 and resposta.headers["ETag"] != etag
+    assert resposta.get_json()["jogadores"][0]["nome"] == "novato"
+
+def ordem_esperada(ranking, ordenar: str, ordem: str) -> list:
+    if ordenar == "pontuacao":
+        nos = sorted(ranking.em_ordem(), key=lambda no: (no.pontuacao_recorde, no.nome_jogador))
+    else:
+        nos = list(ranking.em_ordem())
+    if ordem == "desc":
+        nos.reverse()
+    return [no.nome_jogador for no in nos]
+
+def paginas_por_cursor(cliente, base: str) -> list:
+    nomes = []
+    corpo = cliente.get(base).get_json()
+    while True:
+        nomes += [jogador["nome"] for jogador in corpo["jogadores"]]
+        if not corpo["proximo_cursor"]:
+            return nomes
+        corpo = cliente.get(f"{base}&cursor={corpo['proximo_cursor']}").get_json()
+
+ORDENACOES = [("pontuacao", "desc"), ("pontuacao", "asc"), ("nome", "asc"), ("nome", "desc")]
+
+@pytest.mark.parametrize("ordenar,ordem", ORDENACOES)
+def test_paginas_por_deslocamento_e_por_cursor(jogo, ordenar, ordem):
+    cliente = main.app.test_client()
+    esperado = ordem_esperada(jogo.ranking, ordenar, ordem)
+    base = f"/api/ranking?ordenar={ordenar}&ordem={ordem}&limite=23"
+
+    por_deslocamento = []
+    for deslocamento in range(0, len(esperado) + 23, 23):
+        corpo = cliente.get(f"{base}&deslocamento={deslocamento}").get_json()
+        assert corpo["total"] == len(esperado)
+        por_deslocamento += [jogador["nome"] for jogador in corpo["jogadores"]]
+        for jogador in corpo["jogadores"]:
+            assert jogador["rank"] == jogo.ranking.posicao_jogador(jogador["nome"])
+    assert por_deslocamento == esperado
+    assert paginas_por_cursor(cliente, base) == esperado
+
+@pytest.mark.parametrize("ordenar,ordem", ORDENACOES)
+def test_filtro_de_classe_pagina_no_servidor_por_cursor(jogo, ordenar, ordem):
+    cliente = main.app.test_client()
+    for classe in ("warrior", "mage", "druid"):
+        esperado = [nome for nome in ordem_esperada(jogo.ranking, ordenar, ordem)
+                    if main.obter_classe(nome)["id"] == classe]
+        base = f"/api/ranking?ordenar={ordenar}&ordem={ordem}&limite=7&classe={classe}"
+        corpo = cliente.get(base).get_json()
+        # Sem índice por classe não há total (seria uma passada por todos os jogadores)
+        assert corpo["total"] is None and corpo["classe"] == classe
+        assert all(jogador["classe_id"] == classe and jogador["rank"] == jogo.ranking.posicao_jogador(jogador["nome"])
+                   for jogador in corpo["jogadores"])
+        assert paginas_por_cursor(cliente, base) == esperado
+
+def test_filtro_de_classe_recusa_deslocamento_e_classe_desconhecida(jogo):
+    cliente = main.app.test_client()
+    assert cliente.get("/api/ranking?classe=mage&deslocamento=15").status_code == 400
+    assert cliente.get("/api/ranking?classe=bardo").status_code == 400
+
+def test_linha_do_ranking_bate_com_o_detalhe_do_jogador(jogo):
+    cliente = main.app.test_client()
+    pagina = cliente.get("/api/ranking?limite=40").get_json()["jogadores"]
+    for jogador in pagina:
+        detalhe = cliente.get(f"/api/jogador/{jogador['nome']}").get_json()
+        assert (jogador["classe_id"], jogador["status"], jogador["apelido"], jogador["sanidade"]) == \
+            (detalhe["classe_id"], detalhe["status"], detalhe["apelido"], detalhe["sanidade"])
+        equipamento = detalhe["equipamento"]
+        assert jogador["equipamento"]["arma_principal"] == equipamento["mainHand"]["name"]
+        assert jogador["equipamento"]["armadura"] == equipamento["armadura"]
+        if equipamento["offHand"] is None:
+            assert jogador["equipamento"]["arma_secundaria"] is None
+        else:
+            assert jogador["equipamento"]["arma_secundaria"] == equipamento["offHand"]["name"]
+            assert jogador["equipamento"]["dano_secundaria"] == equipamento["offHand"]["damage"]
+        assert [jogador["atributos"][campo] for campo in ("forca", "agilidade", "inteligencia", "vitalidade")] == \
+            [detalhe["stats"][campo] for campo in ("strength", "agility", "intelligence", "vitality")]
+
+        no = jogo.ranking.buscar(jogador["nome"])
+        assert detalhe["taxa_vitoria"] == main.calcular_taxa_vitoria(no)
+
+    # Sem random: a mesma requisição devolve o mesmo corpo
+    nome = pagina[0]["nome"]
+    assert cliente.get(f"/api/jogador/{nome}").data == cliente.get(f"/api/jogador/{nome}").data
+
+def test_estatisticas_mudam_so_com_o_ranking(jogo):
+    cliente = main.app.test_client()
+    corpo = cliente.get("/api/estatisticas").data
+    assert cliente.get("/api/estatisticas").data == corpo
+    jogo.ranking.inserir("novato", 10)
+    depois = cliente.get("/api/estatisticas").get_json()
+    assert depois["versao_ranking"] == jogo.ranking.versao > json.loads(corpo)["versao_ranking"]
+
+def test_parametros_invalidos_de_pagina(jogo):
+    cliente = main.app.test_client()
+    cursor = cliente.get("/api/ranking?ordenar=nome&limite=5").get_json()["proximo_cursor"]
+    for consulta in ("ordenar=idade", "ordem=lado", "deslocamento=-1", "cursor=%21%21",
+                     f"cursor={cursor}",  # cursor da ordenação por nome numa página por pontuação
+                     f"ordenar=nome&cursor={cursor}&deslocamento=5"):
+        assert cliente.get(f"/api/ranking?{consulta}").status_code == 400, consulta
+    assert cliente.get("/api/ranking/stream?ordem=lado").status_code == 400
+
+@pytest.mark.parametrize("ordenar,ordem", [("pontuacao", "asc"), ("nome", "desc")])
+def test_exportacao_ndjson_em_paginas(jogo, monkeypatch, ordenar, ordem):
+    monkeypatch.setattr(main, "TAMANHO_LOTE_PERCURSO", 7)
+    resposta = main.app.test_client().get(f"/api/ranking/stream?ordenar={ordenar}&ordem={ordem}")
+    assert resposta.mimetype == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in resposta.data.splitlines()]
+    assert [linha["nome"] for linha in linhas] == ordem_esperada(jogo.ranking, ordenar, ordem)
+    assert all(linha["rank"] == jogo.ranking.posicao_jogador(linha["nome"]) for linha in linhas)
+
+def proximos_eventos(resposta, quantidade: int) -> list:
+    """Os próximos blocos do stream SSE, já separados em campos"""
+    blocos = []
+    for pedaco in resposta.response:
+        linhas = pedaco.decode("utf-8").strip().splitlines()
+        campos = dict(linha.split(": ", 1) for linha in linhas if ": " in linha)
+        blocos.append(campos)
+        if len(blocos) == quantidade:
+            return blocos
+    return blocos
+
+def test_eventos_sse_entregam_deltas_e_retomam_pelo_ultimo_id(jogo):
+    cliente = main.app.test_client()
+    desde = main.canal_ranking.ultimo_id
+    jogo.ranking.inserir("lider", 10 ** 6, 2_000_000)
+    jogo.publicar_mudanca_jogador("lider", None, None)
+    jogo.ranking.inserir("jogador000", 10 ** 6 + 1, 2_000_001)
+    jogo.publicar_mudanca_jogador("jogador000", 300, 150)
+
+    resposta = cliente.get(f"/api/ranking/eventos?desde={desde}", buffered=False)
+    assert resposta.mimetype == "text/event-stream"
+    retry, primeiro, segundo = proximos_eventos(resposta, 3)
+    resposta.close()
+    assert retry == {"retry": "3000"}
+    assert primeiro["event"] == segundo["event"] == "jogador"
+    assert json.loads(primeiro["data"])["nome"] == "lider"
+    delta = json.loads(segundo["data"])
+    assert (delta["nome"], delta["rank"], delta["rank_anterior"]) == ("jogador000", 1, 150)
+
+    # Reconexão do EventSource: Last-Event-ID manda só o que veio depois
+    resposta = cliente.get("/api/ranking/eventos", headers={"Last-Event-ID": primeiro["id"]}, buffered=False)
+    _, reenviado = proximos_eventos(resposta, 2)
+    resposta.close()
+    assert reenviado["id"] == segundo["id"]
+
+def test_eventos_sse_pedem_recarga_quando_o_id_saiu_do_buffer(jogo):
+    resposta = main.app.test_client().get("/api/ranking/eventos?desde=1", buffered=False)
+    _, recarga = proximos_eventos(resposta, 2)
+    resposta.close()
+    assert recarga["event"] == "recarregar"
+    assert int(recarga["id"]) == main.canal_ranking.ultimo_id
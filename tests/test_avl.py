@@ -0,0 +1,142 @@
+import json
+import os
+import random
+from array import array
+
+import pytest
+
+from AVL import TIPO_HISTORICO, ArvoreAVL, ler_registros_ndjson
+
+DADOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "insalubre", "data")
+
+def ranking_aleatorio(quantidade: int, semente: int):
+    """Árvore com AVLs aleatórias e o recorde esperado de cada jogador"""
+    aleatorio = random.Random(semente)
+    arvore = ArvoreAVL()
+    recordes = {}
+    for _ in range(quantidade):
+        nome = f"p{aleatorio.randint(0, quantidade // 3)}"
+        pontuacao = aleatorio.randint(0, 5000)
+        arvore.inserir(nome, pontuacao)
+        recordes[nome] = max(recordes.get(nome, -1), pontuacao)
+    return arvore, recordes
+
+def test_top_n_segue_o_recorde_de_cada_jogador():
+    arvore, recordes = ranking_aleatorio(600, semente=1)
+    esperado = sorted(((pontuacao, nome) for nome, pontuacao in recordes.items()), reverse=True)
+    for n in (1, 10, len(esperado) + 5):
+        assert [(linha[1], linha[0]) for linha in arvore.top_n_pontuacoes(n)] == esperado[:n]
+
+def test_indice_reconstruido_ao_carregar_o_json(tmp_path):
+    arvore, _ = ranking_aleatorio(300, semente=2)
+    arquivo = str(tmp_path / "ranking.json")
+    arvore.salvar_para_json(arquivo)
+    carregada = ArvoreAVL()
+    carregada.carregar_de_json(arquivo)
+    assert carregada.top_n_pontuacoes(50) == arvore.top_n_pontuacoes(50)
+
+def test_posicoes_pelo_tamanho_das_subarvores():
+    arvore, recordes = ranking_aleatorio(800, semente=3)
+    ordem = [nome for _, nome in sorted(((pontuacao, nome) for nome, pontuacao in recordes.items()), reverse=True)]
+    assert arvore.contar_jogadores() == len(ordem)
+    for posicao, nome in enumerate(ordem, 1):
+        assert arvore.posicao_jogador(nome) == posicao
+        assert arvore.jogador_na_posicao(posicao).nome_jogador == nome
+    assert arvore.posicao_jogador("ninguem") is None
+    assert arvore.jogador_na_posicao(0) is None and arvore.jogador_na_posicao(len(ordem) + 1) is None
+
+def conferir_subarvore(no, menor=None, maior=None) -> int:
+    """Ordem por nome, altura e tamanho de cada nó; devolve a altura"""
+    if no is None:
+        return 0
+    assert (menor is None or no.nome_jogador > menor) and (maior is None or no.nome_jogador < maior)
+    esquerda = conferir_subarvore(no.esquerda, menor, no.nome_jogador)
+    direita = conferir_subarvore(no.direita, no.nome_jogador, maior)
+    assert abs(esquerda - direita) <= 1
+    assert no.altura == 1 + max(esquerda, direita)
+    assert no.tamanho == 1 + (no.esquerda.tamanho if no.esquerda else 0) + (no.direita.tamanho if no.direita else 0)
+    return no.altura
+
+def test_insercoes_iterativas_mantem_a_arvore_balanceada(tmp_path):
+    """Nomes em ordem crescente, o pior caso para o rebalanceamento, misturados a AVLs repetidas"""
+    arvore = ArvoreAVL()
+    for i in range(3000):
+        arvore.inserir(f"j{i:05d}", i)
+        if i % 7 == 0:
+            arvore.inserir(f"j{i // 2:05d}", 10 ** 5 + i)
+    conferir_subarvore(arvore.raiz)
+    nomes = [no.nome_jogador for no in arvore.em_ordem()]
+    assert nomes == [f"j{i:05d}" for i in range(3000)]
+    assert [no.nome_jogador for no in arvore.indice_pontuacao.em_ordem_decrescente()][:2] == ["j01498", "j01494"]
+
+    arquivo = str(tmp_path / "ranking.json")
+    arvore.salvar_para_json(arquivo)
+    carregada = ArvoreAVL()
+    carregada.carregar_de_json(arquivo)
+    conferir_subarvore(carregada.raiz)
+    assert [no.nome_jogador for no in carregada.em_ordem()] == nomes
+    assert carregada.buscar("j01498").historico_avls.tolist() == [1498, 10 ** 5 + 2996]
+
+def test_carga_em_massa_equivale_as_insercoes():
+    aleatorio = random.Random(4)
+    registros = [{"nome_jogador": f"p{i:04d}", "pontuacao_recorde": aleatorio.randint(0, 5000),
+                  "historico_avls": [1, 2], "contador_mortes": 1, "record_eventos": 7,
+                  "chefes_derrotados": 2, "total_avls": 2}
+                 for i in range(1000)]
+    aleatorio.shuffle(registros)
+    arvore = ArvoreAVL()
+    arvore.construir_de_ordenados(registros)
+    conferir_subarvore(arvore.raiz)
+    assert [no.nome_jogador for no in arvore.em_ordem()] == sorted(registro["nome_jogador"] for registro in registros)
+    esperado = sorted(((registro["pontuacao_recorde"], registro["nome_jogador"]) for registro in registros), reverse=True)
+    assert [(linha[1], linha[0]) for linha in arvore.top_n_pontuacoes(20)] == esperado[:20]
+    assert arvore.jogador_na_posicao(500).nome_jogador == esperado[499][1]
+
+    with pytest.raises(ValueError):
+        ArvoreAVL().construir_de_ordenados(registros + [dict(registros[0])])
+
+def test_no_compacto_guarda_o_historico_num_array(tmp_path):
+    arvore = ArvoreAVL()
+    for pontuacao in (30, 10, 20):
+        arvore.inserir("Ana", pontuacao)
+    no = arvore.buscar("Ana")
+    assert not hasattr(no, "__dict__")
+    assert no.historico_avls == array(TIPO_HISTORICO, [30, 10, 20]) and no.total_avls == 3
+
+    arquivo = str(tmp_path / "ranking.json")
+    arvore.salvar_para_json(arquivo)
+    carregada = ArvoreAVL()
+    carregada.carregar_de_json(arquivo)
+    assert carregada.buscar("Ana").historico_avls == no.historico_avls
+
+def test_ndjson_tem_os_registros_de_data_ranking_json(tmp_path):
+    arvore = ArvoreAVL()
+    arvore.carregar_lista_json(os.path.join(DADOS, "ranking.json"))
+    with open(os.path.join(DADOS, "ranking.json"), encoding="utf-8") as f:
+        esperado = sorted(json.load(f), key=lambda registro: registro["nome_jogador"])
+    # O arquivo é de antes das datas: cada AVL entra com momento desconhecido
+    for registro in esperado:
+        registro["historico_datas"] = [0] * len(registro["historico_avls"])
+    assert list(arvore.registros()) == esperado
+
+    arquivo = str(tmp_path / "ranking.ndjson")
+    arvore.salvar_para_ndjson(arquivo)
+    with open(arquivo, encoding="utf-8") as f:
+        assert [json.loads(linha) for linha in f] == esperado
+
+    carregada = ArvoreAVL()
+    carregada.carregar_de_ndjson(arquivo)
+    assert list(carregada.registros()) == esperado
+
+def test_ndjson_de_ida_e_volta(tmp_path):
+    arvore, _ = ranking_aleatorio(2000, semente=9)
+    arquivo = str(tmp_path / "ranking.ndjson")
+    arvore.salvar_para_ndjson(arquivo)
+    # Gerador: os registros saem um a um, na ordem de nome
+    linhas = ler_registros_ndjson(arquivo)
+    assert next(linhas)["nome_jogador"] == next(arvore.em_ordem()).nome_jogador
+    carregada = ArvoreAVL()
+    carregada.carregar_de_ndjson(arquivo)
+    conferir_subarvore(carregada.raiz)
+    assert list(carregada.registros()) == list(arvore.registros())
+    assert carregada.top_n_pontuacoes(25) == arvore.top_n_pontuacoes(25)
@@ -0,0 +1,56 @@
+import math
+import random
+
+import pytest
+
+from armazenamento import criar_armazenamento
+from distribuicao import ERRO_RELATIVO, DistribuicaoPontuacoes, HistogramaLogaritmico
+
+def quantil_exato(valores: list, q: float) -> int:
+    ordenados = sorted(valores)
+    return ordenados[max(1, math.ceil(q * len(ordenados))) - 1]
+
+@pytest.mark.parametrize("semente", range(3))
+def test_quantis_dentro_do_erro_relativo(semente):
+    aleatorio = random.Random(semente)
+    valores = [int(aleatorio.lognormvariate(7, 2)) + 1 for _ in range(20000)]
+    histograma = HistogramaLogaritmico()
+    for valor in valores:
+        histograma.adicionar(valor)
+    de_uma_vez = HistogramaLogaritmico.de_valores(valores)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99, 1.0):
+        exato = quantil_exato(valores, q)
+        assert histograma.quantil(q) == de_uma_vez.quantil(q)
+        assert abs(histograma.quantil(q) - exato) <= ERRO_RELATIVO * exato + 1, q
+
+    for valor in valores[:5000]:
+        histograma.remover(valor)
+    restantes = valores[5000:]
+    assert histograma.total == len(restantes)
+    assert abs(histograma.quantil(0.5) - quantil_exato(restantes, 0.5)) <= ERRO_RELATIVO * quantil_exato(restantes, 0.5) + 1
+
+def test_fracao_abaixo_e_zeros():
+    histograma = HistogramaLogaritmico.de_valores([0, 0, 10, 100, 1000])
+    assert histograma.quantil(0.4) == 0
+    assert histograma.fracao_abaixo(0) == pytest.approx(0.2)
+    assert histograma.fracao_abaixo(500) == pytest.approx(0.8)
+    assert histograma.fracao_abaixo(10 ** 6) == 1.0
+    assert HistogramaLogaritmico().quantil(0.5) == 0
+
+def test_distribuicao_incremental_igual_a_remontada():
+    aleatorio = random.Random(15)
+    ranking = criar_armazenamento("avl")
+    incremental = DistribuicaoPontuacoes()
+    for _ in range(3000):
+        nome = f"p{aleatorio.randint(0, 300)}"
+        pontuacao = aleatorio.randint(0, 50000)
+        anterior = ranking.buscar(nome)
+        recorde_anterior = anterior.pontuacao_recorde if anterior else None
+        ranking.inserir(nome, pontuacao)
+        incremental.registrar_avl(pontuacao, recorde_anterior, ranking.buscar(nome).pontuacao_recorde)
+
+    remontada = DistribuicaoPontuacoes.do_ranking(ranking)
+    assert incremental.resumo() == remontada.resumo()
+    assert incremental.recordes.total == ranking.contar_jogadores()
+    assert incremental.avls.total == 3000
+    assert 0 <= incremental.melhor_que(25000) <= 100
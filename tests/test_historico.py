@@ -0,0 +1,106 @@
+import pickle
+import random
+import statistics
+
+import pytest
+
+from AVL import (TAMANHO_RECENTES, NoAVL, acrescentar_pontuacao, avls_recentes, estatisticas_do_no,
+                 no_do_registro, registro_do_no)
+from armazenamento import MOTORES, criar_armazenamento
+
+def test_no_sem_avls_nao_tem_estatisticas():
+    no = NoAVL("Ana", 0)
+    assert no.estatisticas is None
+    assert estatisticas_do_no(no).quantidade == 0
+    assert avls_recentes(no) == []
+    assert no_do_registro(registro_do_no(no)).estatisticas is None
+
+def test_estatisticas_e_recentes_saem_do_historico():
+    aleatorio = random.Random(3)
+    no = NoAVL("Ana", 0)
+    pontuacoes = []
+    for momento in range(1, 40):
+        pontuacao = aleatorio.randint(0, 5000)
+        pontuacoes.append(pontuacao)
+        acrescentar_pontuacao(no, pontuacao, momento)
+        estatisticas = no.estatisticas
+        assert avls_recentes(no) == pontuacoes[-TAMANHO_RECENTES:]
+        assert (estatisticas.quantidade, estatisticas.minimo, estatisticas.maximo) == \
+            (len(pontuacoes), min(pontuacoes), max(pontuacoes))
+        assert estatisticas.media() == pytest.approx(statistics.fmean(pontuacoes))
+        assert estatisticas.desvio_padrao() == pytest.approx(statistics.pstdev(pontuacoes))
+    assert no.total_avls == len(pontuacoes)
+
+    copia = pickle.loads(pickle.dumps(no))
+    assert copia.estatisticas.soma == sum(pontuacoes)
+    assert avls_recentes(copia) == pontuacoes[-TAMANHO_RECENTES:]
+
+@pytest.mark.parametrize("motor", MOTORES)
+def test_agregados_de_jogadores_carregados_e_inseridos(motor, fechar_depois):
+    ranking = criar_armazenamento(motor)
+    fechar_depois(ranking)
+    ranking.construir_de_ordenados([
+        {"nome_jogador": "a", "pontuacao_recorde": 10},
+        {"nome_jogador": "b", "pontuacao_recorde": 20, "historico_avls": [20, 5], "historico_datas": [1, 2]},
+    ])
+    ranking.inserir("b", 7, 3)
+    ranking.inserir_lote([("c", 3, 1, 0, False), ("b", 1, 1, 0, False)] * 40, 4)
+    # Sem histórico não há estatísticas
+    assert ranking.buscar("a").estatisticas is None
+    no = ranking.buscar("b")
+    b = no.estatisticas
+    assert (b.quantidade, b.soma, b.minimo, b.maximo) == (43, 72, 1, 20)
+    assert avls_recentes(no) == [1] * TAMANHO_RECENTES
+    assert ranking.buscar("c").estatisticas.soma == 120
+
+def test_versao_anterior_do_persistente_guarda_os_seus_agregados():
+    ranking = criar_armazenamento("persistente")
+    ranking.inserir("a", 1, 1)
+    instantaneo = ranking.instantaneo()
+    ranking.inserir("a", 9, 2)
+    assert avls_recentes(instantaneo.buscar("a")) == [1]
+    assert instantaneo.buscar("a").estatisticas.soma == 1
+    assert avls_recentes(ranking.buscar("a")) == [1, 9]
+
+def test_versoes_do_persistente_compartilham_o_historico():
+    ranking = criar_armazenamento("persistente")
+    aleatorio = random.Random(5)
+    esperado = {}
+    versoes = []
+    for momento in range(1, 400):
+        nome = f"p{aleatorio.randint(0, 9)}"
+        pontuacao = aleatorio.randint(0, 5000)
+        anterior = ranking.buscar(nome)
+        if aleatorio.random() < 0.2:
+            lote = [(nome, pontuacao, 1, 0, False)] + [(f"q{i}", i, 1, 0, False) for i in range(60)]
+            ranking.inserir_lote(lote, momento)
+            for item in lote:
+                esperado.setdefault(item[0], []).append((item[1], momento))
+        else:
+            ranking.inserir(nome, pontuacao, momento)
+            esperado.setdefault(nome, []).append((pontuacao, momento))
+            # A nova versão acrescenta no mesmo array em vez de copiá-lo
+            if anterior is not None:
+                assert ranking.buscar(nome).historico_avls is anterior.historico_avls
+        if momento % 40 == 0:
+            versoes.append((ranking.instantaneo(), {n: list(h) for n, h in esperado.items()}))
+
+    for instantaneo, historicos in versoes + [(ranking.instantaneo(), esperado)]:
+        for registro in instantaneo.registros():
+            historico = historicos[registro["nome_jogador"]]
+            assert registro["historico_avls"] == [pontuacao for pontuacao, _ in historico]
+            assert registro["historico_datas"] == [momento for _, momento in historico]
+        assert sorted(instantaneo.pontuacoes_avls()) == sorted(p for h in historicos.values() for p, _ in h)
+        assert sorted(instantaneo.avls_desde(200)) == sorted(
+            (m, n, p) for n, h in historicos.items() for p, m in h if m >= 200)
+
+def test_sobra_de_escrita_nao_publicada_e_descartada():
+    ranking = criar_armazenamento("persistente")
+    ranking.inserir("a", 1, 1)
+    publicado = ranking.buscar("a")
+    # Uma escrita que acrescentou numa cópia e falhou antes de publicar
+    publicado.historico_avls.append(99)
+    publicado.historico_datas.append(2)
+    ranking.inserir("a", 5, 3)
+    assert ranking.buscar("a").historico_avls.tolist() == [1, 5]
+    assert avls_recentes(publicado) == [1]
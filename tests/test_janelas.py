@@ -0,0 +1,90 @@
+import calendar
+import random
+
+import pytest
+
+import main
+from armazenamento import MOTORES, criar_armazenamento
+from ranking_janelas import JANELAS, RankingsPorJanela
+from snapshot_binario import SnapshotMapeado, escrever_snapshot_binario
+
+INICIO = calendar.timegm((2026, 3, 25, 0, 0, 0))
+
+def gerar_avls(quantidade: int, semente: int):
+    """(momento, nome, pontuação) em ordem cronológica, atravessando a virada de mês"""
+    aleatorio = random.Random(semente)
+    momento = INICIO
+    avls = []
+    for _ in range(quantidade):
+        momento += aleatorio.randint(0, 1200)
+        avls.append((momento, f"p{aleatorio.randint(0, 80)}", aleatorio.randint(1, 10000)))
+    return avls
+
+def forca_bruta(avls, nome_janela: str, momento_atual: int):
+    """(nome, melhor pontuação) na janela, na ordem do ranking, relendo todas as AVLs"""
+    limite = JANELAS[nome_janela](momento_atual)
+    melhores = {}
+    for momento, nome, pontuacao in avls:
+        if limite <= momento <= momento_atual and pontuacao > melhores.get(nome, -1):
+            melhores[nome] = pontuacao
+    return [(nome, pontuacao) for pontuacao, nome in sorted(((p, n) for n, p in melhores.items()), reverse=True)]
+
+def test_janelas_incrementais_batem_com_forca_bruta():
+    avls = gerar_avls(4000, semente=9)
+    rankings = RankingsPorJanela()
+    registradas = 0
+    for ponto in range(1, 21):
+        ate = len(avls) * ponto // 20
+        while registradas < ate:
+            momento, nome, pontuacao = avls[registradas]
+            rankings.registrar(nome, pontuacao, momento, momento)
+            registradas += 1
+        momento_atual = avls[registradas][0] - 1 if registradas < len(avls) else avls[-1][0] + 3 * 86400
+        for nome_janela in JANELAS:
+            esperado = forca_bruta(avls[:registradas], nome_janela, momento_atual)
+            obtido = [(nome, pontuacao) for nome, pontuacao, _ in rankings.top_n(nome_janela, 10 ** 6, momento_atual)]
+            assert obtido == esperado, (nome_janela, ponto)
+            assert rankings.contar_jogadores(nome_janela, momento_atual) == len(esperado)
+            for posicao, (nome, pontuacao) in enumerate(esperado[:10], 1):
+                assert rankings.posicao(nome_janela, nome, momento_atual) == (posicao, pontuacao)
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_janelas_remontadas_do_motor_e_do_snapshot(motor, tmp_path, fechar_depois):
+    avls = gerar_avls(3000, semente=5)
+    momento_atual = avls[-1][0]
+    ranking = criar_armazenamento(motor)
+    fechar_depois(ranking)
+    for momento, nome, pontuacao in avls:
+        ranking.inserir(nome, pontuacao, momento)
+    esperado = {nome_janela: forca_bruta(avls, nome_janela, momento_atual) for nome_janela in JANELAS}
+
+    def conferir(fonte):
+        rankings = RankingsPorJanela.do_ranking(fonte, momento_atual)
+        for nome_janela in JANELAS:
+            obtido = [(nome, pontuacao) for nome, pontuacao, _ in rankings.top_n(nome_janela, 10 ** 6, momento_atual)]
+            assert obtido == esperado[nome_janela], nome_janela
+
+    conferir(ranking)
+    arquivo = str(tmp_path / "ranking.bin")
+    escrever_snapshot_binario(ranking, arquivo, momento_atual)
+    snapshot = SnapshotMapeado(arquivo)
+    try:
+        conferir(snapshot)
+    finally:
+        snapshot.fechar()
+
+def test_fim_de_avl_registra_a_avl_uma_vez_so():
+    jogo = main.SobreviventeInsalubre(arquivo_ranking=None)
+    jogo.jogador_atual = main.Jogador("Ana")
+    jogo.jogador_atual.pontuacao_avl_atual = 120
+    # A fogueira no meio da AVL não grava a pontuação parcial
+    jogo.criar_evento_especifico(main.TipoEvento.FOGUEIRA)
+    assert jogo.ranking.buscar("Ana") is None
+
+    jogo.jogador_atual.vida = 0
+    jogo.processar_fim_avl(1, 4)
+    no = jogo.ranking.buscar("Ana")
+    assert no.historico_avls.tolist() == [120] and no.total_avls == 1
+    assert no.contador_mortes == 1 and no.record_eventos == 4
+    assert jogo.janelas.contar_jogadores("24h") == 1
+    assert jogo.agregados.total_jogadores == 1 and jogo.agregados.resumo()["total_mortes_registradas"] == 1
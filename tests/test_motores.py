@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+
+import pytest
+
+from AVL import ArmazenamentoRanking, ArvoreAVL, tamanho_historico
+from armazenamento import MOTORES, criar_armazenamento
+from ranking_fragmentado import RankingFragmentado
+
+def operacoes_aleatorias(quantidade: int, semente: int) -> list:
+    """Sequência de escritas: AVLs soltas, fins de AVL, lotes pequenos (um a um) e grandes (mesclados)"""
+    aleatorio = random.Random(semente)
+    operacoes = [("construir", [
+        {"nome_jogador": f"c{i:03d}", "pontuacao_recorde": pontuacao, "historico_avls": [pontuacao],
+         "contador_mortes": 1, "record_eventos": 3, "chefes_derrotados": 1, "total_avls": 1}
+        for i, pontuacao in enumerate(aleatorio.sample(range(5000), 40))])]
+    for passo in range(quantidade):
+        momento = 10 ** 6 + passo
+        nome = f"p{aleatorio.randint(0, 120)}" if aleatorio.random() < 0.8 else f"c{aleatorio.randint(0, 39):03d}"
+        sorteio = aleatorio.random()
+        if sorteio < 0.6:
+            operacoes.append(("inserir", nome, aleatorio.randint(0, 5000), momento))
+        elif sorteio < 0.9:
+            operacoes.append(("fim_avl", nome, aleatorio.randint(0, 80), aleatorio.randint(0, 3),
+                              aleatorio.random() < 0.5))
+        else:
+            tamanho = aleatorio.choice((3, 120))
+            lote = [(f"p{aleatorio.randint(0, 200)}", aleatorio.randint(0, 5000), aleatorio.randint(0, 80),
+                     aleatorio.randint(0, 3), aleatorio.random() < 0.5) for _ in range(tamanho)]
+            operacoes.append(("lote", lote, momento))
+    return operacoes
+
+def aplicar(ranking, operacoes: list):
+    for operacao in operacoes:
+        if operacao[0] == "construir":
+            ranking.construir_de_ordenados(operacao[1])
+        elif operacao[0] == "inserir":
+            ranking.inserir(*operacao[1:])
+        elif operacao[0] == "fim_avl":
+            ranking.registrar_fim_avl(*operacao[1:])
+        else:
+            ranking.inserir_lote(*operacao[1:])
+
+def nomes(nos) -> list:
+    return [no.nome_jogador for no in nos]
+
+def leituras(ranking) -> dict:
+    """Tudo o que as rotas e a persistência leem do ranking, sem os nós em si"""
+    total = ranking.contar_jogadores()
+    todos = nomes(ranking.em_ordem())
+    return {
+        "total": total,
+        "registros": list(ranking.registros()),
+        "em_ordem": todos,
+        "decrescente": nomes(ranking.em_ordem_decrescente()),
+        "posicoes": [ranking.posicao_jogador(nome) for nome in todos],
+        "por_posicao": [ranking.jogador_na_posicao(k).nome_jogador for k in range(1, total + 1)],
+        "ausente": (ranking.buscar("ninguem"), ranking.posicao_jogador("ninguem"),
+                    ranking.jogador_na_posicao(total + 1)),
+        "top": ranking.top_n_pontuacoes(10),
+        "intervalo": nomes(ranking.intervalo_pontuacao(1000, 3000)),
+        "prefixo": nomes(ranking.prefixo_nome("p1")),
+        "recentes": sorted(ranking.avls_desde(10 ** 6 + 1200)),
+        "por_posicao_nome": [ranking.jogador_na_posicao_nome(k).nome_jogador for k in range(1, total + 1, 7)],
+        "paginas": [nomes(ranking.pagina_pontuacao(9, depois, crescente)) for depois in (None, (2500, "p5"))
+                    for crescente in (False, True)] +
+                   [nomes(ranking.pagina_nome(9, depois, crescente)) for depois in (None, "p5", "zz")
+                    for crescente in (False, True)],
+    }
+
+@pytest.fixture(scope="module")
+def operacoes():
+    return operacoes_aleatorias(1500, semente=21)
+
+@pytest.fixture(scope="module")
+def referencia(operacoes):
+    ranking = ArvoreAVL()
+    aplicar(ranking, operacoes)
+    return ranking
+
+def test_referencia_bate_com_o_modelo(operacoes, referencia):
+    """Recorde, histórico e contadores de cada jogador, recalculados à mão"""
+    modelo = {}
+    for operacao in operacoes:
+        if operacao[0] == "construir":
+            for registro in operacao[1]:
+                modelo[registro["nome_jogador"]] = [registro["pontuacao_recorde"], list(registro["historico_avls"]),
+                                                    registro["record_eventos"], registro["chefes_derrotados"],
+                                                    registro["contador_mortes"]]
+            continue
+        if operacao[0] == "lote":
+            # Cada resultado do lote vale como uma AVL seguida do seu fim, em ordem de nome
+            resultados = sorted(operacao[1], key=lambda resultado: resultado[0])
+        elif operacao[0] == "inserir":
+            resultados = [(operacao[1], operacao[2], None, 0, False)]
+        else:
+            resultados = [(operacao[1], None, operacao[2], operacao[3], operacao[4])]
+        for nome, pontuacao, eventos, chefes, morreu in resultados:
+            if pontuacao is not None:
+                jogador = modelo.setdefault(nome, [pontuacao, [], 0, 0, 0])
+                jogador[0] = max(jogador[0], pontuacao)
+                jogador[1].append(pontuacao)
+            if eventos is not None and nome in modelo:
+                jogador = modelo[nome]
+                jogador[2] = max(jogador[2], eventos)
+                jogador[3] += chefes
+                jogador[4] += morreu
+
+    obtido = {registro["nome_jogador"]: [registro["pontuacao_recorde"], registro["historico_avls"],
+                                         registro["record_eventos"], registro["chefes_derrotados"],
+                                         registro["contador_mortes"]]
+              for registro in referencia.registros()}
+    assert obtido == modelo
+    esperado = sorted(modelo, key=lambda nome: (modelo[nome][0], nome), reverse=True)
+    assert nomes(referencia.em_ordem_decrescente()) == esperado
+
+def test_intervalo_e_prefixo_da_referencia(referencia):
+    decrescente = list(referencia.em_ordem_decrescente())
+    for minimo, maximo in ((1000, 3000), (0, 0), (4999, 10 ** 6), (3000, 1000)):
+        assert nomes(referencia.intervalo_pontuacao(minimo, maximo)) == \
+            [no.nome_jogador for no in decrescente if minimo <= no.pontuacao_recorde <= maximo]
+    for prefixo in ("p1", "c0", "", "x"):
+        assert nomes(referencia.prefixo_nome(prefixo)) == \
+            [nome for nome in nomes(referencia.em_ordem()) if nome.startswith(prefixo)]
+
+@pytest.mark.parametrize("motor", sorted(set(MOTORES) - {"avl"}))
+def test_motores_respondem_como_a_arvore_avl(motor, operacoes, referencia, fechar_depois):
+    ranking = criar_armazenamento(motor)
+    fechar_depois(ranking)
+    aplicar(ranking, operacoes)
+    assert leituras(ranking) == leituras(referencia)
+
+@pytest.mark.parametrize("motor", sorted(MOTORES))
+def test_versao_sobe_a_cada_escrita(motor, fechar_depois):
+    ranking = criar_armazenamento(motor)
+    fechar_depois(ranking)
+    versoes = [ranking.versao]
+    for escrever in (lambda: ranking.construir_de_ordenados([{"nome_jogador": "a", "pontuacao_recorde": 5}]),
+                     lambda: ranking.inserir("a", 1),
+                     lambda: ranking.registrar_fim_avl("a", 3, 0, False),
+                     lambda: ranking.inserir_lote([("b", 2, 1, 0, False)])):
+        escrever()
+        versoes.append(ranking.versao)
+    assert versoes == sorted(set(versoes))
+    assert ranking.instantaneo().versao == versoes[-1]
+
+def test_instantaneo_persistente_nao_muda_com_as_escritas(operacoes):
+    ranking = criar_armazenamento("persistente")
+    metade = len(operacoes) // 2
+    aplicar(ranking, operacoes[:metade])
+    instantaneo = ranking.instantaneo()
+    antes = leituras(instantaneo)
+    aplicar(ranking, operacoes[metade:])
+    assert leituras(instantaneo) == antes
+    assert leituras(ranking) != antes
+
+def test_leitores_concorrentes_so_veem_versoes_inteiras():
+    """A API lê instantâneos numa thread enquanto o jogo escreve na outra, sem trava"""
+    ranking = criar_armazenamento("persistente")
+    parar = threading.Event()
+    erros = []
+
+    def escrever():
+        aleatorio = random.Random(4)
+        while not parar.is_set():
+            if aleatorio.random() < 0.05:
+                ranking.inserir_lote([(f"j{aleatorio.randint(0, 3000)}", aleatorio.randint(0, 10 ** 6), 1, 0, False)
+                                      for _ in range(200)])
+            else:
+                ranking.inserir(f"j{aleatorio.randint(0, 3000)}", aleatorio.randint(0, 10 ** 6))
+
+    def ler():
+        while not parar.is_set():
+            instantaneo = ranking.instantaneo()
+            try:
+                por_nome = nomes(instantaneo.em_ordem())
+                por_pontuacao = [(no.pontuacao_recorde, no.nome_jogador) for no in instantaneo.em_ordem_decrescente()]
+                assert por_nome == sorted(por_nome) and len(set(por_nome)) == len(por_nome)
+                assert por_pontuacao == sorted(por_pontuacao, reverse=True)
+                assert len(por_nome) == len(por_pontuacao) == instantaneo.contar_jogadores()
+                for posicao in (1, len(por_pontuacao) // 2, len(por_pontuacao)):
+                    if posicao:
+                        no = instantaneo.jogador_na_posicao(posicao)
+                        assert instantaneo.posicao_jogador(no.nome_jogador) == posicao
+                        assert max(no.historico_avls[:tamanho_historico(no)]) == no.pontuacao_recorde
+            except AssertionError as erro:
+                erros.append(erro)
+                return
+
+    threads = [threading.Thread(target=escrever)] + [threading.Thread(target=ler) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.5)
+    parar.set()
+    for thread in threads:
+        thread.join()
+    assert not erros
+    assert ranking.contar_jogadores() > 100
+
+def test_motor_desconhecido():
+    with pytest.raises(ValueError):
+        criar_armazenamento("planilha")
+    with pytest.raises(ValueError):
+        RankingFragmentado(0)
+
+def test_motor_incompleto_nao_instancia():
+    class SoBusca(ArmazenamentoRanking):
+        def buscar(self, nome_jogador):
+            return None
+
+    with pytest.raises(TypeError, match="inserir"):
+        SoBusca()
+
+def test_fragmentos_repartem_os_jogadores_pelo_nome(operacoes, referencia):
+    ranking = RankingFragmentado(3)
+    try:
+        aplicar(ranking, operacoes)
+        por_fragmento = [0] * ranking.fragmentos
+        for nome in nomes(referencia.em_ordem()):
+            por_fragmento[ranking.fragmento_de(nome)] += 1
+        assert all(por_fragmento) and sum(por_fragmento) == ranking.contar_jogadores()
+        # Um nó atravessa o pipe como o seu registro, sem a subárvore
+        assert ranking.buscar("p7").esquerda is None
+        assert ranking.buscar("p7").historico_avls.tolist() == referencia.buscar("p7").historico_avls.tolist()
+    finally:
+        ranking.fechar()
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+import main
+from armazenamento import MOTORES
+from ranking_fragmentado import RankingFragmentado
+from servidor_api import PublicadorSnapshot
+from snapshot_binario import SnapshotMapeado
+
+def criar(motor):
+    return MOTORES[motor](2) if MOTORES[motor] is RankingFragmentado else MOTORES[motor]()
+
+def aplicar_aleatorio(ranking, passos: int, semente: int) -> dict:
+    """Escritas aleatórias; devolve a versão em que cada jogador mudou por último (o modelo)"""
+    aleatorio = random.Random(semente)
+    versoes = {}
+    ranking.construir_de_ordenados([{"nome_jogador": f"j{i:03d}", "pontuacao_recorde": i} for i in range(40)])
+    versoes.update((f"j{i:03d}", ranking.versao) for i in range(40))
+    for _ in range(passos):
+        sorteio = aleatorio.random()
+        nome = f"j{aleatorio.randrange(60):03d}"
+        if sorteio < 0.1:
+            # Grande o bastante para ser mesclado de uma vez em todos os motores: uma versão só
+            lote = [(f"j{aleatorio.randrange(60):03d}", aleatorio.randrange(500), 1, 0, False) for _ in range(50)]
+            ranking.inserir_lote(lote, 1000)
+            versoes.update((resultado[0], ranking.versao) for resultado in lote)
+        elif sorteio < 0.6:
+            ranking.inserir(nome, aleatorio.randrange(500), 1000)
+            versoes[nome] = ranking.versao
+        elif ranking.registrar_fim_avl(nome, 1, 0, aleatorio.random() < 0.5) is not None:
+            versoes[nome] = ranking.versao
+    return versoes
+
+def alterados_no_modelo(versoes: dict, desde: int) -> list:
+    return sorted(nome for nome, versao in versoes.items() if versao > desde)
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_mudancas_desde_bate_com_o_modelo(motor, fechar_depois):
+    ranking = criar(motor)
+    fechar_depois(ranking)
+    versoes = aplicar_aleatorio(ranking, 300, semente=7)
+    assert {no.nome_jogador: no.versao_alteracao for no in ranking.em_ordem()} == versoes
+    for desde in range(0, ranking.versao + 1, 7):
+        alterados = ranking.mudancas_desde(desde)
+        assert sorted(no.nome_jogador for no in alterados) == alterados_no_modelo(versoes, desde)
+        assert [no.versao_alteracao for no in alterados] == sorted(no.versao_alteracao for no in alterados)
+    assert ranking.mudancas_desde(0, 5) is None
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_snapshot_publicado_guarda_as_versoes_do_ranking(motor, tmp_path, fechar_depois):
+    """O que os trabalhadores da API leem: o snapshot gravado pelo PublicadorSnapshot"""
+    ranking = criar(motor)
+    fechar_depois(ranking)
+    versoes = aplicar_aleatorio(ranking, 200, semente=11)
+    arquivo = str(tmp_path / "ranking.api.bin")
+    assert PublicadorSnapshot(lambda: ranking, arquivo).publicar()
+    snapshot = SnapshotMapeado(arquivo)
+    fechar_depois(snapshot)
+    assert snapshot.versao == ranking.versao
+    assert {no.nome_jogador: no.versao_alteracao for no in snapshot.em_ordem()} == versoes
+    for desde in range(0, snapshot.versao + 1, 5):
+        alterados = snapshot.mudancas_desde(desde)
+        assert sorted(no.nome_jogador for no in alterados) == alterados_no_modelo(versoes, desde)
+
+def test_trabalhador_serve_mudancas_do_ranking_fragmentado(tmp_path):
+    ranking = RankingFragmentado(2)
+    try:
+        versoes = aplicar_aleatorio(ranking, 200, semente=3)
+        arquivo = str(tmp_path / "ranking.api.bin")
+        PublicadorSnapshot(lambda: ranking, arquivo).publicar()
+
+        jogo = main.SobreviventeInsalubre(arquivo_ranking=None)
+        assert jogo.carregar_snapshot_binario(arquivo)
+        anterior, main.jogo_global = main.jogo_global, jogo
+        try:
+            cliente = main.app.test_client()
+            desde = ranking.versao - 20
+            resposta = cliente.get(f"/api/ranking/mudancas?desde={desde}").get_json()
+            assert resposta["versao"] == ranking.versao and not resposta["recarregar"]
+            assert sorted(jogador["nome"] for jogador in resposta["jogadores"]) == alterados_no_modelo(versoes, desde)
+            assert all(jogador["versao_alteracao"] == versoes[jogador["nome"]] for jogador in resposta["jogadores"])
+        finally:
+            main.jogo_global = anterior
+            jogo.ranking.fechar()
+    finally:
+        ranking.fechar()
+
+def test_ranking_informa_a_versao_e_mudancas_pede_recarga_fora_do_alcance():
+    ranking = MOTORES["persistente"]()
+    jogo = main.SobreviventeInsalubre(arquivo_ranking=None)
+    jogo.ranking = ranking
+    jogo.recalcular_agregados()
+    anterior, main.jogo_global = main.jogo_global, jogo
+    try:
+        cliente = main.app.test_client()
+        versao = int(cliente.get("/api/ranking").headers["X-Ranking-Versao"])
+        ranking.inserir("ana", 50)
+        ranking.inserir("bia", 70)
+        resposta = cliente.get(f"/api/ranking/mudancas?desde={versao}").get_json()
+        assert [jogador["nome"] for jogador in resposta["jogadores"]] == ["ana", "bia"]
+        assert [jogador["rank"] for jogador in resposta["jogadores"]] == [2, 1]
+        assert cliente.get(f"/api/ranking/mudancas?desde={ranking.versao + 1}").get_json()["recarregar"]
+        assert cliente.get("/api/ranking/mudancas").status_code == 400
+    finally:
+        main.jogo_global = anterior
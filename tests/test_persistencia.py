@@ -0,0 +1,256 @@
+import json
+import os
+import random
+
+import pytest
+
+import main
+import persistencia
+from AVL import ArvoreAVL
+from armazenamento import MOTORES
+from snapshot_binario import SnapshotMapeado
+
+def jogar(diario, ranking, passos: int, semente: int):
+    """AVLs, fins de AVL e lotes, cada um registrado no diário antes de ir para o ranking vivo"""
+    aleatorio = random.Random(semente)
+    for passo in range(passos):
+        nome = f"p{aleatorio.randint(0, 40)}"
+        sorteio = aleatorio.random()
+        if sorteio < 0.6:
+            pontuacao = aleatorio.randint(0, 5000)
+            diario.registrar_insercao(nome, pontuacao, 1000 + passo)
+            ranking.inserir(nome, pontuacao, 1000 + passo)
+        elif sorteio < 0.9:
+            argumentos = (nome, aleatorio.randint(0, 60), aleatorio.randint(0, 3), aleatorio.random() < 0.5)
+            diario.registrar_fim_avl(*argumentos)
+            ranking.registrar_fim_avl(*argumentos)
+        else:
+            lote = [(f"p{aleatorio.randint(0, 60)}", aleatorio.randint(0, 5000), 2, 1, False) for _ in range(30)]
+            diario.registrar_lote(lote, 1000 + passo)
+            ranking.inserir_lote(lote, 1000 + passo)
+
+def escrever(diario, ranking, nome: str, pontuacao: int, momento: int):
+    """Uma AVL como o jogo faz: primeiro no diário, depois no ranking vivo"""
+    diario.registrar_insercao(nome, pontuacao, momento)
+    ranking.inserir(nome, pontuacao, momento)
+
+def aguardar(diario):
+    if diario._compactacao:
+        diario._compactacao.join()
+
+def recuperado(arquivo: str) -> list:
+    diario = persistencia.DiarioRanking(arquivo)
+    registros = list(diario.recuperar().registros())
+    diario._arquivo.close()
+    return registros
+
+def test_ranking_salvo_volta_igual(tmp_path):
+    arquivo = str(tmp_path / "data" / "ranking.json")
+    assert persistencia.carregar_ranking(arquivo) is None
+
+    arvore = ArvoreAVL()
+    for i, pontuacao in enumerate((300, 100, 200, 100, 50)):
+        arvore.inserir(f"p{i % 3}", pontuacao, 1000 + i)
+    persistencia.salvar_ranking(arvore, arquivo)
+    assert not os.path.exists(arquivo + ".tmp")
+
+    # Lista plana em ordem de nome, no formato de data/ranking.json
+    with open(arquivo, encoding="utf-8") as f:
+        salvos = json.load(f)
+    assert [registro["nome_jogador"] for registro in salvos] == ["p0", "p1", "p2"]
+    assert salvos[0]["historico_avls"] == [300, 100] and salvos[0]["historico_datas"] == [1000, 1003]
+    # Escrita em fluxo: um registro por linha entre os colchetes
+    with open(arquivo, encoding="utf-8") as f:
+        linhas = f.read().splitlines()
+    assert linhas[0] == "[" and linhas[-1] == "]"
+    assert [json.loads(linha.rstrip(",")) for linha in linhas[1:-1]] == salvos
+
+    carregada = persistencia.carregar_ranking(arquivo)
+    assert list(carregada.registros()) == salvos
+    assert carregada.top_n_pontuacoes(3) == arvore.top_n_pontuacoes(3)
+
+    persistencia.salvar_ranking(ArvoreAVL(), arquivo)
+    assert persistencia.carregar_ranking(arquivo).contar_jogadores() == 0
+
+@pytest.mark.parametrize("motor", sorted(MOTORES))
+def test_diario_reaplicado_reconstroi_o_ranking(tmp_path, motor, fechar_depois):
+    arquivo = str(tmp_path / "ranking.json")
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=10 ** 6, motor=motor)
+    ranking = diario.recuperar()
+    fechar_depois(ranking)
+    jogar(diario, ranking, 400, semente=1)
+    # Queda no meio da última escrita: a linha incompleta é ignorada
+    diario._arquivo.write('{"op":"inserir","nome":"me')
+    diario._arquivo.close()
+    assert not os.path.exists(arquivo)
+    assert recuperado(arquivo) == list(ranking.registros())
+
+def test_compactacao_dobra_o_diario_no_snapshot(tmp_path):
+    arquivo = str(tmp_path / "ranking.json")
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=50)
+    ranking = diario.recuperar()
+    for semente in range(6):
+        jogar(diario, ranking, 60, semente)
+        aguardar(diario)
+    assert not os.path.exists(diario.arquivo_compactando)
+    # Já houve compactações: o snapshot mais o diário vivo dão o ranking
+    assert os.path.exists(arquivo)
+    diario.sincronizar()
+    assert recuperado(arquivo) == list(ranking.registros())
+
+    diario.fechar(ranking)
+    assert os.path.getsize(diario.arquivo_diario) == 0
+    with open(arquivo, encoding="utf-8") as f:
+        assert json.load(f) == list(ranking.registros())
+    assert persistencia.snapshot_binario_atualizado(arquivo)
+    mapeado = SnapshotMapeado(diario.arquivo_binario)
+    assert list(mapeado.registros()) == list(ranking.registros())
+    mapeado.fechar()
+
+@pytest.mark.parametrize("ponto", ["antes_do_passo_2", "entre_os_passos_2_e_3"])
+def test_recuperacao_retoma_uma_compactacao_interrompida(tmp_path, ponto):
+    """Queda no meio da sequência de DiarioRanking: .novo, .diario.compactando e .diario no disco"""
+    arquivo = str(tmp_path / "ranking.json")
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=10 ** 6)
+    ranking = diario.recuperar()
+    jogar(diario, ranking, 80, semente=2)
+    diario.fechar(ranking)
+
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=10 ** 6)
+    ranking = diario.recuperar()
+    jogar(diario, ranking, 80, semente=3)
+    diario._rotacionar()
+    jogar(diario, ranking, 40, semente=4)
+    diario._arquivo.close()
+
+    compactado = persistencia.carregar_ranking(arquivo)
+    persistencia.reaplicar_diario(compactado, diario.arquivo_compactando)
+    if ponto == "antes_do_passo_2":
+        # Um .novo pela metade: não pode ser usado
+        with open(diario.arquivo_novo, "w", encoding="utf-8") as f:
+            f.write("[{")
+    else:
+        persistencia.salvar_ranking(compactado, diario.arquivo_novo)
+        os.remove(diario.arquivo_compactando)
+
+    assert recuperado(arquivo) == list(ranking.registros())
+    assert not os.path.exists(diario.arquivo_novo)
+    assert not os.path.exists(diario.arquivo_compactando)
+
+def test_ranking_salvo_antes_das_datas_carrega_com_momento_desconhecido(tmp_path):
+    arquivo = tmp_path / "ranking.json"
+    arquivo.write_text(json.dumps([{"nome_jogador": "a", "pontuacao_recorde": 5, "historico_avls": [1, 5],
+                                    "total_avls": 2}]), encoding="utf-8")
+    no = persistencia.carregar_ranking(str(arquivo)).buscar("a")
+    assert no.historico_datas.tolist() == [0, 0]
+    assert no.estatisticas.maximo == 5
+
+def test_jogo_grava_no_diario_e_dobra_no_snapshot_ao_encerrar(tmp_path):
+    arquivo = str(tmp_path / "ranking.json")
+    jogo = main.SobreviventeInsalubre(arquivo)
+    jogo.carregar_ranking()
+    jogo.registrar_pontuacao("Ana", 120)
+    jogo.registrar_pontuacao("Ana", 90)
+    assert os.path.getsize(jogo.diario.arquivo_diario) > 0
+
+    jogo.encerrar_ranking()
+    assert os.path.getsize(arquivo + ".diario") == 0
+    leitor = main.SobreviventeInsalubre(arquivo)
+    assert leitor.carregar_snapshot_binario()
+    assert leitor.ranking.buscar("Ana").pontuacao_recorde == 120
+    assert leitor.agregados.resumo()["total_avls"] == 2
+    assert leitor.distribuicao.avls.total == 2 and leitor.janelas.contar_jogadores("24h") == 1
+    leitor.ranking.fechar()
+
+    reaberto = main.SobreviventeInsalubre(arquivo, motor="arranjo")
+    reaberto.carregar_ranking()
+    no = reaberto.ranking.buscar("Ana")
+    assert no.pontuacao_recorde == 120 and no.historico_avls.tolist() == [120, 90]
+    reaberto.encerrar_ranking()
+
+def test_abrir_o_snapshot_nao_passa_por_todos_os_jogadores(tmp_path, monkeypatch):
+    arquivo = str(tmp_path / "ranking.json")
+    jogo = main.SobreviventeInsalubre(arquivo)
+    jogo.carregar_ranking()
+    for i in range(50):
+        jogo.registrar_pontuacao(f"p{i}", i * 10)
+    resumo, percentis = jogo.agregados.resumo(), jogo.distribuicao.resumo()
+    jogo.encerrar_ranking()
+
+    for metodo in ("em_ordem", "contadores_jogadores", "pontuacoes_recorde", "pontuacoes_avls", "_registro"):
+        monkeypatch.setattr(SnapshotMapeado, metodo, lambda *_, metodo=metodo: pytest.fail(metodo))
+    leitor = main.SobreviventeInsalubre(arquivo)
+    assert leitor.carregar_snapshot_binario()
+    try:
+        assert leitor.agregados.resumo() == resumo and leitor.distribuicao.resumo() == percentis
+        assert leitor.janelas.contar_jogadores("24h") == 50
+    finally:
+        leitor.ranking.fechar()
+
+def test_importar_resultados_de_um_arquivo_ndjson(tmp_path):
+    entrada = tmp_path / "torneio.ndjson"
+    entrada.write_text("\n".join(json.dumps(resultado) for resultado in [
+        {"nome": "Ana", "pontuacao": 300, "eventos": 10, "chefes": 1, "morreu": True},
+        {"nome": "Bia", "pontuacao": 50},
+        {"nome": "Ana", "pontuacao": 120, "eventos": 12, "chefes": 2},
+    ]) + "\n", encoding="utf-8")
+    arquivo = str(tmp_path / "ranking.json")
+    jogo = main.SobreviventeInsalubre(arquivo)
+    jogo.carregar_ranking()
+    jogo.importar_resultados(list(persistencia.ler_resultados(str(entrada))))
+    jogo.encerrar_ranking()
+
+    ana, bia = persistencia.carregar_ranking(arquivo).registros()
+    assert (ana["historico_avls"], ana["record_eventos"], ana["chefes_derrotados"], ana["contador_mortes"]) == \
+        ([300, 120], 12, 3, 1)
+    assert bia["pontuacao_recorde"] == 50 and jogo.total_mortes == 1
+
+@pytest.fixture
+def falhar_uma_vez(monkeypatch):
+    """A próxima gravação do snapshot falha, como um disco cheio"""
+    original = persistencia.salvar_ranking
+    falhas = []
+
+    def salvar(ranking, arquivo=persistencia.ARQUIVO_RANKING):
+        if not falhas:
+            falhas.append(arquivo)
+            raise OSError("disco cheio")
+        original(ranking, arquivo)
+
+    monkeypatch.setattr(persistencia, "salvar_ranking", salvar)
+    return falhas
+
+def test_compactacao_com_erro_nao_perde_entradas(tmp_path, falhar_uma_vez):
+    arquivo = str(tmp_path / "ranking.json")
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=5)
+    ranking = diario.recuperar()
+
+    for i in range(5):
+        escrever(diario, ranking, f"p{i}", i, 100 + i)
+    aguardar(diario)
+    assert falhar_uma_vez and isinstance(diario.erro_compactacao, OSError)
+    assert os.path.exists(diario.arquivo_compactando)
+
+    # Passou do limite de novo: a rotação não pode jogar o diário vivo por cima do .compactando
+    for i in range(5, 12):
+        escrever(diario, ranking, f"p{i % 7}", i, 100 + i)
+        aguardar(diario)
+    assert diario.erro_compactacao is None
+
+    # Queda sem fechar: snapshot + diários pendentes dão o ranking vivo
+    diario._arquivo.close()
+    assert recuperado(arquivo) == list(ranking.registros())
+
+def test_fechar_dobra_a_sobra_de_uma_compactacao_com_erro(tmp_path, falhar_uma_vez):
+    arquivo = str(tmp_path / "ranking.json")
+    diario = persistencia.DiarioRanking(arquivo, limite_entradas=3)
+    ranking = diario.recuperar()
+    for i in range(4):
+        escrever(diario, ranking, f"p{i % 2}", i, 100 + i)
+    aguardar(diario)
+    assert os.path.exists(diario.arquivo_compactando)
+
+    diario.fechar(ranking)
+    assert not os.path.exists(diario.arquivo_compactando)
+    assert os.path.getsize(diario.arquivo_diario) == 0
+    assert recuperado(arquivo) == list(ranking.registros())
@@ -0,0 +1,83 @@
+import json
+import time
+import urllib.request
+
+import pytest
+
+import main
+from armazenamento import criar_armazenamento
+from servidor_api import PublicadorSnapshot, TrabalhadoresAPI
+from snapshot_binario import SnapshotMapeado
+
+def aguardar(condicao, tempo: float = 5.0):
+    limite = time.monotonic() + tempo
+    while not condicao():
+        assert time.monotonic() < limite, "tempo esgotado"
+        time.sleep(0.02)
+
+@pytest.fixture
+def ranking():
+    ranking = criar_armazenamento("persistente")
+    for i in range(50):
+        ranking.inserir(f"p{i:02d}", i * 10, 1_000_000 + i)
+    return ranking
+
+def test_publicador_so_grava_quando_o_ranking_muda(ranking, tmp_path):
+    arquivo = str(tmp_path / "ranking.api.bin")
+    publicador = PublicadorSnapshot(lambda: ranking, arquivo)
+    assert publicador.publicar()
+    assert not publicador.publicar()
+    ranking.inserir("novo", 7, 2_000_000)
+    assert publicador.publicar()
+
+    mapeado = SnapshotMapeado(arquivo)
+    assert list(mapeado.registros()) == list(ranking.registros())
+    mapeado.fechar()
+
+def test_trabalhador_troca_para_cada_snapshot_publicado(ranking, tmp_path):
+    arquivo = str(tmp_path / "ranking.api.bin")
+    publicador = PublicadorSnapshot(lambda: ranking, arquivo)
+    publicador.publicar()
+    anterior = main.jogo_global
+    try:
+        app = main.preparar_trabalhador(arquivo, intervalo=0.02, prazo_anterior=0)
+        aguardar(lambda: main.jogo_global is not None)
+        # Só o snapshot e os agregados gravados nele, sem um jogo inteiro
+        primeiro = main.jogo_global
+        assert isinstance(primeiro, main.EstadoPublicado)
+        cliente = app.test_client()
+        corpo = cliente.get("/api/ranking?limite=5").get_json()
+        assert [jogador["nome"] for jogador in corpo["jogadores"]] == ["p49", "p48", "p47", "p46", "p45"]
+        assert corpo["estatisticas"]["total_jogadores"] == 50
+
+        ranking.inserir("lider", 10 ** 6, 2_000_000)
+        publicador.publicar()
+        aguardar(lambda: main.jogo_global.ranking.contar_jogadores() == 51)
+        # Com a troca feita, o mapeamento anterior é fechado
+        aguardar(lambda: primeiro.ranking._mapa.closed)
+        corpo = cliente.get("/api/ranking?limite=1").get_json()
+        assert corpo["jogadores"][0]["nome"] == "lider" and corpo["estatisticas"]["total_jogadores"] == 51
+    finally:
+        main.jogo_global = anterior
+
+def test_trabalhadores_respondem_no_mesmo_socket(ranking, tmp_path):
+    arquivo = str(tmp_path / "ranking.api.bin")
+    PublicadorSnapshot(lambda: ranking, arquivo).publicar()
+    trabalhadores = TrabalhadoresAPI(main.preparar_trabalhador, (arquivo,), 2, porta=0)
+    try:
+        url = f"http://127.0.0.1:{trabalhadores.porta}/api/ranking?limite=3"
+
+        def ler():
+            try:
+                with urllib.request.urlopen(url, timeout=2) as resposta:
+                    return resposta.headers["ETag"], json.load(resposta)
+            except OSError:
+                return None
+
+        aguardar(lambda: ler() is not None, tempo=15)
+        respostas = [ler() for _ in range(10)]
+        # A ETag é o hash do corpo: igual em qualquer trabalhador que sirva o mesmo snapshot
+        assert len({etag for etag, _ in respostas}) == 1
+        assert [jogador["nome"] for jogador in respostas[0][1]["jogadores"]] == ["p49", "p48", "p47"]
+    finally:
+        trabalhadores.encerrar()
@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from AVL import ArvoreAVL
+from agregados import AgregadosRanking
+from distribuicao import DistribuicaoPontuacoes
+from snapshot_binario import SnapshotMapeado, escrever_snapshot_binario
+
+@pytest.fixture(scope="module")
+def arvore():
+    aleatorio = random.Random(8)
+    arvore = ArvoreAVL()
+    for _ in range(1500):
+        # Nomes fora do ASCII: a busca binária compara os bytes UTF-8
+        nome = aleatorio.choice(["p", "ç", "Á", "ø"]) + str(aleatorio.randint(0, 400))
+        arvore.inserir(nome, aleatorio.randint(0, 5000))
+    return arvore
+
+def leituras(ranking) -> dict:
+    """As consultas de leitura que a API faz, comparáveis entre a árvore e o snapshot"""
+    total = ranking.contar_jogadores()
+    decrescente = [no.nome_jogador for no in ranking.em_ordem_decrescente()]
+    return {
+        "total": total,
+        "decrescente": decrescente,
+        "posicoes": [ranking.posicao_jogador(nome) for nome in decrescente],
+        "por_posicao": [ranking.jogador_na_posicao(k).nome_jogador for k in range(1, total + 1)],
+        "ausente": (ranking.buscar("ninguem"), ranking.posicao_jogador("ninguem"),
+                    ranking.jogador_na_posicao(total + 1)),
+        "top": ranking.top_n_pontuacoes(10),
+        "intervalo": [no.nome_jogador for no in ranking.intervalo_pontuacao(1000, 3000)],
+        "prefixos": [[no.nome_jogador for no in ranking.prefixo_nome(prefixo)] for prefixo in ("p1", "ç", "")],
+        "registros": list(ranking.registros()),
+        "contadores": sorted(ranking.contadores_jogadores()),
+        "paginas": [[no.nome_jogador for no in ranking.pagina_pontuacao(9, depois, crescente)]
+                    for depois in (None, (2500, "p5")) for crescente in (False, True)] +
+                   [[no.nome_jogador for no in ranking.pagina_nome(9, depois, crescente)]
+                    for depois in (None, "p5", "ç") for crescente in (False, True)],
+        "pontuacoes": (sorted(ranking.pontuacoes_recorde()), sorted(ranking.pontuacoes_avls())),
+    }
+
+def test_snapshot_mapeado_responde_como_a_arvore(arvore, tmp_path):
+    arquivo = str(tmp_path / "ranking.bin")
+    escrever_snapshot_binario(arvore, arquivo)
+    mapeado = SnapshotMapeado(arquivo)
+    try:
+        # Abrir não materializa ninguém; uma busca materializa só o jogador encontrado
+        assert mapeado.contar_jogadores() == arvore.contar_jogadores()
+        assert not mapeado._materializados
+        assert mapeado.buscar("p7").pontuacao_recorde == arvore.buscar("p7").pontuacao_recorde
+        assert len(mapeado._materializados) == 1
+        # As pontuações para a distribuição saem dos registros fixos, sem materializar nós
+        assert sorted(mapeado.pontuacoes_recorde()) == sorted(arvore.pontuacoes_recorde())
+        assert sorted(mapeado.contadores_jogadores()) == sorted(arvore.contadores_jogadores())
+        assert len(mapeado._materializados) == 1
+        assert leituras(mapeado) == leituras(arvore)
+    finally:
+        mapeado.fechar()
+
+def test_agregados_e_avls_recentes_vem_gravados(tmp_path, monkeypatch):
+    arvore = ArvoreAVL()
+    aleatorio = random.Random(2)
+    agora = 1_800_000_000
+    # Em ordem cronológica, como o jogo registra
+    for momento in sorted(agora - aleatorio.randint(0, 90 * 86400) for _ in range(600)):
+        arvore.inserir(f"p{aleatorio.randint(0, 150)}", aleatorio.randint(0, 5000), momento)
+    arquivo = str(tmp_path / "ranking.bin")
+    escrever_snapshot_binario(arvore, arquivo, momento_atual=agora)
+    mapeado = SnapshotMapeado(arquivo)
+    try:
+        assert AgregadosRanking.das_somas(mapeado.somas_agregados()).resumo() == \
+            AgregadosRanking.do_ranking(arvore).resumo()
+        recalculada = DistribuicaoPontuacoes.do_ranking(arvore)
+        recordes, avls = mapeado.histogramas()
+        assert (recordes.contagens(), recordes.total) == (recalculada.recordes.contagens(), recalculada.recordes.total)
+        assert (avls.contagens(), avls.total) == (recalculada.avls.contagens(), recalculada.avls.total)
+
+        # Dentro das janelas as AVLs saem da seção de recentes, sem ler a tabela de nós
+        registro = SnapshotMapeado._registro
+        monkeypatch.setattr(SnapshotMapeado, "_registro", lambda *_: pytest.fail("leu a tabela de nós"))
+        for desde in (agora - 7 * 86400, agora - 86400 + 1, agora + 1):
+            assert sorted(mapeado.avls_desde(desde)) == sorted(arvore.avls_desde(desde))
+        assert not mapeado._materializados
+        # Antes delas, a leitura volta a passar pelos históricos
+        monkeypatch.setattr(SnapshotMapeado, "_registro", registro)
+        assert sorted(mapeado.avls_desde(agora - 60 * 86400)) == sorted(arvore.avls_desde(agora - 60 * 86400))
+    finally:
+        mapeado.fechar()
+
+def test_snapshot_vazio(tmp_path):
+    arquivo = str(tmp_path / "ranking.bin")
+    escrever_snapshot_binario(ArvoreAVL(), arquivo)
+    mapeado = SnapshotMapeado(arquivo)
+    assert mapeado.contar_jogadores() == 0 and mapeado.top_n_pontuacoes(5) == []
+    assert mapeado.buscar("a") is None and mapeado.jogador_na_posicao(1) is None
+    with pytest.raises(NotImplementedError):
+        mapeado.inserir("a", 1)
+    mapeado.fechar()
+
+def test_snapshot_mapeado_recusa_outro_formato(tmp_path):
+    arquivo = tmp_path / "ranking.bin"
+    arquivo.write_bytes(b"AVLB\x09\x00\x00\x00" + bytes(64))
+    with pytest.raises(ValueError):
+        SnapshotMapeado(str(arquivo))